@@ -13,10 +13,16 @@ like cameracalib.py folder_name png
 
 import numpy as np
 import cv2
+import argparse
 import glob
 import sys
 import os
 
+from tongue_tracking.calibration import (
+    CornerCache, detect_corners_cached, COARSE_MAX_DIM,
+    select_diverse_views, corner_coverage, reprojection_errors
+)
+
 #---------------------- SET THE PARAMETERS
 nRows = 8
 nCols = 8
@@ -39,6 +45,47 @@ objp[:,:2] = np.mgrid[0:nCols,0:nRows].T.reshape(-1,2)
 objpoints = [] # 3d point in real world space
 imgpoints = [] # 2d points in image plane.
 
+
+def initialize_arg_parser():
+    """Create the command line parser, defaults match the parameters above"""
+    parser = argparse.ArgumentParser(
+        description="Calibrate a camera from chessboard images")
+    parser.add_argument("folder", nargs="?", default=workingFolder,
+        help=f"folder containing the calibration images (default: {workingFolder})")
+    parser.add_argument("image_type", nargs="?", default=imageType,
+        help=f"image file extension (default: {imageType})")
+    parser.add_argument("rows", nargs="?", type=int, default=nRows,
+        help=f"number of inner corners per chessboard column (default: {nRows})")
+    parser.add_argument("cols", nargs="?", type=int, default=nCols,
+        help=f"number of inner corners per chessboard row (default: {nCols})")
+    parser.add_argument("dimension", nargs="?", type=int, default=dimension,
+        help=f"chessboard square size in mm (default: {dimension})")
+    parser.add_argument("--no-review", action="store_true",
+        help="accept every detected pattern without showing it")
+    parser.add_argument("--no-cache", action="store_true",
+        help="always detect corners instead of using cached detections")
+    parser.add_argument("--cache-dir", type=str,
+        help="directory for cached corner detections (default: <folder>/.corner_cache)")
+    parser.add_argument("--coarse-size", type=int, default=COARSE_MAX_DIM,
+        help=f"longest image side for the coarse chessboard search (default: {COARSE_MAX_DIM})")
+    parser.add_argument("--max-views", type=int, default=0,
+        help="calibrate on at most N maximally diverse views, 0 uses all (default: 0)")
+    return parser
+
+
+def validate_inputs(folder, image_type, rows, cols, square_size):
+    """Check the calibration parameters, raising ValueError if invalid"""
+    if not folder:
+        raise ValueError("working folder must not be empty")
+    image_type = image_type.lstrip('.').strip()
+    if not image_type:
+        raise ValueError("image type must not be empty")
+    if rows < 2 or cols < 2:
+        raise ValueError(f"chessboard needs at least 2x2 inner corners, got {rows}x{cols}")
+    if square_size <= 0:
+        raise ValueError(f"square size must be positive, got {square_size}")
+    return folder, image_type, rows, cols, square_size
+
 # Parse command line arguments using argparse
 parser = initialize_arg_parser()
 args = parser.parse_args()
@@ -55,6 +102,8 @@ try:
     workingFolder, imageType, nRows, nCols, dimension = validate_inputs(
         workingFolder, imageType, nRows, nCols, dimension
     )
+    if args.max_views and args.max_views < 3:
+        raise ValueError(f"--max-views needs at least 3 views, got {args.max_views}")
     
     # Update termination criteria and object points with validated values
     criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, dimension, 0.001)
@@ -83,58 +132,86 @@ if len(images) < 9:
     print("Not enough images were found: at least 9 shall be provided!!!")
     sys.exit(1)
 
+# Cached detections are keyed by file hash and pattern size, so only new or
+# modified images are searched when the calibration is run again
+cache = None
+if not args.no_cache:
+    cache = CornerCache(args.cache_dir or os.path.join(workingFolder, ".corner_cache"))
+
 # Process images
 nPatternFound = 0
+nCached = 0
+imageSize = None
 imgNotGood = images[0]  # Use first image as fallback
 
 for fname in images:
     if 'calibresult' in fname:
         continue
 
-    # Read the file and convert to greyscale
-    img = cv2.imread(fname)
+    print(f"Reading image: {fname}")
+    detection = detect_corners_cached(fname, (nCols, nRows), criteria, cache,
+                                      args.coarse_size)
 
     # Validate image was read successfully
-    if img is None:
+    if detection is None:
         print(f"Warning: Could not read image: {fname}")
         continue
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    print(f"Reading image: {fname}")
-
-    # Find the chess board corners
-    ret, corners = cv2.findChessboardCorners(gray, (nCols, nRows), None)
+    ret, corners2, size, cached = detection
+    nCached += cached
 
-    # If found, add object points, image points (after refining them)
+    # If found, add object points, image points (already refined)
     if ret == True:
-        print("Pattern found! Press ESC to skip or ENTER to accept")
-        # Refine corner positions for better accuracy
-        corners2 = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
-
-        # Draw and display the corners
-        cv2.drawChessboardCorners(img, (nCols, nRows), corners2, ret)
-        cv2.imshow('img', img)
-
-        k = cv2.waitKey(0) & 0xFF
-        if k == 27:  # ESC Button
-            print("Image Skipped")
-            imgNotGood = fname
+        if imageSize is not None and size != imageSize:
+            print(f"Warning: Image size {size} differs from {imageSize}, skipping {fname}")
             continue
 
+        if not args.no_review:
+            print("Pattern found! Press ESC to skip or ENTER to accept")
+            img = cv2.imread(fname)
+
+            # Draw and display the corners
+            cv2.drawChessboardCorners(img, (nCols, nRows), corners2, ret)
+            cv2.imshow('img', img)
+
+            k = cv2.waitKey(0) & 0xFF
+            if k == 27:  # ESC Button
+                print("Image Skipped")
+                imgNotGood = fname
+                continue
+
         print("Image accepted")
+        imageSize = size
         nPatternFound += 1
         objpoints.append(objp)
         imgpoints.append(corners2)
     else:
         imgNotGood = fname
 
+if cache is not None:
+    print(f"Used cached corners for {nCached}/{len(images)} images")
 
-cv2.destroyAllWindows()
+if not args.no_review:
+    cv2.destroyAllWindows()
 
 if (nPatternFound > 1):
     print(f"Found {nPatternFound} good images")
-    ret, mtx, dist, rvecs, tvecs = cv2.calibrateCamera(objpoints, imgpoints, gray.shape[::-1], None, None)
+
+    # Near-duplicate captures add solver time but no information, so
+    # optionally calibrate on a diverse subset and validate on all views
+    selected = list(range(nPatternFound))
+    if args.max_views and nPatternFound > args.max_views:
+        selected = select_diverse_views(imgpoints, imageSize, (nCols, nRows), args.max_views)
+        print(f"Calibrating on {len(selected)} diverse views out of {nPatternFound}")
+
+    coverage_all = corner_coverage(imgpoints, imageSize)
+    coverage_used = corner_coverage([imgpoints[i] for i in selected], imageSize)
+    print(f"Image coverage: {coverage_used*100:.1f}% of a 10x10 grid "
+          f"(all accepted views: {coverage_all*100:.1f}%)")
+
+    ret, mtx, dist, rvecs, tvecs = cv2.calibrateCamera(
+        [objpoints[i] for i in selected], [imgpoints[i] for i in selected],
+        imageSize, None, None)
 
     # Undistort an image
     img = cv2.imread(imgNotGood)
@@ -172,14 +249,19 @@ if (nPatternFound > 1):
     np.savetxt(filename, dist, delimiter=',')
     print(f"\nCalibration files saved to {workingFolder}/")
 
-    # Calculate reprojection error
-    mean_error = 0
-    for i in range(len(objpoints)):
-        imgpoints2, _ = cv2.projectPoints(objpoints[i], rvecs[i], tvecs[i], mtx, dist)
-        error = cv2.norm(imgpoints[i], imgpoints2, cv2.NORM_L2) / len(imgpoints2)
-        mean_error += error
-
-    print(f"Mean reprojection error: {mean_error/len(objpoints):.4f} pixels")
+    # Calculate reprojection error on every accepted view, views left out
+    # of the calibration are posed with solvePnP
+    all_rvecs = [None] * nPatternFound
+    all_tvecs = [None] * nPatternFound
+    for k, i in enumerate(selected):
+        all_rvecs[i] = rvecs[k]
+        all_tvecs[i] = tvecs[k]
+    errors = reprojection_errors(objpoints, imgpoints, mtx, dist, all_rvecs, all_tvecs)
+
+    print(f"Mean reprojection error: {errors.mean():.4f} pixels")
+    if len(selected) < nPatternFound:
+        print(f"  calibration views: {errors[selected].mean():.4f} pixels, "
+              f"held-out views: {np.delete(errors, selected).mean():.4f} pixels")
 
 else:
     print("In order to calibrate you need at least 9 good pictures... try again")
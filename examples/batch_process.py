@@ -4,33 +4,53 @@ Example: Batch process multiple videos with tongue tracking
 
 This script demonstrates how to process multiple videos in batch mode
 and export results in various formats.
+
+Videos are processed in parallel (one worker per CPU by default) and the
+state of every video is recorded in a manifest in the output directory.
+Running the script again skips videos that were already processed, picks
+up videos that were interrupted, and retries videos that failed.
 """
 
+import argparse
 import os
-import subprocess
+import sys
 import glob
 import json
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tongue_tracking.batch import BatchJob, Manifest, run_batch, format_summary, DONE
+from tongue_tracking.service import TrackingClient, DONE as JOB_DONE
+
 # Configuration
 INPUT_DIR = "./videos"
 OUTPUT_DIR = "./results"
 MODEL_PATH = "./shape_predictor_68_face_landmarks_finetuned.dat"
+MANIFEST_NAME = "batch_manifest.json"
 
 # Processing options
 SKIP_FRAMES = 2  # Process every 2nd frame for faster processing
 NO_DISPLAY = True  # Disable display for batch mode
+ANNOTATED_VIDEO = True  # Save an annotated copy of every video
+
+TRACKING_SCRIPT = str(Path(__file__).resolve().parent.parent / "facial_landmarks_video.py")
 
-def process_video(video_path, output_dir):
+
+def build_job(video_path, output_dir, args):
     """
-    Process a single video file
+    Build the batch job for a single video file
 
     Args:
         video_path: Path to input video
         output_dir: Directory for output files
+        args: Parsed command line arguments
+
+    Returns:
+        BatchJob
     """
     video_name = Path(video_path).stem
-    output_subdir = os.path.join(output_dir, video_name)
+    output_subdir = os.path.abspath(os.path.join(output_dir, video_name))
     os.makedirs(output_subdir, exist_ok=True)
 
     # Prepare output paths
@@ -40,80 +60,131 @@ def process_video(video_path, output_dir):
 
     # Build command
     cmd = [
-        "python", "facial_landmarks_video.py",
-        "--shape-predictor", MODEL_PATH,
-        "--video", video_path,
+        sys.executable, TRACKING_SCRIPT,
+        "--shape-predictor", os.path.abspath(args.model),
+        "--video", os.path.abspath(video_path),
         "--export-csv", csv_output,
         "--export-json", json_output,
-        "--output-video", video_output,
-        "--skip-frames", str(SKIP_FRAMES),
+        "--skip-frames", str(args.skip_frames),
     ]
+    outputs = [csv_output, json_output]
+
+    if args.service:
+        # Submit to a running tracking service, the models are already loaded
+        client = TrackingClient(args.service, timeout=30)
+
+        def run():
+            job = client.run(os.path.abspath(video_path), skip_frames=args.skip_frames,
+                             export_csv=csv_output, export_json=json_output)
+            return (0, '') if job['state'] == JOB_DONE else (1, job['error'])
+
+        return BatchJob(os.path.abspath(video_path), None, outputs,
+                        info_path=json_output, run=run)
+
+    if not args.no_annotated_video:
+        cmd.extend(["--output-video", video_output])
+        outputs.append(video_output)
 
     if NO_DISPLAY:
         cmd.append("--no-display")
 
-    print(f"\n{'='*60}")
-    print(f"Processing: {video_name}")
-    print(f"{'='*60}")
+    if args.no_plots:
+        cmd.append("--no-plots")
+
+    # Run inside the video's output directory so the plots of parallel
+    # jobs do not overwrite each other
+    return BatchJob(os.path.abspath(video_path), cmd, outputs,
+                    info_path=json_output, cwd=output_subdir)
+
+
+def print_result(job, entry):
+    """Print the outcome of a finished job"""
+    video_name = Path(job.key).stem
+    if entry['state'] != DONE:
+        print(f"Error processing {video_name} (attempt {entry['attempts']}):\n{entry.get('error')}")
+        return
+
+    # Load and display summary from JSON
+    with open(job.info_path, 'r') as f:
+        data = json.load(f)
+    rate = data['detections'] / data['frames_processed'] * 100 if data['frames_processed'] else 0
+    print(f"Finished {video_name}: {data['detections']} detections in "
+          f"{data['frames_processed']} frames ({rate:.1f}%), {entry['duration']:.1f}s")
 
-    try:
-        # Run the processing
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print(result.stdout)
-
-        # Load and display summary from JSON
-        if os.path.exists(json_output):
-            with open(json_output, 'r') as f:
-                data = json.load(f)
-                print(f"\nResults Summary:")
-                print(f"  Total frames: {data['total_frames']}")
-                print(f"  Processed: {data['frames_processed']}")
-                print(f"  Detections: {data['detections']}")
-                print(f"  Detection rate: {data['detections']/data['frames_processed']*100:.1f}%")
-
-        return True
-
-    except subprocess.CalledProcessError as e:
-        print(f"Error processing {video_name}: {e.stderr}")
-        return False
 
 def main():
     """Main batch processing function"""
-
-    # Check if model exists
-    if not os.path.exists(MODEL_PATH):
-        print(f"Error: Model file not found: {MODEL_PATH}")
+    ap = argparse.ArgumentParser(description="Batch process videos in parallel")
+    ap.add_argument("--input-dir", default=INPUT_DIR,
+        help=f"directory containing the videos (default: {INPUT_DIR})")
+    ap.add_argument("--output-dir", default=OUTPUT_DIR,
+        help=f"directory for results and the manifest (default: {OUTPUT_DIR})")
+    ap.add_argument("--model", default=MODEL_PATH,
+        help=f"path to the shape predictor (default: {MODEL_PATH})")
+    ap.add_argument("--skip-frames", type=int, default=SKIP_FRAMES,
+        help=f"process every Nth frame (default: {SKIP_FRAMES})")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+        help="number of videos processed in parallel (default: number of CPUs)")
+    ap.add_argument("--retries", type=int, default=1,
+        help="extra attempts for a failing video (default: 1)")
+    ap.add_argument("--no-annotated-video", action="store_true",
+        default=not ANNOTATED_VIDEO,
+        help="do not save annotated videos")
+    ap.add_argument("--no-plots", action="store_true",
+        help="do not save plot_x.png/plot_y.png for each video")
+    ap.add_argument("--service", type=str,
+        help="URL of a running tracking service (python -m tongue_tracking.service) "
+             "to submit the videos to instead of starting one process per video")
+    args = ap.parse_args()
+
+    # Check that the tracking service is running or that the model exists
+    if args.service:
+        if not TrackingClient(args.service).health():
+            print(f"Error: Tracking service not reachable at {args.service}")
+            return 1
+        if not args.no_annotated_video:
+            print("Note: annotated videos are not produced by the tracking service")
+    elif not os.path.exists(args.model):
+        print(f"Error: Model file not found: {args.model}")
         print("Please download from: https://drive.google.com/file/d/1kEOn0SsyToOCGr45UDygxnkDo4uxlWeh/view?usp=sharing")
-        return
+        return 1
 
     # Find all video files
     video_patterns = ["*.avi", "*.mp4", "*.mov"]
     video_files = []
     for pattern in video_patterns:
-        video_files.extend(glob.glob(os.path.join(INPUT_DIR, pattern)))
+        video_files.extend(glob.glob(os.path.join(args.input_dir, pattern)))
+    video_files.sort()
 
     if not video_files:
-        print(f"No video files found in {INPUT_DIR}")
+        print(f"No video files found in {args.input_dir}")
         print(f"Looking for: {', '.join(video_patterns)}")
-        return
-
-    print(f"Found {len(video_files)} video(s) to process")
+        return 1
 
     # Create output directory
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(args.output_dir, MANIFEST_NAME))
 
-    # Process each video
-    success_count = 0
-    for video_path in video_files:
-        if process_video(video_path, OUTPUT_DIR):
-            success_count += 1
+    jobs = [build_job(v, args.output_dir, args) for v in video_files]
+    print(f"Found {len(jobs)} video(s), processing with {args.workers} worker(s)")
+
+    try:
+        results = run_batch(jobs, manifest, workers=args.workers,
+                            retries=args.retries, on_finish=print_result)
+    except KeyboardInterrupt:
+        print("\nInterrupted, run the script again to resume.")
+        return 130
 
     # Print summary
+    success_count = sum(1 for _, entry, _ in results if entry['state'] == DONE)
     print(f"\n{'='*60}")
     print(f"Batch Processing Complete")
     print(f"{'='*60}")
-    print(f"Successfully processed: {success_count}/{len(video_files)} videos")
-    print(f"Results saved to: {OUTPUT_DIR}")
+    print(format_summary(results))
+    print(f"\nSuccessfully processed: {success_count}/{len(jobs)} videos")
+    print(f"Results saved to: {args.output_dir}")
+    return 0 if success_count == len(jobs) else 1
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
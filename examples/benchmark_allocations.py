@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory allocated per frame by the tracking pipeline
+
+Compares the old per-frame code (``imutils.resize``, ``cvtColor`` and
+``face_utils.shape_to_np`` allocating new arrays for every frame) with the
+buffer-reusing sources and landmark conversion of the ``tongue_tracking``
+package.
+
+The traces of tracemalloc (NumPy and OpenCV arrays are traced) are cleared
+before every frame, which also resets the peak. For every frame this gives:
+
+- the peak memory allocated during the frame, temporary arrays included;
+- the memory blocks allocated during the frame that are still alive at its
+  end. Blocks freed within the frame are not seen by tracemalloc and only
+  show up in the peak.
+
+The garbage collector runs over the whole measurement are also reported.
+
+Usage:
+    python examples/benchmark_allocations.py -v video.avi [-p model.dat] [--frames 300]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cv2
+import numpy as np
+
+from tongue_tracking.sources import FRAME_WIDTH, VideoFileSource
+
+
+class Stats:
+    """Per-frame allocation statistics of one pipeline"""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.peak_bytes = 0
+        self.new_blocks = 0
+        self.new_bytes = 0
+        self.gc_runs = 0
+        self.seconds = 0.0
+
+    def row(self):
+        n = max(self.frames, 1)
+        return (self.name, str(self.frames),
+                f"{self.peak_bytes / n / 1024:.1f}",
+                f"{self.new_blocks / n:.1f}",
+                f"{self.new_bytes / n / 1024:.1f}",
+                str(self.gc_runs),
+                f"{1000 * self.seconds / n:.2f}")
+
+
+def gc_count():
+    return sum(s['collections'] for s in gc.get_stats())
+
+
+# Allocations of tracemalloc itself (the snapshots) are not counted
+_OWN_TRACES = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def measure(name, steps):
+    """
+    Run ``steps`` (an iterator doing one frame of work per item) under
+    tracemalloc and collect the allocation statistics
+    """
+    stats = Stats(name)
+    iterator = iter(steps)
+    gc_start = gc_count()
+    tracemalloc.start()
+    try:
+        while True:
+            # Forgets the blocks allocated so far and resets the peak
+            # (tracemalloc.reset_peak() needs Python 3.9)
+            tracemalloc.clear_traces()
+            start = time.perf_counter()
+            try:
+                next(iterator)
+            except StopIteration:
+                break
+            stats.seconds += time.perf_counter() - start
+            stats.peak_bytes += tracemalloc.get_traced_memory()[1]
+            traces = tracemalloc.take_snapshot().filter_traces(_OWN_TRACES).traces
+            stats.new_blocks += len(traces)
+            stats.new_bytes += sum(trace.size for trace in traces)
+            stats.frames += 1
+    finally:
+        tracemalloc.stop()
+    stats.gc_runs = gc_count() - gc_start
+    return stats
+
+
+def legacy_frames(path, limit):
+    """Frame preparation as done before the buffer pool"""
+    import imutils
+
+    cap = cv2.VideoCapture(path)
+    try:
+        for _ in range(limit):
+            ret, frame = cap.read()
+            if not ret:
+                return
+            frame = imutils.resize(frame, width=FRAME_WIDTH)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            yield gray
+    finally:
+        cap.release()
+
+
+def pooled_frames(path, limit, source_class=VideoFileSource):
+    """Frame preparation with the reused buffers of a source"""
+    with source_class(path, color=True) as source:
+        for frame in source:
+            if source.frames_read > limit:
+                return
+            yield frame.gray
+
+
+def landmark_steps(shapes, convert):
+    for shape in shapes:
+        convert(shape)
+        yield
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Allocation benchmark of the frame pipeline")
+    ap.add_argument("-v", "--video", required=True, help="video file to decode")
+    ap.add_argument("-p", "--shape-predictor",
+        help="shape predictor model, also benchmarks the landmark conversion")
+    ap.add_argument("--frames", type=int, default=300,
+        help="number of frames to measure (default: 300)")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.video):
+        print(f"Error: Video file not found: {args.video}")
+        return 1
+
+    results = [
+        measure('frames: imutils + cvtColor', legacy_frames(args.video, args.frames)),
+        measure('frames: VideoFileSource', pooled_frames(args.video, args.frames)),
+    ]
+
+    if args.shape_predictor:
+        import dlib
+        from imutils import face_utils
+        from tongue_tracking.predictors import shape_to_array
+
+        # Predict once outside the measurement, only the conversion is timed
+        detector = dlib.get_frontal_face_detector()
+        predictor = dlib.shape_predictor(args.shape_predictor)
+        shapes = []
+        for gray in legacy_frames(args.video, args.frames):
+            shapes.extend(predictor(gray, rect) for rect in detector(gray, 1))
+        if shapes:
+            buffer = np.empty((shapes[0].num_parts, 2), dtype=np.int32)
+            results.append(measure('landmarks: shape_to_np',
+                                   landmark_steps(shapes, face_utils.shape_to_np)))
+            results.append(measure('landmarks: shape_to_array(out=)',
+                                   landmark_steps(shapes, lambda s: shape_to_array(s, buffer))))
+        else:
+            print("No faces found, skipping the landmark benchmark")
+
+    header = ('Pipeline', 'Frames', 'Peak KiB/frame', 'Kept blocks/frame', 'Kept KiB/frame',
+              'GC runs', 'ms/frame')
+    rows = [r.row() for r in results]
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    print('  '.join(h.ljust(w) for h, w in zip(header, widths)).rstrip())
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(c.ljust(w) for c, w in zip(row, widths)).rstrip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Track a video with several configurations in one pass
+
+Every frame is decoded once and every face detected once per processing
+width and detector; each configuration then runs its own tracking,
+smoothing and exports. The exports of a configuration are the same as
+those of facial_landmarks_video.py with the same settings.
+
+Usage:
+    python facial_landmarks_sweep.py -p model.dat -v clip.avi -c sweep.json -o sweep_out
+
+sweep.json lists the configurations (see tongue_tracking/sweep.py):
+
+    [{"name": "baseline"},
+     {"name": "skip3", "skip_frames": 3, "kalman": true, "exports": ["csv", "smoothed_csv"]},
+     {"name": "gated", "motion_gate": 2.0, "lock_subject": "largest"},
+     {"name": "w320", "width": 320}]
+
+The exports go to sweep_out/<name>/, a summary of all configurations to
+sweep_out/sweep_summary.json.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Track a video with several configurations, decoding and detecting once")
+    ap.add_argument("-p", "--shape-predictor", required=True,
+        help="path to facial landmark predictor")
+    ap.add_argument("-v", "--video", required=True,
+        help="path to input video file")
+    ap.add_argument("-c", "--configs", required=True,
+        help="JSON file with the list of configurations")
+    ap.add_argument("-o", "--output", required=True,
+        help="output directory, one subdirectory per configuration")
+    args = ap.parse_args()
+
+    for label, path in (("Shape predictor", args.shape_predictor), ("Video", args.video),
+                        ("Configuration", args.configs)):
+        if not os.path.exists(path):
+            print(f"Error: {label} file not found: {path}")
+            return 1
+
+    from tongue_tracking.sweep import Sweep, export_run, load_configs
+    from tongue_tracking.utils import atomic_write
+
+    try:
+        configs = load_configs(args.configs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    try:
+        sweep = Sweep(args.video, args.shape_predictor, configs)
+    except Exception as e:
+        print(f"Error initializing the sweep: {e}")
+        return 1
+
+    print(f"Processing {args.video} with {len(configs)} configurations "
+          f"({len(sweep.groups)} width/detector groups)...")
+    start = time.time()
+
+    def show_progress(frames_read, total_frames):
+        if total_frames > 0 and (frames_read % 30 == 0 or frames_read == total_frames):
+            print(f"\rProgress: {100.0 * frames_read / total_frames:.1f}% "
+                  f"({frames_read}/{total_frames} frames)", end="")
+
+    results = sweep.run(show_progress)
+    seconds = time.time() - start
+    print()
+
+    summaries = []
+    print(f"\n{'configuration':20s} {'frames':>7s} {'detections':>10s} {'gated':>6s}  exports")
+    for config, result in zip(configs, results):
+        try:
+            paths = export_run(config, result, os.path.join(args.output, config['name']))
+        except (OSError, ValueError) as e:
+            print(f"Error: {config['name']}: {e}")
+            return 1
+        summary = result.summary()
+        gated = summary['gated_fraction']
+        print(f"{config['name']:20s} {result.frames_processed:7d} {result.detections:10d} "
+              f"{'-' if gated is None else f'{100 * gated:5.1f}%':>6s}  "
+              f"{', '.join(os.path.basename(path) for path in paths) or '-'}")
+        summaries.append({'config': config, 'summary': summary, 'exports': paths})
+
+    stats = sweep.stats()
+    print(f"\nDecoded {stats['frames_decoded']} of {stats['frames_read']} frames once for all "
+          f"configurations in {seconds:.1f} s")
+    print(f"Face detection: {stats['detections']} runs, {stats['detections_shared']} shared; "
+          f"landmarks: {stats['predictions']} predicted, {stats['predictions_shared']} shared")
+
+    with atomic_write(os.path.join(args.output, "sweep_summary.json")) as f:
+        json.dump({'video_file': args.video, 'seconds': seconds, 'stats': stats,
+                   'configurations': summaries}, f, indent=2)
+    print(f"Saved {os.path.join(args.output, 'sweep_summary.json')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
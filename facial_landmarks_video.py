@@ -4,25 +4,36 @@
 # To skip frames: add --skip-frames N (e.g., --skip-frames 2 processes every other frame)
 # To export data: add --export-csv output.csv or --export-json output.json
 # To save annotated video: add --output-video output.avi
-from imutils import face_utils
-import numpy as np
+# To render annotated clips later instead: add --export-landmarks clip.landmarks.npz (see render_annotations.py)
+# To save only a stabilized crop around the mouth: add --mouth-crop mouth.mkv (frame map: mouth.csv)
+# To undistort exported coordinates: add --calibration camera_01 (folder written by calib-camera.py)
+# To skip plot_x.png/plot_y.png: add --no-plots
+# To decode through an ffmpeg pipe (grayscale at processing width): add --decoder ffmpeg
+# To decode a video only once for repeated runs: add --frame-cache DIR (memory-mapped gray frames)
+# To track an image sequence (e.g. a high-speed camera): --video 'frames/*.jpg' --fps 500
+# To pick the fastest face detector that agrees with HOG: add --detector auto
+# To track only one person (e.g. not the experimenter): add --lock-subject [FACE_ID]
+# To skip dlib on frames where the mouth does not move: add --motion-gate [THRESHOLD]
+# To Kalman-smooth the trajectory (dense, per-frame): add --kalman --export-smoothed-csv smooth.csv
+# To continue an interrupted run: add --resume (checkpoints are saved every 60 s)
+# To print machine-readable progress (e.g. for the GUI): add --progress-events
+# To feed the GUI's embedded preview: add --preview-shm NAME (a PreviewChannel created by the GUI)
 import argparse
-import imutils
-import dlib
-import cv2
 import os
+import signal
 import sys
-import json
-import matplotlib
-import matplotlib.pyplot as plt
-from scipy.signal import medfilt, find_peaks
 
 # construct the argument parser and parse the arguments
 ap = argparse.ArgumentParser()
 ap.add_argument("-p", "--shape-predictor", required=True,
 	help="path to facial landmark predictor")
 ap.add_argument("-v", "--video", default="proefpersoon 2_M.avi",
-	help="path to input video file (default: proefpersoon 2_M.avi)")
+	help="path to input video file, or an image sequence: a directory or a quoted glob "
+	     "pattern such as 'frames/*.jpg' (default: proefpersoon 2_M.avi)")
+ap.add_argument("--fps", type=float,
+	help="frame rate of an image sequence (required for image sequences)")
+ap.add_argument("--decode-threads", type=int, metavar="N",
+	help="threads decoding an image sequence (default: number of CPUs, at most 8)")
 ap.add_argument("--no-display", action="store_true",
 	help="disable video display for faster batch processing")
 ap.add_argument("--skip-frames", type=int, default=1,
@@ -31,8 +42,78 @@ ap.add_argument("--export-csv", type=str,
 	help="export mouth coordinates to CSV file")
 ap.add_argument("--export-json", type=str,
 	help="export mouth coordinates to JSON file")
+ap.add_argument("--mouth-crop", type=str, metavar="FILE",
+	help="save a stabilized, fixed-size crop around the mouth of every processed frame "
+	     "(lossless FFV1 by default, e.g. mouth.mkv) and a frame map next to it (mouth.csv)")
+ap.add_argument("--mouth-crop-size", type=str, default="128x96", metavar="WxH",
+	help="size of the mouth crop in processing pixels (default: 128x96)")
+ap.add_argument("--mouth-crop-codec", type=str, default="FFV1",
+	help="FourCC code of the mouth crop video, MJPG is written at maximum quality "
+	     "(default: FFV1, lossless)")
+ap.add_argument("--export-landmarks", type=str,
+	help="save all landmarks and face boxes to this .npz file, for rendering "
+	     "annotated clips afterwards with render_annotations.py")
 ap.add_argument("--output-video", type=str,
 	help="save annotated video to file (e.g., output.avi)")
+ap.add_argument("--calibration", type=str,
+	help="folder with cameraMatrix.txt/cameraDistortion.txt, undistorts exported coordinates")
+ap.add_argument("--undistort-lut", action="store_true",
+	help="undistort through a cached per-pixel lookup table (requires --calibration)")
+ap.add_argument("--no-plots", action="store_true",
+	help="do not save plot_x.png and plot_y.png")
+ap.add_argument("--decoder", choices=["opencv", "ffmpeg"], default="opencv",
+	help="video decoder; ffmpeg decodes straight to grayscale at processing width (default: opencv)")
+ap.add_argument("--frame-cache", type=str, metavar="DIR",
+	help="decode the video once into a memory-mapped grayscale frame cache in DIR and "
+	     "read the frames from there in later runs")
+ap.add_argument("--frame-cache-budget", type=float, default=20.0, metavar="GB",
+	help="disk budget of the frame cache, least recently used videos are deleted "
+	     "(default: 20 GB)")
+ap.add_argument("--detector", choices=["hog", "haar", "ssd", "yunet", "auto"], default="hog",
+	help="face detector; auto times the available ones on the first frames and picks "
+	     "the fastest that agrees with HOG (default: hog)")
+ap.add_argument("--haar-cascade", type=str,
+	help="Haar cascade XML for --detector haar (default: OpenCV's frontal face cascade)")
+ap.add_argument("--ssd-model", type=str,
+	help="ResNet-SSD weights for --detector ssd (e.g. res10_300x300_ssd_iter_140000.caffemodel)")
+ap.add_argument("--ssd-config", type=str,
+	help="ResNet-SSD network description for --detector ssd (e.g. deploy.prototxt)")
+ap.add_argument("--yunet-model", type=str,
+	help="YuNet ONNX model for --detector yunet (e.g. face_detection_yunet_2023mar.onnx)")
+ap.add_argument("--lock-subject", nargs="?", const="largest", metavar="FACE_ID",
+	help="only track one face: the largest face of the first frame with faces, "
+	     "or the given face id (see the face_id column of the exports)")
+ap.add_argument("--motion-gate", nargs="?", type=float, const=2.0, metavar="THRESHOLD",
+	help="reuse the previous landmarks while the mean gray level change of the "
+	     "mouth region stays below THRESHOLD (default when given: 2.0)")
+ap.add_argument("--kalman", action="store_true",
+	help="smooth the mouth trajectory with a constant-velocity Kalman smoother and "
+	     "estimate every frame, also the skipped ones (used for the plots and peaks)")
+ap.add_argument("--kalman-process-noise", type=float, default=0.5,
+	help="acceleration standard deviation in pixels/frame^2 (default: 0.5)")
+ap.add_argument("--kalman-measurement-noise", type=float, default=1.0,
+	help="landmark measurement standard deviation in pixels (default: 1.0)")
+ap.add_argument("--export-smoothed-csv", type=str,
+	help="export the smoothed per-frame coordinates and uncertainty to CSV (implies --kalman)")
+ap.add_argument("--export-smoothed-json", type=str,
+	help="export the smoothed per-frame coordinates and uncertainty to JSON (implies --kalman)")
+ap.add_argument("--seed-detection", action="store_true",
+	help="search faces around their predicted position before scanning the whole frame")
+ap.add_argument("--checkpoint", type=str,
+	help="save the progress to this file periodically and on SIGTERM "
+	     "(default with --resume: <video name>.checkpoint.npz)")
+ap.add_argument("--checkpoint-interval", type=float, default=60.0, metavar="SECONDS",
+	help="seconds between checkpoints (default: 60)")
+ap.add_argument("--resume", action="store_true",
+	help="continue from the checkpoint if there is one; the exports are the same "
+	     "as those of an uninterrupted run")
+ap.add_argument("--progress-events", action="store_true",
+	help="print JSON progress events (frames, fps, detections, ETA) prefixed with '@event '")
+ap.add_argument("--preview-shm", type=str, metavar="NAME",
+	help="write decimated preview frames and landmarks to this shared memory "
+	     "preview channel (used by the GUI)")
+ap.add_argument("--preview-fps", type=float, default=15,
+	help="preview frames per second written to --preview-shm (default: 15)")
 args = vars(ap.parse_args())
 
 # Validate input files
@@ -41,144 +122,321 @@ if not os.path.exists(args["shape_predictor"]):
 	print("Please download the model from the link provided in the README")
 	sys.exit(1)
 
-if not os.path.exists(args["video"]):
+# A directory or glob pattern is an image sequence (see ImageSequenceSource)
+image_sequence = os.path.isdir(args["video"]) or any(c in args["video"] for c in "*?[")
+if not image_sequence and not os.path.exists(args["video"]):
 	print(f"Error: Video file not found: {args['video']}")
 	sys.exit(1)
+if image_sequence:
+	if not args["fps"] or args["fps"] <= 0:
+		print("Error: --fps is required for image sequences (the recording frame rate)")
+		sys.exit(1)
+	if args["decoder"] == "ffmpeg" or args["frame_cache"]:
+		print("Error: --decoder ffmpeg and --frame-cache only read video files, not image sequences")
+		sys.exit(1)
+
+if args["export_smoothed_csv"] or args["export_smoothed_json"]:
+	args["kalman"] = True
+
+if args["resume"] and not args["checkpoint"]:
+	name = args["video"]
+	if image_sequence and not os.path.isdir(name):
+		name = os.path.dirname(name) or "sequence"
+	args["checkpoint"] = os.path.basename(os.path.normpath(name)) + ".checkpoint.npz"
+if args["checkpoint"] and args["output_video"]:
+	print("Error: --output-video cannot be resumed, do not combine it with --checkpoint/--resume")
+	sys.exit(1)
+if args["checkpoint"] and args["mouth_crop"]:
+	print("Error: --mouth-crop cannot be resumed, do not combine it with --checkpoint/--resume")
+	sys.exit(1)
+
+crop_size = None
+if args["mouth_crop"]:
+	try:
+		crop_size = tuple(int(v) for v in args["mouth_crop_size"].lower().split("x"))
+		if len(crop_size) != 2 or min(crop_size) < 8:
+			raise ValueError
+	except ValueError:
+		print(f"Error: --mouth-crop-size expects WIDTHxHEIGHT (at least 8x8), got: {args['mouth_crop_size']}")
+		sys.exit(1)
+
+subject = args["lock_subject"]
+if subject is not None and subject != "largest":
+	if not subject.isdigit() or int(subject) < 1:
+		print(f"Error: --lock-subject expects a face id (1, 2, ...), got: {subject}")
+		sys.exit(1)
+	subject = int(subject)
+
+# Heavy modules are only imported once the arguments are known, so -h and
+# argument errors return immediately. Plotting and SciPy are imported when
+# the post-processing runs.
+import numpy as np
+from tongue_tracking import (FFmpegSource, IdentityTracker, ImageSequenceSource, TongueTracker,
+                             VideoFileSource)
+from tongue_tracking.checkpoint import Checkpoint, video_signature
+from tongue_tracking.crops import MouthCropSink
+from tongue_tracking.framecache import FrameCache
+from tongue_tracking.sources import FRAME_WIDTH
+from tongue_tracking.detectors import (PROBE_FRAMES, available_detectors, create_detector,
+                                      select_detector)
+from tongue_tracking.gating import MotionGate
+from tongue_tracking.kalman import SeededDetector
+from tongue_tracking.preview import PreviewSink
+from tongue_tracking.progress import ProgressReporter
+from tongue_tracking.sinks import AnnotatedVideoSink, DisplaySink
+
+
+def save_plot(path, frames, values, label, median=True):
+	"""Save a (median filtered) coordinate trace"""
+	import matplotlib
+	matplotlib.use('Agg')  # plots are only saved, no GUI backend needed
+	import matplotlib.pyplot as plt
+	from scipy.signal import medfilt
+
+	fig = plt.figure()
+	ax = plt.subplot(111)
+	ax.plot(frames, medfilt(values) if median else values, label=label)
+	plt.title('Graphical Representation')
+	ax.legend()
+	fig.savefig(path)
+	plt.close(fig)
+	print(f"Saved {path}")
+
+
+def auto_detector(models):
+	"""Time the available detectors on the first frames and pick one"""
+	detectors, errors = available_detectors(**models)
+	for error in errors:
+		print(f"Detector not available: {error}")
+	if image_sequence:
+		probe = ImageSequenceSource(args["video"], args["fps"], workers=args["decode_threads"])
+	else:
+		probe = VideoFileSource(args["video"], color=False)
+	with probe:
+		frames = []
+		for frame in probe:
+			frames.append(frame.gray.copy())
+			if len(frames) == PROBE_FRAMES:
+				break
+	detector, report = select_detector(frames, detectors)
+	print(f"Timed {len(detectors)} detector(s) on {len(frames)} frames:")
+	for entry in report:
+		print(f"  {entry['name']:6s} {1000 * entry['seconds_per_frame']:7.1f} ms/frame  "
+		      f"{100 * entry['agreement']:5.1f}% agreement with HOG"
+		      f"{'' if entry['qualified'] else '  (rejected)'}")
+	print(f"Using the {detector.name} detector")
+	return detector
+
+
+# initialize the face detector (dlib's HOG-based one by default) and
+# then create the facial landmark predictor
+models = {
+	"haar_cascade": args["haar_cascade"],
+	"ssd_model": args["ssd_model"],
+	"ssd_config": args["ssd_config"],
+	"yunet_model": args["yunet_model"],
+}
+checkpoint = None
+resuming = False
+if args["checkpoint"]:
+	checkpoint = Checkpoint(args["checkpoint"], interval=args["checkpoint_interval"])
+	resuming = args["resume"] and checkpoint.exists()
+	if resuming and args["detector"] == "auto":
+		# Continue with the detector picked at the start, timings vary
+		try:
+			args["detector"] = checkpoint.read()["config"]["detector"]
+		except ValueError as e:
+			print(f"Error: {e}")
+			sys.exit(1)
 
-# initialize dlib's face detector (HOG-based) and then create
-# the facial landmark predictor
 try:
-    detector = dlib.get_frontal_face_detector()
-    predictor = dlib.shape_predictor(args["shape_predictor"])
+	if args["detector"] == "auto":
+		detector = auto_detector(models)
+	else:
+		detector = create_detector(args["detector"], **models)
+	if args["seed_detection"]:
+		detector = SeededDetector(detector)
+	gate = MotionGate(args["motion_gate"]) if args["motion_gate"] is not None else None
+	# Faces keep their id across frames, so several people do not end up
+	# interleaved in one trace
+	tracker = TongueTracker.from_model(args["shape_predictor"], detector=detector,
+	                                   identities=IdentityTracker(), subject=subject, gate=gate)
 except Exception as e:
-    print(f"Error initializing face detector or predictor: {e}")
-    exit(1)
-
-cap = cv2.VideoCapture(args["video"])
-
-# Check if video opened successfully
-if not cap.isOpened():
-	print(f"Error: Could not open video file: {args['video']}")
+	print(f"Error initializing face detector or predictor: {e}")
 	sys.exit(1)
 
-total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-frames_to_process = total_frames // args["skip_frames"]
+# Frames only need to be kept in color if they are drawn on
+needs_frames = args["output_video"] is not None or not args["no_display"]
+source = None
+if args["frame_cache"]:
+	cache = FrameCache(args["frame_cache"], int(args["frame_cache_budget"] * 1e9))
+	cache_options = dict(width=FRAME_WIDTH, decoder=args["decoder"])
+	try:
+		source = cache.open(args["video"], skip_frames=args["skip_frames"], color=needs_frames,
+		                    **cache_options)
+		if source is None:
+			print(f"Decoding {args['video']} into the frame cache {args['frame_cache']}...")
+			cache.build(args["video"], **cache_options)
+			source = cache.open(args["video"], skip_frames=args["skip_frames"],
+			                    color=needs_frames, **cache_options)
+		else:
+			print(f"Reading frames from the frame cache {args['frame_cache']}")
+	except (IOError, ValueError) as e:
+		print(f"Warning: Not using the frame cache: {e}")
+		source = None
+if source is None:
+	try:
+		if image_sequence:
+			source = ImageSequenceSource(args["video"], args["fps"], skip_frames=args["skip_frames"],
+			                             color=needs_frames, workers=args["decode_threads"])
+			print(f"Reading {source.total_frames} images at {args['fps']:g} fps "
+			      f"with {source.workers} decoding threads")
+		else:
+			source_class = FFmpegSource if args["decoder"] == "ffmpeg" else VideoFileSource
+			source = source_class(args["video"], skip_frames=args["skip_frames"], color=needs_frames)
+	except IOError as e:
+		print(f"Error: {e}")
+		sys.exit(1)
+
+# Everything that changes the tracked coordinates; a checkpoint written
+# with other options is not resumed
+if checkpoint is not None:
+	checkpoint.config = {
+		"video": source.signature() if image_sequence else video_signature(args["video"]),
+		"shape_predictor": os.path.abspath(args["shape_predictor"]),
+		"skip_frames": args["skip_frames"],
+		"decoder": args["decoder"],
+		"detector": detector.name,
+		"detector_models": {k: v and os.path.abspath(v) for k, v in models.items()},
+		"lock_subject": args["lock_subject"],
+		"motion_gate": args["motion_gate"],
+		"seed_detection": args["seed_detection"],
+		"landmarks": args["export_landmarks"] is not None,
+	}
+	if resuming:
+		try:
+			print(f"Resuming from {args['checkpoint']} after frame "
+			      f"{checkpoint.load()['frames_read']}")
+		except ValueError as e:
+			print(f"Error: {e}")
+			print("Delete the checkpoint or run without --resume to start over")
+			sys.exit(1)
+	# Cluster schedulers send SIGTERM before killing a preempted job
+	signal.signal(signal.SIGTERM, lambda signum, frame: checkpoint.request_stop())
 
 # Initialize video writer if output video requested
-video_writer = None
+sinks = []
 if args["output_video"]:
-	fps = cap.get(cv2.CAP_PROP_FPS)
-	fourcc = cv2.VideoWriter_fourcc(*'XVID')
-	# Video will be resized to width=500, so calculate proportional height
-	video_writer = cv2.VideoWriter(args["output_video"], fourcc, fps / args["skip_frames"],
-	                               (500, int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) * 500 / cap.get(cv2.CAP_PROP_FRAME_WIDTH))))
+	sinks.append(AnnotatedVideoSink(args["output_video"], source.fps / args["skip_frames"],
+	                                source.frame_size))
 	print(f"Saving annotated video to: {args['output_video']}")
 
-# Preallocate arrays for better performance (avoid repeated list.append())
-# We'll trim these later to actual detections
-mouth_array_x = np.zeros(frames_to_process, dtype=np.float32)
-mouth_array_y = np.zeros(frames_to_process, dtype=np.float32)
-frame_count_arr = np.zeros(frames_to_process, dtype=np.int32)
-
-print(f"Processing {total_frames} frames (every {args['skip_frames']} frame(s))...")
+if args["mouth_crop"]:
+	try:
+		mouth_crop = MouthCropSink(args["mouth_crop"], source.fps / args["skip_frames"],
+		                           source.source_size, source.frame_size, size=crop_size,
+		                           codec=args["mouth_crop_codec"])
+	except IOError as e:
+		print(f"Error: {e}")
+		sys.exit(1)
+	sinks.append(mouth_crop)
+	print(f"Saving mouth crops to: {args['mouth_crop']} (frame map: {mouth_crop.map_path})")
+
+if args["preview_shm"]:
+	try:
+		sinks.append(PreviewSink(args["preview_shm"], fps=args["preview_fps"]))
+	except (ImportError, OSError, ValueError) as e:
+		print(f"Error: Could not open preview channel {args['preview_shm']}: {e}")
+		sys.exit(1)
+
+# Only show display if not in no-display mode
+display = None
+if not args["no_display"]:
+	display = DisplaySink()
+	sinks.append(display)
+
+print(f"Processing {source.total_frames} frames (every {args['skip_frames']} frame(s))...")
 if args["no_display"]:
 	print("Display disabled for faster processing")
 
-processed_frames = 0
-detection_count = 0
-skip_counter = 0
-
-while True:
-	# Capture image-by-image
-	ret, image = cap.read()
-
-	# Check if video ended
-	if not ret:
-		print(f"\nVideo processing complete. Processed {processed_frames} frames, detected {detection_count} mouth positions.")
-		break
 
-	processed_frames += 1
-
-	# Skip frames if requested
-	skip_counter += 1
-	if skip_counter < args["skip_frames"]:
-		continue
-	skip_counter = 0
-
-	# Progress indicator
+def show_progress(processed_frames, total_frames, detection_count):
+	"""Progress indicator"""
 	if processed_frames % 100 == 0:
 		print(f"Processed {processed_frames}/{total_frames} frames ({detection_count} detections)", end='\r')
 
-	image = imutils.resize(image, width=500)
-	gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-	# detect faces in the grayscale image
-	rects = detector(gray, 1)
-
-	# Process detected faces
-	for (i, rect) in enumerate(rects):
-		# determine the facial landmarks for the face region, then
-		# convert the facial landmark (x, y)-coordinates to a NumPy
-		# array
-		shape = predictor(gray, rect)
-		shape = face_utils.shape_to_np(shape)
-
-		# Extract mouth coordinates (landmark 48 is the left corner of the mouth)
-		for (x, y) in shape[48:49]:
-			if detection_count < len(mouth_array_x):
-				mouth_array_x[detection_count] = x
-				mouth_array_y[detection_count] = y
-				frame_count_arr[detection_count] = processed_frames
-				detection_count += 1
-
-		# Draw annotations if display enabled OR video output requested
-		if not args["no_display"] or video_writer:
-			# convert dlib's rectangle to a OpenCV-style bounding box
-			# [i.e., (x, y, w, h)], then draw the face bounding box
-			(x, y, w, h) = face_utils.rect_to_bb(rect)
-			cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-			# show the face number
-			cv2.putText(image, f"Face #{i + 1}", (x - 10, y - 10),
-				cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-			# loop over the (x, y)-coordinates for the facial landmarks
-			# and draw them on the image
-			for (x, y) in shape:
-				cv2.circle(image, (x, y), 3, (0, 0, 255), -1)
-
-	# Write frame to output video if requested
-	if video_writer:
-		video_writer.write(image)
-
-	# Only show display if not in no-display mode
-	if not args["no_display"]:
-		cv2.imshow('image', image)
-		if cv2.waitKey(1) & 0xFF == ord('q'):
-			print("\nUser interrupted processing.")
-			break
 
+reporter = None
+if args["progress_events"]:
+	reporter = ProgressReporter()
+	reporter.start(video=args["video"], total_frames=source.total_frames,
+	               skip_frames=args["skip_frames"], resumed=resuming)
+progress = reporter if reporter is not None else show_progress
+
+try:
+	result = tracker.run(source, sinks, progress=progress,
+	                     checkpoint=checkpoint, resume=resuming,
+	                     keep_landmarks=args["export_landmarks"] is not None)
 finally:
-# When everything done, release the capture
-cap.release()
-if video_writer:
-	video_writer.release()
-	print(f"Saved annotated video: {args['output_video']}")
-cv2.destroyAllWindows()
+	# When everything done, release the capture
+	source.release()
 
-# Trim arrays to actual detection count
-mouth_array_x = mouth_array_x[:detection_count]
-mouth_array_y = mouth_array_y[:detection_count]
-frame_count_arr = frame_count_arr[:detection_count]
+if checkpoint is not None and checkpoint.stopped:
+	print(f"\nStopped after frame {source.frames_read}, progress saved to {args['checkpoint']}")
+	print("Run again with --resume to continue")
+	sys.exit(1)
 
-print(f"\nTotal detections: {detection_count}")
+if display is not None and display.interrupted:
+	print("\nUser interrupted processing.")
+if args["output_video"]:
+	print(f"Saved annotated video: {args['output_video']}")
+if args["mouth_crop"]:
+	print(f"Saved {mouth_crop.written} mouth crops: {args['mouth_crop']}")
+print(f"\nVideo processing complete. Processed {result.frames_processed} frames, detected {result.detections} mouth positions.")
+
+# Undistort only the detected coordinates, in a single batched call,
+# rather than remapping every pixel of every frame
+if args["calibration"]:
+	try:
+		result.undistort(args["calibration"], use_lut=args["undistort_lut"])
+	except (OSError, ValueError) as e:
+		print(f"Error loading camera calibration: {e}")
+		sys.exit(1)
+	print(f"Undistorted coordinates using calibration in {args['calibration']}")
+
+mouth_array_x = result.mouth_x
+mouth_array_y = result.mouth_y
+frame_count_arr = result.frames
+
+if result.subject is not None:
+	print(f"Tracked subject: face #{result.subject}")
+if args["seed_detection"]:
+	print(f"Seeded detection: {detector.seeded} frames searched around the predicted faces, "
+	      f"{detector.full} full-frame searches")
+if gate is not None:
+	print(f"Motion gate: {result.frames_gated} of {result.frames_tracked} frames static "
+	      f"({100 * result.summary()['gated_fraction']:.1f}%), landmarks carried forward")
+
+# Analyse the face seen most often if several were tracked
+face_ids = np.unique(result.face_ids)
+main_face = face_ids[0] if len(face_ids) else 0
+if len(face_ids) > 1:
+	main_face = np.bincount(result.face_ids).argmax()
+	keep = result.face_ids == main_face
+	print(f"{len(face_ids)} faces tracked (ids {', '.join(str(f) for f in face_ids)}); "
+	      f"plotting face #{main_face}, use --lock-subject to track only one")
+	mouth_array_x = mouth_array_x[keep]
+	mouth_array_y = mouth_array_y[keep]
+	frame_count_arr = frame_count_arr[keep]
+
+print(f"\nTotal detections: {result.detections}")
 print(f"Mouth X coordinates: {len(mouth_array_x)}")
 print(f"Mouth Y coordinates: {len(mouth_array_y)}")
 
 # Plotting the results for estimation
 
 # Check if we have valid data to plot
-if detection_count == 0:
+if result.detections == 0:
 	print("\nError: No mouth coordinates detected in the video.")
 	print("Please ensure:")
 	print("  1. The video contains visible faces")
@@ -186,6 +444,20 @@ if detection_count == 0:
 	print("  3. The video quality is sufficient for detection")
 	sys.exit(1)
 
+# Replace the raw trace by the Kalman-smoothed one, which also estimates
+# the skipped and carried-forward frames
+smoothed = None
+if args["kalman"]:
+	smoothed = result.smooth(process_noise=args["kalman_process_noise"],
+	                         measurement_noise=args["kalman_measurement_noise"])
+	main = smoothed.face_ids == main_face
+	frame_count_arr = smoothed.frames[main]
+	mouth_array_x = smoothed.mouth_x[main]
+	mouth_array_y = smoothed.mouth_y[main]
+	print(f"Kalman smoother: {main.sum()} frames estimated from "
+	      f"{smoothed.measured[main].sum()} measurements "
+	      f"(mean std {smoothed.std[main].mean():.2f} px)")
+
 # Check for zero sum to avoid division by zero
 x_sum = np.sum(mouth_array_x)
 if x_sum == 0:
@@ -196,57 +468,47 @@ else:
 
 y = mouth_array_y
 
+from scipy.signal import find_peaks
+
 peak_estimates = find_peaks(x)
 print(f"\nPeak estimates: {peak_estimates[0]}")
 array_len = len(peak_estimates[0])
 
-fig = plt.figure()
-ax = plt.subplot(111)
-ax.plot(frame_count_arr, medfilt(x), label='Relative Motion of X-Coordinates')
-plt.title('Graphical Representation')
-ax.legend()
-fig.savefig('plot_x.png')
-plt.close(fig)
-print("Saved plot_x.png")
-
-fig = plt.figure()
-ax = plt.subplot(111)
-ax.plot(frame_count_arr, medfilt(y), label='Relative Motion of Y-Coordinates')
-plt.title('Graphical Representation')
-ax.legend()
-fig.savefig('plot_y.png')
-plt.close(fig)
-print("Saved plot_y.png")
+if not args["no_plots"]:
+	save_plot('plot_x.png', frame_count_arr, x, 'Relative Motion of X-Coordinates', median=smoothed is None)
+	save_plot('plot_y.png', frame_count_arr, y, 'Relative Motion of Y-Coordinates', median=smoothed is None)
 
 # Export data to CSV if requested
 if args["export_csv"]:
-	import csv
-	with open(args["export_csv"], 'w', newline='') as csvfile:
-		writer = csv.writer(csvfile)
-		writer.writerow(['frame', 'mouth_x', 'mouth_y'])
-		for i in range(detection_count):
-			writer.writerow([frame_count_arr[i], mouth_array_x[i], mouth_array_y[i]])
+	result.export_csv(args["export_csv"])
 	print(f"Exported data to CSV: {args['export_csv']}")
 
 # Export data to JSON if requested
 if args["export_json"]:
-	data = {
-		'video_file': args['video'],
-		'total_frames': total_frames,
-		'frames_processed': processed_frames,
-		'detections': detection_count,
-		'skip_frames': args['skip_frames'],
-		'coordinates': [
-			{
-				'frame': int(frame_count_arr[i]),
-				'mouth_x': float(mouth_array_x[i]),
-				'mouth_y': float(mouth_array_y[i])
-			}
-			for i in range(detection_count)
-		]
-	}
-	with open(args["export_json"], 'w') as jsonfile:
-		json.dump(data, jsonfile, indent=2)
+	result.export_json(args["export_json"])
 	print(f"Exported data to JSON: {args['export_json']}")
 
+if args["export_landmarks"]:
+	result.export_landmarks(args["export_landmarks"])
+	print(f"Exported landmarks: {args['export_landmarks']}")
+
+if args["export_smoothed_csv"]:
+	smoothed.export_csv(args["export_smoothed_csv"])
+	print(f"Exported smoothed data to CSV: {args['export_smoothed_csv']}")
+
+if args["export_smoothed_json"]:
+	smoothed.export_json(args["export_smoothed_json"])
+	print(f"Exported smoothed data to JSON: {args['export_smoothed_json']}")
+
+# The run is complete, a later --resume starts over
+if checkpoint is not None:
+	checkpoint.remove()
+
+if reporter is not None:
+	reporter.finish(frames=result.frames_processed, detections=result.detections,
+	                exports=[path for path in (args["export_csv"], args["export_json"],
+	                                          args["export_landmarks"],
+	                                          args["export_smoothed_csv"], args["export_smoothed_json"],
+	                                          args["output_video"], args["mouth_crop"]) if path])
+
 print("\nProcessing complete!")
@@ -4,14 +4,14 @@ Real-time tongue tip tracking using webcam
 
 This script performs real-time facial landmark detection and tongue tracking
 using a webcam feed. Press 'q' to quit, 'r' to start/stop recording.
+
+With --replay VIDEO a recorded file stands in for the camera: it is played
+back in real time at its native frame rate (frames are dropped when the
+tracking falls behind), so the live path can be tested without a camera.
 """
-from imutils import face_utils
-import numpy as np
 import argparse
-import imutils
-import dlib
-import cv2
 import os
+import signal
 import sys
 import json
 import time
@@ -24,6 +24,10 @@ def main():
         help="path to facial landmark predictor")
     ap.add_argument("-c", "--camera", type=int, default=0,
         help="camera device index (default: 0)")
+    ap.add_argument("--replay", type=str, metavar="VIDEO",
+        help="replay a video file in real time instead of reading a camera")
+    ap.add_argument("--replay-jitter", type=float, default=0.0, metavar="MS",
+        help="delay replayed frames by a random 0..MS milliseconds, reproducibly (default: 0)")
     ap.add_argument("-w", "--width", type=int, default=640,
         help="frame width (default: 640)")
     ap.add_argument("-r", "--record", action="store_true",
@@ -34,6 +38,22 @@ def main():
         help="export mouth coordinates to JSON file")
     ap.add_argument("--fps", type=int, default=30,
         help="target FPS for recording (default: 30)")
+    ap.add_argument("--calibration", type=str,
+        help="folder with cameraMatrix.txt/cameraDistortion.txt, undistorts exported coordinates")
+    ap.add_argument("--undistort-lut", action="store_true",
+        help="undistort through a cached per-pixel lookup table (requires --calibration)")
+    ap.add_argument("--lock-subject", nargs="?", const="largest", metavar="FACE_ID",
+        help="only track one face: the largest face when tracking starts, or the given face id")
+    ap.add_argument("--no-display", action="store_true",
+        help="do not open a window (stop with SIGTERM or Ctrl-C; use with --record)")
+    ap.add_argument("--preview-shm", type=str, metavar="NAME",
+        help="write decimated preview frames and landmarks to this shared memory "
+             "preview channel (used by the GUI)")
+    ap.add_argument("--latency-log", type=str, metavar="FILE",
+        help="write per-frame capture/detect/landmarks/publish timestamps and latencies to "
+             "this CSV file, and a latency summary next to it (FILE with .json)")
+    ap.add_argument("--progress-events", action="store_true",
+        help="print JSON progress events (frames, fps, detections) prefixed with '@event '")
     args = vars(ap.parse_args())
 
     # Validate model file
@@ -42,84 +62,138 @@ def main():
         print("Please download the model from the link provided in the README")
         sys.exit(1)
 
+    if args["replay"] and not os.path.exists(args["replay"]):
+        print(f"Error: Video file not found: {args['replay']}")
+        sys.exit(1)
+
+    subject = args["lock_subject"]
+    if subject is not None and subject != "largest":
+        if not subject.isdigit() or int(subject) < 1:
+            print(f"Error: --lock-subject expects a face id (1, 2, ...), got: {subject}")
+            sys.exit(1)
+        subject = int(subject)
+
+    # Heavy modules are only imported once the arguments are known
+    import numpy as np
+    import cv2
+    from tongue_tracking import TongueTracker, CameraSource, IdentityTracker, ReplaySource
+    from tongue_tracking.calibration import load_calibration, PointUndistorter
+    from tongue_tracking.latency import LatencyMonitor, summary_path
+    from tongue_tracking.preview import PreviewSink
+    from tongue_tracking.progress import ProgressReporter
+    from tongue_tracking.sinks import annotate
+
+    camera_matrix = None
+    if args["calibration"]:
+        try:
+            camera_matrix, dist_coeffs = load_calibration(args["calibration"])
+        except (OSError, ValueError) as e:
+            print(f"Error loading camera calibration: {e}")
+            sys.exit(1)
+
     # Initialize dlib's face detector and shape predictor
     print("Loading facial landmark predictor...")
-    detector = dlib.get_frontal_face_detector()
-    predictor = dlib.shape_predictor(args["shape_predictor"])
+    tracker = TongueTracker.from_model(args["shape_predictor"], identities=IdentityTracker(),
+                                       subject=subject)
 
     # Initialize webcam
-    print(f"Initializing camera {args['camera']}...")
-    cap = cv2.VideoCapture(args["camera"])
-
-    if not cap.isOpened():
-        print(f"Error: Could not open camera {args['camera']}")
-        print("Try a different camera index with --camera N")
-        sys.exit(1)
-
-    # Set camera properties
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, args["width"])
-    cap.set(cv2.CAP_PROP_FPS, args["fps"])
+    if args["replay"]:
+        print(f"Replaying {args['replay']} as a camera...")
+        try:
+            source = ReplaySource(args["replay"], width=args["width"], color=not args["no_display"],
+                                  jitter=args["replay_jitter"] / 1000.0)
+        except IOError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    else:
+        print(f"Initializing camera {args['camera']}...")
+        try:
+            source = CameraSource(args["camera"], width=args["width"], fps=args["fps"],
+                                  color=not args["no_display"])
+        except IOError:
+            print(f"Error: Could not open camera {args['camera']}")
+            print("Try a different camera index with --camera N")
+            sys.exit(1)
 
     # Get actual camera properties
-    actual_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    actual_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    actual_fps = int(cap.get(cv2.CAP_PROP_FPS))
+    actual_width, actual_height = source.source_size
+    actual_fps = int(source.fps)
 
     print(f"Camera initialized: {actual_width}x{actual_height} @ {actual_fps} FPS")
-    print("\nControls:")
-    print("  'q' - Quit")
-    print("  'r' - Start/Stop recording")
-    print("  'c' - Clear recorded data")
-    print("\nPress any key to start...")
-
-    cv2.waitKey(0)
+    display = not args["no_display"]
+    if display:
+        print("\nControls:")
+        print("  'q' - Quit")
+        print("  'r' - Start/Stop recording")
+        print("  'c' - Clear recorded data")
+        print("\nPress any key to start...")
+
+        cv2.waitKey(0)
+
+    preview = None
+    if args["preview_shm"]:
+        try:
+            preview = PreviewSink(args["preview_shm"])
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Error: Could not open preview channel {args['preview_shm']}: {e}")
+            source.release()
+            sys.exit(1)
 
     # Arrays to store tracking data
     mouth_array_x = []
     mouth_array_y = []
     timestamp_arr = []
     frame_count_arr = []
+    face_id_arr = []
 
     # Recording state
     is_recording = args["record"]
     recording_started = False
     frame_count = 0
-    start_time = time.time()
+    source.restart_clock()
 
     # FPS calculation
     fps_start_time = time.time()
     fps_frame_count = 0
     current_fps = 0
 
-    print("\nTracking started. Press 'q' to quit.")
-
+    # Capture-to-result latency of every frame
     try:
-        while True:
-            # Capture frame
-            ret, frame = cap.read()
+        latency = LatencyMonitor(fps=source.fps, path=args["latency_log"])
+    except OSError as e:
+        print(f"Error: Could not write latency log {args['latency_log']}: {e}")
+        source.release()
+        sys.exit(1)
 
-            if not ret:
-                print("Error: Failed to grab frame")
-                break
+    # SIGTERM (e.g. the GUI's Stop button) ends the session like 'q', so
+    # the recorded data is still exported
+    stop_requested = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_requested.append(signum))
 
-            frame_count += 1
-            current_time = time.time() - start_time
+    reporter = None
+    if args["progress_events"]:
+        reporter = ProgressReporter()
+        reporter.start(camera=args["replay"] or args["camera"], total_frames=0)
 
-            # Resize frame for faster processing
-            frame = imutils.resize(frame, width=args["width"])
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    print("\nTracking started. Press 'q' to quit.")
 
-            # Detect faces
-            rects = detector(gray, 1)
+    try:
+        for captured_frame in source:
+            latency.begin(captured_frame.index, source.capture_time)
+            result = tracker.process_frame(captured_frame)
+            latency.landmarks_ready()
+            frame = result.frame.image
+            frame_count = result.frame.index
+            current_time = result.frame.timestamp
+
+            # Draw bounding boxes, face numbers and all facial landmarks
+            if display:
+                annotate(result, radius=2)
 
             # Process detected faces
-            for (i, rect) in enumerate(rects):
-                # Get facial landmarks
-                shape = predictor(gray, rect)
-                shape = face_utils.shape_to_np(shape)
-
+            for face in result.faces:
                 # Extract mouth coordinates (landmark 48 is left corner of mouth)
-                mouth_x, mouth_y = shape[48]
+                mouth_x, mouth_y = (int(v) for v in face.mouth)
 
                 # Store data if recording
                 if is_recording:
@@ -127,22 +201,14 @@ def main():
                     mouth_array_y.append(mouth_y)
                     timestamp_arr.append(current_time)
                     frame_count_arr.append(frame_count)
+                    face_id_arr.append(face.face_id)
 
                     if not recording_started:
                         recording_started = True
                         print("Recording started!")
 
-                # Draw bounding box
-                (x, y, w, h) = face_utils.rect_to_bb(rect)
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-                # Draw face number
-                cv2.putText(frame, f"Face #{i + 1}", (x - 10, y - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-                # Draw all facial landmarks
-                for (lx, ly) in shape:
-                    cv2.circle(frame, (lx, ly), 2, (0, 0, 255), -1)
+                if not display:
+                    continue
 
                 # Highlight mouth landmark
                 cv2.circle(frame, (mouth_x, mouth_y), 5, (255, 0, 0), -1)
@@ -159,28 +225,47 @@ def main():
                 fps_frame_count = 0
                 fps_start_time = time.time()
 
-            # Draw status information
-            status_text = "REC" if is_recording else "PAUSED"
-            status_color = (0, 0, 255) if is_recording else (0, 255, 255)
-            cv2.putText(frame, status_text, (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2)
+            if preview is not None:
+                preview.write(result)
+            if reporter is not None:
+                reporter(frame_count, 0, len(mouth_array_x))
+
+            key = -1
+            if display:
+                # Draw status information
+                status_text = "REC" if is_recording else "PAUSED"
+                status_color = (0, 0, 255) if is_recording else (0, 255, 255)
+                cv2.putText(frame, status_text, (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2)
 
-            cv2.putText(frame, f"FPS: {current_fps:.1f}", (10, 60),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                cv2.putText(frame, f"FPS: {current_fps:.1f}", (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
-            cv2.putText(frame, f"Frames: {frame_count}", (10, 85),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                cv2.putText(frame, f"Frames: {frame_count}", (10, 85),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
-            cv2.putText(frame, f"Detections: {len(mouth_array_x)}", (10, 110),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                cv2.putText(frame, f"Detections: {len(mouth_array_x)}", (10, 110),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
-            # Display frame
-            cv2.imshow('Tongue Tip Tracking (Webcam)', frame)
+                # Rolling latency of the previous frames, the current one
+                # is published by imshow()
+                p = latency.percentiles()
+                if p:
+                    cv2.putText(frame, f"Latency p50/p95/p99: {p[50]:.0f}/{p[95]:.0f}/{p[99]:.0f} ms",
+                        (10, 135), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                cv2.putText(frame, f"Dropped: {latency.dropped}", (10, 160),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
-            # Handle keyboard input
-            key = cv2.waitKey(1) & 0xFF
+                # Display frame
+                cv2.imshow('Tongue Tip Tracking (Webcam)', frame)
 
-            if key == ord('q'):
+            latency.published()
+
+            if display:
+                # Handle keyboard input
+                key = cv2.waitKey(1) & 0xFF
+
+            if key == ord('q') or stop_requested:
                 print("\nQuitting...")
                 break
             elif key == ord('r'):
@@ -194,33 +279,69 @@ def main():
                 mouth_array_y.clear()
                 timestamp_arr.clear()
                 frame_count_arr.clear()
-                frame_count = 0
-                start_time = time.time()
+                face_id_arr.clear()
+                source.restart_clock()
                 recording_started = False
                 print("Data cleared")
+        else:
+            if args["replay"]:
+                print("\nReplay finished")
+            else:
+                print("Error: Failed to grab frame")
 
     except KeyboardInterrupt:
         print("\nInterrupted by user")
 
     finally:
         # Cleanup
-        cap.release()
-        cv2.destroyAllWindows()
+        source.release()
+        if args["replay"]:
+            print(f"Replayed {source.published} frames at {source.fps:.1f} FPS, "
+                  f"{source.dropped} dropped while tracking")
+        latency.close()
+        if latency.frames:
+            summary = latency.summary()
+            print("\nLatency (ms)      p50     p95     p99     max")
+            for name in ("queue", "tracking", "publish", "total"):
+                stats = summary[name]
+                print(f"  {name:12s} {stats['p50']:7.1f} {stats['p95']:7.1f} {stats['p99']:7.1f} "
+                      f"{stats['max']:7.1f}")
+            print(f"  {latency.dropped} frames dropped of {latency.frames + latency.dropped}")
+            if args["latency_log"]:
+                print(f"Saved latency log: {args['latency_log']} "
+                      f"(summary: {summary_path(args['latency_log'])})")
+        if preview is not None:
+            preview.close()
+        if display:
+            cv2.destroyAllWindows()
 
         # Export data if requested
         if len(mouth_array_x) > 0:
             print(f"\nRecorded {len(mouth_array_x)} data points")
 
+            # Undistort the recorded coordinates in one batched call
+            if camera_matrix is not None:
+                frame_size = (args["width"], int(actual_height * args["width"] / float(actual_width)))
+                undistorter = PointUndistorter(
+                    camera_matrix, dist_coeffs, (actual_width, actual_height), frame_size,
+                    use_lut=args["undistort_lut"],
+                    cache_dir=os.path.join(args["calibration"], ".undistort_cache"))
+                points = undistorter.undistort(np.column_stack((mouth_array_x, mouth_array_y)))
+                mouth_array_x = points[:, 0].tolist()
+                mouth_array_y = points[:, 1].tolist()
+                print(f"Undistorted coordinates using calibration in {args['calibration']}")
+
             # Export to CSV
             if args["export_csv"]:
                 import csv
                 with open(args["export_csv"], 'w', newline='') as csvfile:
                     writer = csv.writer(csvfile)
-                    writer.writerow(['frame', 'timestamp', 'mouth_x', 'mouth_y'])
+                    writer.writerow(['frame', 'timestamp', 'face_id', 'mouth_x', 'mouth_y'])
                     for i in range(len(mouth_array_x)):
                         writer.writerow([
                             frame_count_arr[i],
                             timestamp_arr[i],
+                            face_id_arr[i],
                             mouth_array_x[i],
                             mouth_array_y[i]
                         ])
@@ -231,15 +352,20 @@ def main():
                 data = {
                     'recording_date': datetime.now().isoformat(),
                     'camera_index': args['camera'],
+                    'replay': args['replay'],
                     'frame_width': args['width'],
                     'target_fps': args['fps'],
                     'total_frames': frame_count,
                     'detections': len(mouth_array_x),
                     'duration_seconds': timestamp_arr[-1] if timestamp_arr else 0,
+                    'undistorted': camera_matrix is not None,
+                    'calibration': args['calibration'],
+                    'subject': tracker.subject if tracker.subject != "largest" else None,
                     'coordinates': [
                         {
                             'frame': int(frame_count_arr[i]),
                             'timestamp': float(timestamp_arr[i]),
+                            'face_id': int(face_id_arr[i]),
                             'mouth_x': float(mouth_array_x[i]),
                             'mouth_y': float(mouth_array_y[i])
                         }
@@ -254,5 +380,10 @@ def main():
         else:
             print("\nNo data recorded")
 
+        if reporter is not None:
+            reporter.finish(frames=frame_count, detections=len(mouth_array_x),
+                            exports=[path for path in (args["export_csv"], args["export_json"])
+                                     if path and mouth_array_x])
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,27 @@
+function [frames, info] = load_frame_cache(indexFile)
+% LOAD_FRAME_CACHE Map the frames of a frame cache entry without decoding
+%
+%   [frames, info] = load_frame_cache('cache/clip_500_520ec646bc8c.json')
+%
+% The entry is written by facial_landmarks_video.py --frame-cache or
+% python -m tongue_tracking.framecache build. Frames are grayscale uint8
+% at the processing width, stored row by row, so frame k is
+%
+%   frameGray = frames.Data.pixels(:, :, k)';
+%
+% and info holds the index (frames, width, height, fps, source_size, ...).
+
+if ~isfile(indexFile)
+    error('Frame cache index not found: %s', indexFile);
+end
+
+info = jsondecode(fileread(indexFile));
+dataFile = fullfile(fileparts(indexFile), info.data_file);
+if ~isfile(dataFile)
+    error('Frame cache data not found: %s', dataFile);
+end
+
+% width x height per frame, as MATLAB arrays are column-major
+frames = memmapfile(dataFile, 'Format', ...
+    {'uint8', [info.width info.height info.frames], 'pixels'}, 'Repeat', 1);
+end
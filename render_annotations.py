@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Render an annotated review video from stored landmarks
+
+Draws the faces and landmarks saved by ``facial_landmarks_video.py
+--export-landmarks`` on the original video, only for the requested frame
+ranges, so tracking runs do not have to draw and encode every frame.
+
+Usage:
+    python facial_landmarks_video.py -p model.dat -v clip.avi --no-display \
+        --export-landmarks clip.landmarks.npz
+    python render_annotations.py -l clip.landmarks.npz -o review.avi --frames 100-400,900-1200
+"""
+import argparse
+import os
+import sys
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render an annotated video from stored landmarks")
+    ap.add_argument("-l", "--landmarks", required=True,
+        help="landmarks file written with --export-landmarks")
+    ap.add_argument("-o", "--output", required=True,
+        help="annotated video to write")
+    ap.add_argument("-v", "--video",
+        help="tracked video (default: the video recorded in the landmarks file)")
+    ap.add_argument("--frames", default="",
+        help="frame ranges to render, e.g. 100-400,900-1200,5000- (default: all frames)")
+    ap.add_argument("--width", type=int,
+        help="width of the output video (default: the width of the input video)")
+    ap.add_argument("--codec", default="XVID",
+        help="FourCC code of the output video (default: XVID)")
+    ap.add_argument("--radius", type=int,
+        help="radius of the landmark dots (default: scaled with the width)")
+    ap.add_argument("--no-frame-numbers", action="store_true",
+        help="do not show the frame number in the corner")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.landmarks):
+        print(f"Error: File not found: {args.landmarks}")
+        return 1
+
+    from tongue_tracking.render import Annotations, parse_ranges, render_video
+
+    try:
+        annotations = Annotations.load(args.landmarks)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    video = args.video or annotations.meta.get('video_file')
+    if not video or not os.path.exists(video):
+        print(f"Error: Video file not found: {video}")
+        print("Pass the tracked video with --video")
+        return 1
+
+    ranges = None
+    if args.frames.strip():
+        try:
+            ranges = parse_ranges(args.frames, annotations.meta.get('total_frames') or 0)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        print(f"Rendering {sum(last - first + 1 for first, last in ranges)} frames of {video}...")
+    else:
+        print(f"Rendering all frames of {video}...")
+    try:
+        stats = render_video(annotations, video, args.output, ranges, width=args.width,
+                             codec=args.codec, radius=args.radius,
+                             frame_numbers=not args.no_frame_numbers)
+    except IOError as e:
+        print(f"Error: {e}")
+        return 1
+    fps = stats['frames'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"Saved {args.output} ({stats['frames']} frames, {fps:.1f} frames/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -53,6 +53,7 @@ setup(
             'flake8>=3.8',
         ],
     },
+    packages=find_packages(exclude=['tests', 'tests.*', 'examples']),
     py_modules=['facial_landmarks_video', 'calib-camera'],
     scripts=[
         'facial_landmarks_video.py',
@@ -0,0 +1,148 @@
+"""
+Tests for the resumable batch runner
+"""
+import json
+import sys
+import threading
+
+import pytest
+
+from tongue_tracking.batch import (
+    BatchJob, Manifest, run_batch, format_summary, DONE, FAILED, PENDING, RUNNING
+)
+
+WRITE_OUTPUT = (
+    "import json, sys; "
+    "open(sys.argv[1], 'a').write('run\\n'); "
+    "json.dump({'frames_processed': 50}, open(sys.argv[2], 'w'))"
+)
+
+
+def make_job(tmp_path, name, code=WRITE_OUTPUT):
+    """Job that appends to a log file and writes a small JSON export"""
+    log = str(tmp_path / f"{name}.log")
+    info = str(tmp_path / f"{name}.json")
+    cmd = [sys.executable, "-c", code, log, info]
+    return BatchJob(name, cmd, [log, info], info_path=info)
+
+
+def test_completed_jobs_are_skipped(tmp_path):
+    """A second run does not redo finished jobs"""
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    jobs = [make_job(tmp_path, f"video{i}") for i in range(3)]
+
+    results = run_batch(jobs, manifest, workers=2)
+    assert [entry['state'] for _, entry, _ in results] == [DONE] * 3
+    assert all(entry['frames'] == 50 for _, entry, _ in results)
+
+    # Reload the manifest from disk as a new invocation would
+    results = run_batch(jobs, Manifest(str(tmp_path / "manifest.json")), workers=2)
+    assert all(skipped for _, _, skipped in results)
+    assert open(jobs[0].outputs[0]).read() == "run\n"
+
+
+def test_changed_output_is_reprocessed(tmp_path):
+    """Jobs whose outputs changed since they finished are run again"""
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    job = make_job(tmp_path, "video")
+    run_batch([job], manifest)
+
+    with open(job.outputs[0], 'a') as f:
+        f.write("edited\n")
+    (_, entry, skipped), = run_batch([job], manifest)
+    assert not skipped and entry['state'] == DONE
+
+
+def test_interrupted_job_is_resumed(tmp_path):
+    """Jobs left in the running state by a killed run are started again"""
+    path = str(tmp_path / "manifest.json")
+    job = make_job(tmp_path, "video")
+    manifest = Manifest(path)
+    manifest.update(job.key, state=RUNNING, attempts=1)
+
+    (_, entry, skipped), = run_batch([job], Manifest(path))
+    assert not skipped
+    assert entry['state'] == DONE
+    assert entry['attempts'] == 1
+
+
+def test_failed_job_is_retried(tmp_path):
+    """A failing job is attempted 1 + retries times and keeps its error"""
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    job = make_job(tmp_path, "broken", code="import sys; print('boom'); sys.exit(3)")
+
+    (_, entry, _), = run_batch([job], manifest, retries=2)
+    assert entry['state'] == FAILED
+    assert entry['attempts'] == 3
+    assert 'boom' in entry['error']
+
+    with open(manifest.path) as f:
+        assert json.load(f)['jobs']['broken']['state'] == FAILED
+
+
+def test_exception_in_job_fails_only_that_job(tmp_path):
+    """Any exception of a run callable is recorded and retried"""
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    calls = []
+
+    def malformed_reply():
+        calls.append(1)
+        return {}['returncode']
+
+    broken = BatchJob("broken", None, [], run=malformed_reply)
+    results = run_batch([broken, make_job(tmp_path, "video")], manifest, retries=1)
+    assert [entry['state'] for _, entry, _ in results] == [FAILED, DONE]
+    assert len(calls) == 2
+    assert results[0][1]['error'] == "KeyError: 'returncode'"
+
+
+def test_interrupt_stops_queued_jobs(tmp_path):
+    """Ctrl-C cancels the queue and does not retry the jobs it interrupted"""
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    calls = []
+    release = threading.Event()
+    finished = threading.Event()
+
+    def interrupted_child():
+        # Stands in for a child that exits non-zero on the same SIGINT
+        calls.append('slow')
+        release.wait(5)
+        finished.set()
+        return -2, "KeyboardInterrupt"
+
+    def run(name):
+        calls.append(name)
+        return 0, ""
+
+    jobs = [BatchJob("first", None, [], run=lambda: run("first")),
+            BatchJob("slow", None, [], run=interrupted_child)]
+    jobs += [BatchJob(f"queued{i}", None, [], run=lambda i=i: run(f"queued{i}"))
+             for i in range(3)]
+
+    def on_finish(job, entry):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        run_batch(jobs, manifest, workers=1, retries=2, on_finish=on_finish)
+    release.set()
+    if 'slow' in calls:
+        assert finished.wait(5)
+    # Give the worker the chance to (wrongly) retry or start another job
+    threading.Event().wait(0.2)
+
+    assert calls in (['first'], ['first', 'slow'])
+    assert manifest.get("first")['state'] == DONE
+    assert manifest.get("slow")['state'] in (RUNNING, PENDING)
+    assert manifest.get("slow")['attempts'] <= 1
+    assert all(manifest.get(f"queued{i}")['state'] == PENDING for i in range(3))
+
+
+def test_format_summary(tmp_path):
+    """The summary table has a header, a rule and one row per job"""
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    results = run_batch([make_job(tmp_path, "video")], manifest)
+    lines = format_summary(results).splitlines()
+
+    assert lines[0].split() == ['Video', 'State', 'Tries', 'Time', '(s)', 'Frames', 'FPS']
+    assert len(lines) == 3
+    assert lines[2].split()[:2] == ['video', DONE]
@@ -0,0 +1,141 @@
+"""
+Tests for chessboard detection and the corner cache
+"""
+import numpy as np
+import cv2
+
+from tongue_tracking.calibration import (
+    CornerCache, corner_coverage, detect_corners_cached, detection_params,
+    file_hash, find_chessboard_corners, reprojection_errors, select_diverse_views
+)
+
+CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+PATTERN = (7, 6)  # inner corners (cols, rows)
+
+
+def make_chessboard(square=60, size=(1600, 1200), origin=(300, 250)):
+    """Render a chessboard with PATTERN inner corners, return image and corners"""
+    img = np.full((size[1], size[0]), 255, dtype=np.uint8)
+    ox, oy = origin
+    for r in range(PATTERN[1] + 1):
+        for c in range(PATTERN[0] + 1):
+            if (r + c) % 2 == 0:
+                img[oy + r * square:oy + (r + 1) * square,
+                    ox + c * square:ox + (c + 1) * square] = 0
+    grid = np.mgrid[1:PATTERN[0] + 1, 1:PATTERN[1] + 1].T.reshape(-1, 2)
+    corners = (grid * square + np.array(origin)).astype(np.float32) - 0.5
+    return img, corners
+
+
+def test_coarse_to_fine_detection():
+    """Corners found on the downscaled image are refined at full resolution"""
+    img, expected = make_chessboard()
+    found, corners = find_chessboard_corners(img, PATTERN, CRITERIA, coarse_max_dim=640)
+
+    assert found
+    assert corners.shape == (PATTERN[0] * PATTERN[1], 1, 2)
+    # Detected order may be reversed, compare as point sets
+    dists = np.linalg.norm(corners.reshape(-1, 1, 2) - expected[None], axis=2)
+    assert dists.min(axis=1).max() < 1.0
+
+
+def test_no_pattern():
+    """Images without a board are rejected"""
+    blank = np.full((600, 800), 128, dtype=np.uint8)
+    found, corners = find_chessboard_corners(blank, PATTERN, CRITERIA)
+    assert not found
+    assert corners is None
+
+
+def test_corner_cache_roundtrip(tmp_path):
+    """Second detection of the same file comes from the cache"""
+    img, _ = make_chessboard()
+    fname = str(tmp_path / "board.png")
+    cv2.imwrite(fname, img)
+    cache = CornerCache(str(tmp_path / "cache"))
+
+    found, corners, size, cached = detect_corners_cached(fname, PATTERN, CRITERIA, cache)
+    assert found and not cached
+    assert size == (1600, 1200)
+
+    found2, corners2, size2, cached2 = detect_corners_cached(fname, PATTERN, CRITERIA, cache)
+    assert found2 and cached2
+    assert size2 == size
+    np.testing.assert_allclose(corners2, corners)
+
+    # A different pattern size is a separate cache entry
+    assert cache.load(file_hash(fname), (6, 5), detection_params(CRITERIA)) is None
+
+
+def test_corner_cache_keyed_by_detection_params(tmp_path):
+    """Changing the coarse search size or the refinement criteria misses the cache"""
+    img, _ = make_chessboard()
+    fname = str(tmp_path / "board.png")
+    cv2.imwrite(fname, img)
+    cache = CornerCache(str(tmp_path / "cache"))
+
+    assert not detect_corners_cached(fname, PATTERN, CRITERIA, cache, 640)[3]
+    assert detect_corners_cached(fname, PATTERN, CRITERIA, cache, 640)[3]
+    assert not detect_corners_cached(fname, PATTERN, CRITERIA, cache, 400)[3]
+    criteria = (CRITERIA[0], 10, CRITERIA[2])
+    assert not detect_corners_cached(fname, PATTERN, criteria, cache, 640)[3]
+    assert detect_corners_cached(fname, PATTERN, criteria, cache, 640)[3]
+
+
+def test_corner_cache_failed_detection(tmp_path):
+    """Failed detections are cached too"""
+    fname = str(tmp_path / "blank.png")
+    cv2.imwrite(fname, np.full((300, 400), 200, dtype=np.uint8))
+    cache = CornerCache(str(tmp_path / "cache"))
+
+    assert detect_corners_cached(fname, PATTERN, CRITERIA, cache)[0] is False
+    found, corners, size, cached = detect_corners_cached(fname, PATTERN, CRITERIA, cache)
+    assert not found and cached
+    assert corners is None
+
+
+def synthetic_views(n_poses=5, copies=4, seed=0):
+    """Project a board from a few poses, each captured several times"""
+    rng = np.random.default_rng(seed)
+    K = np.array([[800.0, 0, 320], [0, 800.0, 240], [0, 0, 1]])
+    dist = np.zeros(5)
+    objp = np.zeros((PATTERN[0] * PATTERN[1], 3), np.float32)
+    objp[:, :2] = np.mgrid[0:PATTERN[0], 0:PATTERN[1]].T.reshape(-1, 2)
+    imgpoints, groups = [], []
+    for p in range(n_poses):
+        rvec = rng.uniform(-0.5, 0.5, 3)
+        tvec = np.array([rng.uniform(-4, 0), rng.uniform(-3, 0), rng.uniform(12, 20)])
+        for _ in range(copies):
+            pts, _ = cv2.projectPoints(objp, rvec, tvec, K, dist)
+            imgpoints.append((pts + rng.normal(0, 0.05, pts.shape)).astype(np.float32))
+            groups.append(p)
+    return objp, imgpoints, groups, K, dist
+
+
+def test_select_diverse_views_skips_duplicates():
+    """One view per distinct pose is picked before any near-duplicate"""
+    _, imgpoints, groups, _, _ = synthetic_views()
+    selected = select_diverse_views(imgpoints, (640, 480), PATTERN, 5)
+
+    assert selected == sorted(set(selected))
+    assert sorted(groups[i] for i in selected) == [0, 1, 2, 3, 4]
+    assert select_diverse_views(imgpoints, (640, 480), PATTERN, 50) == list(range(20))
+
+
+def test_corner_coverage():
+    """Coverage of a subset never exceeds coverage of the full set"""
+    _, imgpoints, _, _, _ = synthetic_views()
+    full = corner_coverage(imgpoints, (640, 480))
+    single = corner_coverage(imgpoints[:1], (640, 480))
+
+    assert 0.0 < single <= full <= 1.0
+    assert corner_coverage([], (640, 480)) == 0.0
+
+
+def test_reprojection_errors_held_out_views():
+    """Views without a pose are posed with solvePnP before projection"""
+    objp, imgpoints, _, K, dist = synthetic_views()
+    errors = reprojection_errors([objp] * len(imgpoints), imgpoints, K, dist)
+
+    assert errors.shape == (len(imgpoints),)
+    assert np.all(errors < 0.1)
@@ -0,0 +1,124 @@
+"""
+Tests for checkpointing and resuming runs
+"""
+import shutil
+
+import numpy as np
+import pytest
+
+from tongue_tracking import TongueTracker, Frame, FFmpegSource, IdentityTracker, VideoFileSource
+from tongue_tracking.checkpoint import Checkpoint
+from tongue_tracking.gating import MotionGate
+from tests.test_tracker import FakeDetector, FakePredictor, FakeSource, write_clip
+
+
+class SeekableSource(FakeSource):
+    """FakeSource that can continue after a number of frames"""
+
+    total_frames = 12
+
+    def __init__(self, frames):
+        super().__init__(frames)
+        self.start = 0
+        self.read = 0
+
+    @property
+    def frames_read(self):
+        return self.read
+
+    def seek(self, frame):
+        self.start = self.read = frame
+
+    def __iter__(self):
+        for frame in list.__iter__(self):
+            if frame.index > self.start:
+                self.read = frame.index
+                yield frame
+
+
+def make_source():
+    # Static stretches for the motion gate, two faces in every third frame
+    values = [1, 1, 1, 3, 3, 4, 5, 5, 6, 6, 6, 7]
+    return SeekableSource(Frame(i + 1, i / 30.0, None, np.full((80, 100), v, np.uint8))
+                          for i, v in enumerate(values))
+
+
+def make_tracker():
+    return TongueTracker(FakeDetector(), FakePredictor(), identities=IdentityTracker(),
+                         gate=MotionGate())
+
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path):
+    expected = make_tracker().run(make_source())
+
+    checkpoint = Checkpoint(str(tmp_path / "run.npz"), interval=0, config={'skip': 1})
+
+    def stop_at_frame_7(frames_read, total_frames, detections):
+        if frames_read == 7:
+            checkpoint.request_stop()
+
+    partial = make_tracker().run(make_source(), progress=stop_at_frame_7, checkpoint=checkpoint)
+    assert checkpoint.stopped
+    assert partial.frames_processed == 7
+
+    checkpoint = Checkpoint(str(tmp_path / "run.npz"), config={'skip': 1})
+    source = make_source()
+    result = make_tracker().run(source, checkpoint=checkpoint, resume=True)
+    assert source.start == 7
+
+    for name in ('frames', 'mouth_x', 'mouth_y', 'face_ids', 'carried'):
+        assert getattr(result, name).tolist() == getattr(expected, name).tolist()
+    assert result.summary() == expected.summary()
+
+    result.export_csv(str(tmp_path / "resumed.csv"))
+    expected.export_csv(str(tmp_path / "expected.csv"))
+    assert (tmp_path / "resumed.csv").read_text() == (tmp_path / "expected.csv").read_text()
+
+
+def test_resumed_run_keeps_landmarks(tmp_path):
+    expected = make_tracker().run(make_source(), keep_landmarks=True)
+
+    checkpoint = Checkpoint(str(tmp_path / "run.npz"), interval=0)
+
+    def stop_at_frame_5(frames_read, total_frames, detections):
+        if frames_read == 5:
+            checkpoint.request_stop()
+
+    make_tracker().run(make_source(), progress=stop_at_frame_5, checkpoint=checkpoint,
+                       keep_landmarks=True)
+    result = make_tracker().run(make_source(), checkpoint=Checkpoint(str(tmp_path / "run.npz")),
+                                resume=True, keep_landmarks=True)
+    assert result.boxes.tolist() == expected.boxes.tolist()
+    assert result.landmarks.tolist() == expected.landmarks.tolist()
+
+
+def test_checkpoint_with_other_options_is_rejected(tmp_path):
+    path = str(tmp_path / "run.npz")
+    make_tracker().run(make_source(), checkpoint=Checkpoint(path, interval=0, config={'skip': 1}))
+
+    checkpoint = Checkpoint(path, config={'skip': 2})
+    with pytest.raises(ValueError, match="skip"):
+        checkpoint.load()
+    assert checkpoint.read()['frames_read'] == 12
+
+    (tmp_path / "broken.npz").write_bytes(b"not a checkpoint")
+    with pytest.raises(ValueError):
+        Checkpoint(str(tmp_path / "broken.npz")).load()
+
+
+@pytest.mark.parametrize("source_class", [
+    VideoFileSource,
+    pytest.param(FFmpegSource, marks=pytest.mark.skipif(shutil.which('ffmpeg') is None,
+                                                        reason="ffmpeg not installed")),
+])
+def test_source_seek(tmp_path, source_class):
+    path = str(tmp_path / "clip.avi")
+    write_clip(path)
+
+    source = source_class(path, width=100, skip_frames=2, color=False)
+    source.seek(4)
+    frames = [(f.index, int(f.gray[0, 0])) for f in source]
+    source.release()
+    # Frames continue with their original numbers and contents
+    assert [index for index, _ in frames] == [6, 8, 10]
+    assert [value for _, value in frames] == pytest.approx([100, 140, 180], abs=3)
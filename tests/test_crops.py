@@ -0,0 +1,94 @@
+"""
+Tests for the mouth-crop sidecar video
+"""
+import csv
+
+import cv2
+import numpy as np
+import pytest
+
+from tongue_tracking import Frame
+from tongue_tracking.crops import MouthCropSink, crop_map_path, mouth_rows
+from tongue_tracking.results import Face, FrameResult
+from tests.test_tracker import FakeRect
+
+
+class RecordingWriter:
+    """Keeps the frames instead of encoding them"""
+
+    def __init__(self):
+        self.images = []
+
+    def write(self, image):
+        self.images.append(image.copy())
+
+    def release(self):
+        pass
+
+
+def make_result(index, mouth_center):
+    """Frame with a gradient and one face whose mouth is around ``mouth_center``"""
+    gray = np.add.outer(np.arange(120), np.arange(160)).astype(np.uint8)
+    faces = []
+    if mouth_center is not None:
+        landmarks = np.zeros((68, 2), np.int32)
+        landmarks[48:] = mouth_center
+        landmarks[48] -= (10, 0)
+        landmarks[54] += (10, 0)
+        faces.append(Face(FakeRect(0, 0, 100, 100), landmarks))
+    return FrameResult(Frame(index, index / 25.0, None, gray), faces)
+
+
+def test_mouth_rows():
+    assert mouth_rows(68) == list(range(48, 68))
+    assert mouth_rows(20) == list(range(20))
+    assert crop_map_path("out/mouth.mkv") == "out/mouth.csv"
+
+
+def test_crops_follow_the_smoothed_mouth(tmp_path):
+    path = str(tmp_path / "mouth.avi")
+    sink = MouthCropSink(path, 25, (320, 240), (160, 120), size=(32, 16), smoothing=0.5,
+                         codec='MJPG')
+    sink._writer.release()
+    sink._writer = RecordingWriter()
+    written = sink._writer.images
+
+    # No crop before the first face, then the center moves halfway to the mouth
+    for index, center in enumerate([None, (80, 60), (80, 60), (100, 60), None], 1):
+        sink.write(make_result(index, center))
+    sink.close()
+
+    assert sink.written == 4
+    with open(sink.map_path) as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row['frame']) for row in rows] == [2, 3, 4, 5]
+    assert [int(row['detected']) for row in rows] == [1, 1, 1, 0]
+    # left/top in source pixels: the frames were processed at half size
+    assert [float(row['left']) for row in rows] == [128, 128, 148, 148]
+    assert float(rows[0]['top']) == 104
+    assert float(rows[0]['scale']) == 2
+
+    gray = make_result(1, None).frame.gray
+    assert written[0].shape == (16, 32)
+    # Exact copies of the frame at the smoothed position
+    assert (written[0] == gray[52:68, 64:96]).all()
+    assert (written[2] == gray[52:68, 74:106]).all()
+    assert (written[3] == written[2]).all()
+
+
+def test_lossless_crop_video(tmp_path):
+    path = str(tmp_path / "mouth.mkv")
+    try:
+        sink = MouthCropSink(path, 25, (160, 120), (160, 120), size=(32, 16))
+    except IOError:
+        pytest.skip("OpenCV cannot write FFV1")
+    for index in range(1, 4):
+        sink.write(make_result(index, (80, 60)))
+    sink.close()
+
+    cap = cv2.VideoCapture(path)
+    ret, image = cap.read()
+    cap.release()
+    assert ret
+    gray = make_result(1, None).frame.gray
+    assert (image[:, :, 0] == gray[52:68, 64:96]).all()
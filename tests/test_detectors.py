@@ -0,0 +1,67 @@
+"""
+Tests for the face detector backends and the automatic selection
+"""
+import pytest
+
+from tongue_tracking.detectors import create_detector, iou, same_faces, select_detector
+from tests.test_tracker import FakeRect
+
+
+class TimedDetector:
+    """Returns fixed rectangles per frame after sleeping for a while"""
+
+    def __init__(self, name, boxes, delay=0.0):
+        self.name = name
+        self.boxes = boxes
+        self.delay = delay
+
+    def detect(self, frame):
+        import time
+
+        time.sleep(self.delay)
+        return [FakeRect(*box) for box in self.boxes[frame]]
+
+
+def test_iou():
+    a = FakeRect(0, 0, 10, 10)
+    assert iou(a, FakeRect(0, 0, 10, 10)) == 1.0
+    assert iou(a, FakeRect(5, 0, 15, 10)) == pytest.approx(50 / 150.0)
+    assert iou(a, FakeRect(20, 20, 30, 30)) == 0.0
+
+
+def test_same_faces():
+    reference = [FakeRect(0, 0, 10, 10), FakeRect(50, 0, 60, 10)]
+    assert same_faces(reference, [FakeRect(51, 1, 61, 11), FakeRect(1, 0, 11, 10)])
+    assert not same_faces(reference, [FakeRect(0, 0, 10, 10)])
+    assert not same_faces(reference, [FakeRect(0, 0, 10, 10), FakeRect(90, 0, 99, 10)])
+    assert same_faces([], [])
+
+
+def test_select_detector_prefers_fastest_agreeing_backend():
+    frames = [0, 1, 2, 3]
+    faces = {i: [(10, 10, 50, 50)] for i in frames}
+    hog = TimedDetector('hog', faces, delay=0.01)
+    fast_but_wrong = TimedDetector('haar', {i: [] for i in frames})
+    fast_and_right = TimedDetector('yunet', faces, delay=0.001)
+
+    detector, report = select_detector(frames, [hog, fast_but_wrong, fast_and_right])
+    assert detector is fast_and_right
+    assert [r['name'] for r in report] == ['hog', 'haar', 'yunet']
+    assert [r['qualified'] for r in report] == [True, False, True]
+    assert report[1]['agreement'] == 0.0
+
+    # Without an agreeing backend HOG is kept
+    detector, _ = select_detector(frames, [hog, fast_but_wrong])
+    assert detector is hog
+
+    with pytest.raises(ValueError):
+        select_detector(frames, [fast_and_right])
+
+
+def test_create_detector_errors(tmp_path):
+    with pytest.raises(ValueError):
+        create_detector('mtcnn')
+    with pytest.raises(ValueError):
+        create_detector('ssd')
+    with pytest.raises(FileNotFoundError):
+        create_detector('yunet', yunet_model=str(tmp_path / 'missing.onnx'))
@@ -0,0 +1,65 @@
+"""
+Tests for the decoded frame cache
+"""
+import os
+
+import numpy as np
+import pytest
+
+from tongue_tracking import VideoFileSource
+from tongue_tracking.framecache import FrameCache
+from tests.test_tracker import write_clip
+
+
+def test_cached_frames_match_the_decoder(tmp_path):
+    video = str(tmp_path / "clip.avi")
+    write_clip(video)
+    cache = FrameCache(str(tmp_path / "cache"))
+    assert cache.open(video, 100) is None
+    cache.build(video, 100)
+
+    with VideoFileSource(video, width=100, skip_frames=2, color=False) as source:
+        expected = [(f.index, f.timestamp, f.gray.copy()) for f in source]
+    source = cache.open(video, 100, skip_frames=2)
+    assert (source.total_frames, source.frame_size, source.source_size) == (10, (100, 50), (200, 100))
+    frames = list(source)
+    assert [f.index for f in frames] == [index for index, _, _ in expected]
+    assert [f.timestamp for f in frames] == [timestamp for _, timestamp, _ in expected]
+    for frame, (_, _, gray) in zip(frames, expected):
+        assert (frame.gray == gray).all()
+        assert frame.image is None
+    # Views of the mapped file, not copies
+    assert isinstance(frames[0].gray.base, np.memmap) or isinstance(frames[0].gray, np.memmap)
+    assert source.frames_read == 10
+
+    # Seeking works like VideoFileSource.seek
+    source = cache.open(video, 100, skip_frames=2, color=True)
+    source.seek(4)
+    frames = [(f.index, f.image.shape) for f in source]
+    assert frames == [(6, (50, 100, 3)), (8, (50, 100, 3)), (10, (50, 100, 3))]
+
+    # Another width or a changed video is not in the cache
+    assert cache.open(video, 80) is None
+    os.utime(video, (1, 1))
+    assert cache.open(video, 100) is None
+
+
+def test_least_recently_used_videos_are_evicted(tmp_path):
+    videos = []
+    for name in "abc":
+        videos.append(str(tmp_path / f"{name}.avi"))
+        write_clip(videos[-1])
+    # Room for two videos of 10 frames of 100x50
+    cache = FrameCache(str(tmp_path / "cache"), budget=2 * 10 * 100 * 50)
+    a, b, c = videos
+
+    cache.build(a, 100)
+    cache.build(b, 100)
+    cache.open(a, 100)
+    cache.build(c, 100)
+    assert cache.open(b, 100) is None
+    assert cache.open(a, 100) is not None and cache.open(c, 100) is not None
+    assert cache.size() <= cache.budget
+
+    with pytest.raises(IOError):
+        FrameCache(str(tmp_path / "small"), budget=1000).build(a, 100)
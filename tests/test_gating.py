@@ -0,0 +1,60 @@
+"""
+Tests for the motion gate
+"""
+import numpy as np
+
+from tongue_tracking import TongueTracker, Frame
+from tongue_tracking.gating import MotionGate
+from tests.test_tracker import FakeDetector, FakePredictor, FakeSource
+
+
+def mouth(x, y):
+    return np.array([[x, y], [x + 20, y], [x + 10, y + 10]], dtype=np.int32)
+
+
+def test_gate_detects_mouth_motion():
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 255, (100, 100), dtype=np.uint8)
+    gate = MotionGate(threshold=2.0, max_carry=3)
+
+    assert not gate.is_static(gray)  # nothing to compare yet
+    gate.update(gray, [mouth(40, 40)])
+    assert gate.is_static(gray.copy())
+
+    # Changes outside the mouth region are ignored
+    changed = gray.copy()
+    changed[:20] = 0
+    assert gate.is_static(changed)
+
+    changed[38:55, 38:65] = 255 - changed[38:55, 38:65]
+    assert not gate.is_static(changed)
+
+    # After max_carry static frames a frame is processed anyway
+    assert gate.is_static(gray)
+    assert not gate.is_static(gray)
+
+
+class CountingDetector(FakeDetector):
+    calls = 0
+
+    def detect(self, gray):
+        self.calls += 1
+        return super().detect(gray)
+
+
+def test_tracker_carries_static_frames(tmp_path):
+    # Frames 1-4 are identical, frame 5 changes
+    values = [1, 1, 1, 1, 50]
+    frames = FakeSource(Frame(i + 1, i / 30.0, None, np.full((80, 100), v, np.uint8))
+                        for i, v in enumerate(values))
+    detector = CountingDetector()
+    result = TongueTracker(detector, FakePredictor(), gate=MotionGate()).run(frames)
+
+    assert detector.calls == 2
+    assert result.carried.tolist() == [False, True, True, True, False]
+    assert result.summary()['gated_fraction'] == 0.6
+
+    result.export_csv(str(tmp_path / "out.csv"))
+    lines = (tmp_path / "out.csv").read_text().splitlines()
+    assert lines[0] == "frame,mouth_x,mouth_y,carried"
+    assert lines[2] == "2,1.0,10.0,1"
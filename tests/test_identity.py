@@ -0,0 +1,76 @@
+"""
+Tests for face identity tracking and the subject lock
+"""
+import numpy as np
+
+from tongue_tracking import IdentityTracker, TongueTracker, Frame
+from tests.test_tracker import FakeRect, FakePredictor, FakeSource
+
+
+def box(x, y, size=40):
+    return FakeRect(x, y, x + size, y + size)
+
+
+def test_ids_follow_moving_faces():
+    tracker = IdentityTracker()
+    assert tracker.assign([box(0, 0), box(200, 0)]) == [1, 2]
+    # Order of the detections does not matter, small moves keep the id
+    assert tracker.assign([box(205, 3), box(4, 2)]) == [2, 1]
+    # A jump without overlap is matched by the center distance
+    assert tracker.assign([box(20, 2), box(205, 3)]) == [1, 2]
+    # A new face gets a new id
+    assert tracker.assign([box(20, 2), box(100, 100), box(205, 3)]) == [1, 3, 2]
+
+
+def test_lost_tracks_are_forgotten_unless_pinned():
+    tracker = IdentityTracker(max_missing=2)
+    tracker.assign([box(0, 0), box(200, 0)])
+    tracker.pin(2)
+    for _ in range(3):
+        tracker.assign([])
+    assert set(tracker.tracks) == {2}
+    assert tracker.assign([box(0, 0), box(200, 0)]) == [3, 2]
+
+
+class CountingPredictor(FakePredictor):
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, gray, rect, out=None):
+        self.calls += 1
+        return super().predict(gray, rect, out)
+
+
+class TwoFaces:
+    """A small face on the left and a large one on the right"""
+
+    name = 'two'
+
+    def detect(self, gray):
+        return [box(10, 10, 30), box(100, 10, 60)]
+
+
+def frames(n):
+    return FakeSource(Frame(i + 1, i / 30.0, None, np.zeros((48, 64), np.uint8))
+                      for i in range(n))
+
+
+def test_subject_lock_predicts_only_the_subject(tmp_path):
+    predictor = CountingPredictor()
+    result = TongueTracker(TwoFaces(), predictor, subject='largest').run(frames(4))
+
+    assert predictor.calls == 4
+    assert result.subject == 2
+    assert result.face_ids.tolist() == [2, 2, 2, 2]
+
+    result.export_csv(str(tmp_path / "out.csv"))
+    lines = (tmp_path / "out.csv").read_text().splitlines()
+    assert lines[0] == "frame,face_id,mouth_x,mouth_y"
+    assert lines[1].startswith("1,2,")
+
+
+def test_faces_keep_ids_without_lock():
+    tracker = TongueTracker(TwoFaces(), FakePredictor(), identities=IdentityTracker())
+    result = tracker.run(frames(3))
+    assert result.face_ids.tolist() == [1, 2, 1, 2, 1, 2]
+    assert result.summary()['subject'] is None
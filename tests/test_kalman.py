@@ -0,0 +1,110 @@
+"""
+Tests for Kalman smoothing and seeded detection
+"""
+import numpy as np
+import pytest
+
+from tongue_tracking import TongueTracker, Frame
+from tongue_tracking.gating import MotionGate
+from tongue_tracking.kalman import SeededDetector, SmoothedTrajectory, smooth
+from tests.test_tracker import FakeDetector, FakePredictor, FakeRect, FakeSource
+
+
+def test_smooth_fills_skipped_frames():
+    rng = np.random.default_rng(0)
+    t = np.arange(0, 90)
+    truth = np.column_stack((100 + 20 * np.sin(t / 10.0), 50 + 0.5 * t))
+    frames = t[::3]
+    noisy = truth[frames] + rng.normal(0, 1.0, (len(frames), 2))
+
+    out_frames, positions, std, measured = smooth(frames, noisy)
+
+    assert out_frames.tolist() == list(range(0, 88))
+    assert measured.sum() == len(frames)
+    assert measured[::3].all() and not measured[1::3].any()
+    # Smoothed estimates beat the raw measurements, also between them
+    assert np.abs(positions[::3] - truth[frames]).mean() < np.abs(noisy - truth[frames]).mean()
+    assert np.abs(positions - truth[:88]).mean() < 1.0
+    # Frames without a measurement are less certain
+    assert std[31] > std[30] and std[33] < std[32]
+
+    sparse = smooth(frames, noisy, dense=False)
+    assert sparse[0].tolist() == frames.tolist()
+    assert sparse[3].all()
+
+
+def test_smooth_rejects_unordered_frames():
+    with pytest.raises(ValueError):
+        smooth([1, 3, 3], np.zeros((3, 2)))
+
+
+def test_smoothed_trajectory_from_result(tmp_path):
+    # The motion gate carries frames 2-4, which are left to the model
+    values = [1, 1, 1, 1, 50]
+    frames = FakeSource(Frame(i + 1, i / 30.0, None, np.full((80, 100), v, np.uint8))
+                        for i, v in enumerate(values))
+    result = TongueTracker(FakeDetector(), FakePredictor(), gate=MotionGate()).run(frames)
+
+    trajectory = result.smooth()
+    assert trajectory.frames.tolist() == [1, 2, 3, 4, 5]
+    assert trajectory.measured.tolist() == [True, False, False, False, True]
+    assert isinstance(trajectory, SmoothedTrajectory)
+
+    trajectory.export_csv(str(tmp_path / "smooth.csv"))
+    lines = (tmp_path / "smooth.csv").read_text().splitlines()
+    assert lines[0] == "frame,face_id,mouth_x,mouth_y,std,measured"
+    assert len(lines) == 6
+    assert lines[2].endswith(",0")
+
+
+class MovingDetector:
+    """One face moving 2 pixels per frame, located via a bright square"""
+
+    def __init__(self):
+        self.shapes = []
+
+    def detect(self, gray):
+        self.shapes.append(gray.shape)
+        ys, xs = np.nonzero(gray > 128)
+        if not len(xs):
+            return []
+        return [FakeRect(xs.min(), ys.min(), xs.max(), ys.max())]
+
+
+def test_seeded_detector_searches_predicted_region():
+    detector = MovingDetector()
+    seeded = SeededDetector(detector, refresh=5)
+    for i in range(7):
+        gray = np.zeros((200, 300), np.uint8)
+        x = 20 + 2 * i
+        gray[50:90, x:x + 40] = 255
+        rects = seeded.detect(gray)
+        assert [(r.left(), r.top()) for r in rects] == [(x, 50)]
+
+    # Frames 0 and 5 search the whole frame, the others a crop
+    assert (seeded.full, seeded.seeded) == (2, 5)
+    assert detector.shapes[0] == (200, 300) and detector.shapes[5] == (200, 300)
+    assert all(s[0] < 200 and s[1] < 300 for s in detector.shapes[1:5])
+
+    # A face lost in the crop falls back to the full frame
+    seeded.detect(np.zeros((200, 300), np.uint8))
+    assert detector.shapes[-1] == (200, 300)
+
+
+def test_seeded_detector_state_roundtrip():
+    frames = []
+    for i in range(4):
+        gray = np.zeros((200, 300), np.uint8)
+        gray[50:90, 20 + 3 * i:60 + 3 * i] = 255
+        frames.append(gray)
+
+    original = SeededDetector(MovingDetector())
+    for gray in frames[:2]:
+        original.detect(gray)
+    restored = SeededDetector(MovingDetector())
+    restored.set_state(original.get_state())
+
+    for gray in frames[2:]:
+        expected = [(r.left(), r.top()) for r in original.detect(gray)]
+        assert [(r.left(), r.top()) for r in restored.detect(gray)] == expected
+    assert (restored.seeded, restored.full) == (original.seeded, original.full)
@@ -0,0 +1,105 @@
+"""
+Tests for the live-path latency monitor
+"""
+import csv
+import json
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from tongue_tracking.latency import LatencyMonitor, summary_path
+from tongue_tracking.sources import CameraSource, _CaptureSource
+
+
+def track(monitor, index, captured, queue=0.002, tracking=0.010, publish=0.001):
+    monitor.begin(index, captured, now=captured + queue)
+    monitor.landmarks_ready(now=captured + queue + tracking)
+    return monitor.published(now=captured + queue + tracking + publish)
+
+
+def test_intervals_and_rolling_percentiles():
+    monitor = LatencyMonitor(window=10)
+    assert monitor.percentiles() == {}
+    intervals = track(monitor, 1, 100.0)
+    assert intervals['queue'] == pytest.approx(0.002)
+    assert intervals['total'] == pytest.approx(0.013)
+
+    # Only the last 10 frames count: the slow frames have left the window
+    for index in range(2, 6):
+        track(monitor, index, 100.0 + index, tracking=1.0)
+    for index in range(6, 16):
+        track(monitor, index, 100.0 + index)
+    assert monitor.percentiles()[99] == pytest.approx(13)
+    assert monitor.percentiles('tracking')[50] == pytest.approx(10)
+    summary = monitor.summary()
+    assert summary['frames'] == 15
+    assert summary['tracking']['max'] == pytest.approx(1000)
+    assert summary['total']['p50'] == pytest.approx(13)
+
+
+def test_dropped_frames(tmp_path):
+    path = str(tmp_path / "latency.csv")
+    monitor = LatencyMonitor(fps=100, path=path)
+    # Gaps in the frame numbers (replay) ...
+    track(monitor, 1, 0.00)
+    track(monitor, 4, 0.03)
+    # ... and in the capture times (camera numbering every frame it returns)
+    track(monitor, 5, 0.08)
+    track(monitor, 6, 0.09)
+    assert monitor.dropped == 6
+    monitor.close()
+
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row['frame']) for row in rows] == [1, 4, 5, 6]
+    assert [int(row['dropped']) for row in rows] == [0, 2, 6, 6]
+    assert float(rows[0]['total_ms']) == pytest.approx(13, abs=0.01)
+    with open(summary_path(path)) as f:
+        assert json.load(f)['dropped'] == 6
+
+
+class FakeCamera:
+    """cv2.VideoCapture stand-in reporting a buffer timestamp 50 ms ago"""
+
+    def __init__(self, frames, msec):
+        self.frames = frames
+        self.msec = msec
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.msec()
+        return {cv2.CAP_PROP_FRAME_WIDTH: 64, cv2.CAP_PROP_FRAME_HEIGHT: 48}.get(prop, 0)
+
+    def grab(self):
+        self.frames -= 1
+        return self.frames >= 0
+
+    def retrieve(self, image=None):
+        return True, np.zeros((48, 64, 3), np.uint8)
+
+    def release(self):
+        pass
+
+
+def camera(cap):
+    source = CameraSource.__new__(CameraSource)
+    _CaptureSource.__init__(source, cap, 64, False)
+    source.start_time = time.time()
+    source.capture_time = None
+    return source
+
+
+def test_camera_capture_time():
+    # A buffer timestamp on the monotonic clock dates the frame back
+    source = camera(FakeCamera(2, lambda: 1000 * (time.monotonic() - 0.05)))
+    for frame in source:
+        assert time.time() - source.capture_time == pytest.approx(0.05, abs=0.02)
+        assert frame.timestamp == pytest.approx(source.capture_time - source.start_time)
+
+    # A stream position is not a capture time: the frame is timed at grab()
+    source = camera(FakeCamera(1, lambda: 40.0))
+    before = time.time()
+    next(iter(source))
+    assert before <= source.capture_time <= time.time()
@@ -0,0 +1,66 @@
+"""
+Tests for the shared memory preview channel
+"""
+import numpy as np
+import pytest
+
+from tongue_tracking import Frame
+from tongue_tracking.preview import PreviewChannel, PreviewSink
+from tongue_tracking.results import Face, FrameResult
+from tests.test_tracker import FakeRect
+
+
+@pytest.fixture
+def channel():
+    channel = PreviewChannel.create(size=(160, 160))
+    yield channel
+    channel.close()
+
+
+def make_result(index, value=50):
+    gray = np.full((480, 640), value, np.uint8)
+    landmarks = np.tile(np.array([[320, 240]], np.int32), (68, 1))
+    landmarks[0] = (100, 80)
+    face = Face(FakeRect(100, 80, 300, 280), landmarks)
+    return FrameResult(Frame(index, index / 30.0, None, gray), [face])
+
+
+def test_write_and_read_scaled_frame(channel):
+    assert channel.read() is None
+
+    channel.write(make_result(7).frame.gray, make_result(7).faces, 7)
+    # A second process sees the same block
+    reader = PreviewChannel(channel.name, size=(160, 160))
+    preview = reader.read()
+    reader.close()
+
+    assert preview['frame'] == 7
+    # 640x480 scaled to fit 160x160, keeping the aspect ratio
+    assert preview['image'].shape == (120, 160)
+    assert (preview['image'] == 50).all()
+    assert preview['boxes'].tolist() == [[25, 20, 75, 70]]
+    assert preview['landmarks'].shape == (1, 68, 2)
+    assert preview['landmarks'][0, 0].tolist() == [25, 20]
+    assert preview['landmarks'][0, 1].tolist() == [80, 60]
+
+    # Nothing new until the next frame is written
+    assert channel.read(preview['sequence']) is None
+    channel.write(make_result(8).frame.gray, [], 8)
+    preview = channel.read(preview['sequence'])
+    assert preview['frame'] == 8
+    assert len(preview['boxes']) == 0
+
+
+def test_sink_decimates_frames(channel):
+    sink = PreviewSink(channel, fps=0.001)
+    for index in range(1, 31):
+        assert sink.write(make_result(index, value=index))
+    # Only the first frame falls into the interval
+    assert sink.written == 1
+    assert channel.read()['frame'] == 1
+
+    sink = PreviewSink(channel, fps=0)
+    for index in range(1, 31):
+        sink.write(make_result(index, value=index))
+    assert sink.written == 30
+    assert channel.read()['frame'] == 30
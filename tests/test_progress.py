@@ -0,0 +1,111 @@
+"""
+Tests for progress events and script jobs
+"""
+import io
+import os
+import sys
+import textwrap
+
+from tongue_tracking.jobs import CANCELLED, JobQueue, ScriptJob
+from tongue_tracking.progress import ProgressReporter, format_event, parse_event
+from tongue_tracking.service import DONE, FAILED, QUEUED, RUNNING
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_event_roundtrip():
+    line = format_event('progress', frames=10, eta=None)
+    assert parse_event(line) == {'event': 'progress', 'frames': 10, 'eta': None}
+    assert parse_event("Processing 90 frames...") is None
+    assert parse_event("@event not json") is None
+
+
+def test_reporter_is_throttled():
+    stream = io.StringIO()
+    reporter = ProgressReporter(stream, interval=3600)
+    reporter.start(video='clip.avi', total_frames=100)
+    for frame in range(1, 101):
+        reporter(frame, 100, frame // 2)
+    reporter.finish(frames=100, detections=50)
+
+    events = [parse_event(line) for line in stream.getvalue().splitlines()]
+    # Only start, the final progress and finish: no event per frame
+    assert [e['event'] for e in events] == ['start', 'progress', 'finish']
+    assert events[1]['frames'] == 100
+    assert events[1]['detections'] == 50
+    assert events[1]['fps'] > 0
+    assert events[1]['eta'] == 0
+
+
+def python_job(code):
+    return ScriptJob([sys.executable, '-c', textwrap.dedent(code)], cwd=REPO_ROOT)
+
+
+def test_script_job_collects_progress_and_output():
+    job = python_job("""
+        from tongue_tracking.progress import ProgressReporter
+        reporter = ProgressReporter(interval=0)
+        print("Processing 3 frames...")
+        for frame in (1, 2, 3):
+            reporter(frame, 3, frame)
+        reporter.finish(frames=3, detections=3)
+        print("Processing complete!")
+    """)
+    job.start()
+    assert job.wait(30)
+
+    assert job.state == DONE
+    assert job.progress['frames'] == 3
+    assert job.summary['detections'] == 3
+    assert job.take_lines() == ["Processing 3 frames...", "Processing complete!"]
+    assert job.take_lines() == []
+
+
+def test_script_job_failure_and_cancel():
+    job = python_job("import sys; print('Error: Video file not found'); sys.exit(1)")
+    job.start()
+    assert job.wait(30)
+    assert job.state == FAILED
+    assert job.error == "exit code 1"
+
+    job = python_job("import time; print('started', flush=True); time.sleep(60)")
+    job.start()
+    job.cancel()
+    assert job.wait(30)
+    assert job.state == CANCELLED
+
+    # Jobs cancelled before they start never run
+    job = python_job("print('ran')")
+    job.cancel()
+    job.start()
+    assert job.state == CANCELLED and job.take_lines() == []
+
+
+def test_job_queue_limits_running_jobs(tmp_path):
+    flag = tmp_path / "fixed"
+    queue = JobQueue(max_running=2)
+    jobs = [queue.add(python_job("import time; time.sleep(0.2)")) for _ in range(3)]
+    failing = queue.add(python_job(f"""
+        import os, sys
+        sys.exit(0 if os.path.exists({str(flag)!r}) else 1)
+    """))
+
+    assert queue.pump() == jobs[:2]
+    assert queue.pump() == []
+    assert [job.state for job in jobs] == [RUNNING, RUNNING, QUEUED]
+
+    while any(job.active for job in queue.jobs):
+        queue.pump()
+        assert len(queue.running) <= 2
+        for job in queue.jobs:
+            job.wait(0.05)
+    assert queue.counts() == {DONE: 3, FAILED: 1}
+
+    # A failed job can be retried once the problem is fixed
+    flag.touch()
+    assert queue.retry(failing)
+    assert not queue.retry(jobs[0])
+    queue.pump()
+    assert failing.wait(30)
+    assert failing.state == DONE
+    assert failing.attempts == 2
@@ -0,0 +1,88 @@
+"""
+Tests for rendering annotated videos from stored landmarks
+"""
+import cv2
+import numpy as np
+import pytest
+
+from tongue_tracking import TongueTracker
+from tongue_tracking.render import Annotations, draw_annotations, parse_ranges, render_video
+from tests.test_tracker import FakeDetector, FakePredictor, make_frames, write_clip
+
+
+def test_parse_ranges():
+    assert parse_ranges('', 100) == [(1, 100)]
+    assert parse_ranges('50-60, 10-20,15-30,90-', 100) == [(10, 30), (50, 60), (90, 100)]
+    assert parse_ranges('7', 100) == [(7, 7)]
+    assert parse_ranges('1-10,11-20', 100) == [(1, 20)]
+    for text in ('0-5', '20-10', 'a-b', '150-'):
+        with pytest.raises(ValueError):
+            parse_ranges(text, 100)
+
+
+def test_draw_annotations_matches_circles():
+    landmarks = np.array([[[10, 10], [30, 12], [0, 0]]], np.float32)
+    boxes = np.array([[5, 5, 40, 40]])
+
+    image = np.zeros((50, 50, 3), np.uint8)
+    draw_annotations(image, boxes, landmarks, ["Face #1"], radius=2)
+
+    expected = np.zeros((50, 50, 3), np.uint8)
+    cv2.rectangle(expected, (5, 5), (40, 40), (0, 255, 0), 2)
+    for x, y in landmarks[0]:
+        cv2.circle(expected, (int(x), int(y)), 2, (0, 0, 255), -1)
+    red = (image == (0, 0, 255)).all(axis=2)
+    assert (red == (expected == (0, 0, 255)).all(axis=2)).all()
+    assert (image[5, 20] == (0, 255, 0)).all()
+
+
+def test_exported_landmarks(tmp_path):
+    frames = make_frames(4)
+    frames.skip_frames = 2
+    result = TongueTracker(FakeDetector(), FakePredictor()).run(frames, keep_landmarks=True)
+    path = str(tmp_path / "clip.landmarks.npz")
+    result.export_landmarks(path)
+
+    annotations = Annotations.load(path)
+    assert annotations.frames.tolist() == result.frames.tolist()
+    assert annotations.landmarks.shape == (result.detections, 68, 2)
+    assert annotations.boxes.shape == (result.detections, 4)
+    assert annotations.frame_size == (64, 48)
+    # Skipped frames show the faces of the processed frame before them
+    assert annotations.faces(3) == annotations.faces(2)
+    assert annotations.faces(4) != annotations.faces(2)
+
+    plain = TongueTracker(FakeDetector(), FakePredictor()).run(make_frames(4))
+    with pytest.raises(ValueError):
+        plain.export_landmarks(path)
+
+
+def test_render_frame_ranges(tmp_path):
+    video = str(tmp_path / "clip.avi")
+    write_clip(video)
+    # One face in every frame, stored at half the video size
+    n = 10
+    annotations = Annotations(
+        frames=np.arange(1, n + 1), face_ids=np.zeros(n, np.int32),
+        boxes=np.tile([[10, 10, 40, 40]], (n, 1)),
+        landmarks=np.full((n, 68, 2), 25, np.float32),
+        meta={'skip_frames': 1, 'frame_size': [100, 50], 'total_frames': n})
+
+    output = str(tmp_path / "review.avi")
+    stats = render_video(annotations, video, output, ranges=[(2, 3), (7, 10)],
+                         codec='MJPG', frame_numbers=False)
+    assert stats['frames'] == 6
+
+    cap = cv2.VideoCapture(output)
+    images = []
+    while True:
+        ret, image = cap.read()
+        if not ret:
+            break
+        images.append(image)
+    cap.release()
+    assert len(images) == 6
+    # The frames of the ranges, with the landmark dot scaled to (50, 50)
+    assert [int(image[90, 190].mean()) for image in images] == pytest.approx(
+        [20, 40, 120, 140, 160, 180], abs=4)
+    assert images[0][50, 50, 2] > 200 and images[0][50, 50, 0] < 60
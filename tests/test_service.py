@@ -0,0 +1,76 @@
+"""
+Tests for the tracking worker service and its client
+"""
+import threading
+import pytest
+
+from tongue_tracking.service import (
+    TrackingService, TrackingClient, serve, DONE, FAILED
+)
+
+
+def fake_runner(options, progress):
+    """Stands in for the dlib pipeline, reports progress for 10 frames"""
+    if options['video'] == 'broken.avi':
+        raise IOError("Could not open video file: broken.avi")
+    for frame in range(1, 11):
+        progress(frame, 10, frame // options['skip_frames'])
+    return {'video_file': options['video'], 'frames_processed': 10}
+
+
+@pytest.fixture
+def client():
+    """Client connected to a service running on a free local port"""
+    server = serve(TrackingService(fake_runner), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield TrackingClient(f"http://127.0.0.1:{server.server_address[1]}")
+    server.shutdown()
+    server.server_close()
+
+
+def test_health(client):
+    """The service answers health checks"""
+    assert client.health()
+    assert not TrackingClient("http://127.0.0.1:1").health()
+
+
+def test_submit_and_wait(client):
+    """Jobs run to completion and report progress and results"""
+    seen = []
+    job = client.wait(client.submit("clip.avi", skip_frames=2), poll_interval=0.01,
+                      on_progress=seen.append)
+
+    assert job['state'] == DONE
+    assert job['frames_done'] == job['total_frames'] == 10
+    assert job['detections'] == 5
+    assert job['result'] == {'video_file': 'clip.avi', 'frames_processed': 10}
+    assert seen[-1]['state'] == DONE
+
+
+def test_failed_job(client):
+    """Errors in a job are reported without stopping the worker"""
+    job = client.run("broken.avi")
+    assert job['state'] == FAILED
+    assert 'broken.avi' in job['error']
+
+    assert client.run("clip.avi")['state'] == DONE
+
+
+def test_finished_jobs_are_evicted():
+    """Only the last finished jobs are kept"""
+    service = TrackingService(fake_runner, max_finished=2)
+    ids = [service.submit(video=f"clip{i}.avi") for i in range(4)]
+    service._queue.join()
+
+    assert [job['id'] for job in service.list_jobs()] == ids[2:]
+    assert service.status(ids[0]) is None
+    assert service.status(ids[3])['state'] == DONE
+
+
+def test_invalid_submission(client):
+    """Unknown options are rejected with an error"""
+    with pytest.raises(RuntimeError, match="Unknown job options"):
+        client.submit("clip.avi", frobnicate=True)
+    with pytest.raises(RuntimeError, match="Unknown job"):
+        client.status("12345")
@@ -0,0 +1,42 @@
+"""
+Tests that heavy modules are only imported when they are needed
+"""
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('cv2', 'dlib', 'matplotlib', 'scipy')
+
+
+def imported_modules(args):
+    """Names of all modules imported by a Python invocation (-X importtime)"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=REPO_ROOT,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    names = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            names.add(line.rsplit('|', 1)[1].strip().split('.')[0])
+    return proc.returncode, names
+
+
+def test_package_import_is_light():
+    """Importing the package does not load OpenCV, dlib, matplotlib or SciPy"""
+    code, names = imported_modules(['-c', 'import tongue_tracking, tongue_tracking.service'])
+    assert code == 0
+    assert not names.intersection(HEAVY_MODULES)
+
+
+def test_lazy_exports():
+    """Public classes are still available from the package"""
+    import tongue_tracking
+    assert tongue_tracking.TongueTracker.__name__ == 'TongueTracker'
+    assert 'VideoFileSource' in dir(tongue_tracking)
+
+
+def test_help_is_light():
+    """The CLI help does not import any heavy module"""
+    for script in ('facial_landmarks_video.py', 'facial_landmarks_webcam.py'):
+        code, names = imported_modules([script, '-h'])
+        assert code == 0
+        assert not names.intersection(HEAVY_MODULES), script
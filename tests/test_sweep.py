@@ -0,0 +1,91 @@
+"""
+Tests for the multi-configuration sweep
+"""
+import json
+
+import pytest
+
+from tongue_tracking import IdentityTracker, TongueTracker, VideoFileSource
+from tongue_tracking.gating import MotionGate
+from tongue_tracking.sweep import Sweep, export_run, load_configs
+from tests.test_tracker import FakeDetector, FakePredictor, write_clip
+
+
+class CountingDetector(FakeDetector):
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, gray):
+        self.calls += 1
+        return super().detect(gray)
+
+
+CONFIGS = [
+    {"name": "all"},
+    {"name": "skip2", "skip_frames": 2},
+    {"name": "gated", "skip_frames": 2, "motion_gate": 2.0, "lock_subject": "largest"},
+    {"name": "narrow", "width": 60},
+]
+
+
+def test_configurations_share_decoding_and_detection(tmp_path):
+    video = str(tmp_path / "clip.avi")
+    write_clip(video)
+    detectors = []
+
+    def create(config):
+        detectors.append(CountingDetector())
+        return detectors[-1]
+
+    sweep = Sweep(video, FakePredictor(), CONFIGS, create=create)
+    results = sweep.run()
+
+    # One detector per width, each frame decoded and detected once per width
+    assert len(detectors) == 2
+    assert [d.calls for d in detectors] == [10, 10]
+    stats = sweep.stats()
+    assert (stats['frames_read'], stats['frames_decoded']) == (10, 10)
+    # skip2 and gated reuse the detections of the even frames
+    assert stats['detections_shared'] == 10
+
+    # Same results as separate runs
+    for config, result in zip(CONFIGS, results):
+        gate = MotionGate(config["motion_gate"]) if "motion_gate" in config else None
+        tracker = TongueTracker(FakeDetector(), FakePredictor(), identities=IdentityTracker(),
+                                subject=config.get("lock_subject"), gate=gate)
+        with VideoFileSource(video, width=config.get("width", 500),
+                             skip_frames=config.get("skip_frames", 1), color=False) as source:
+            expected = tracker.run(source)
+        assert result.frames.tolist() == expected.frames.tolist()
+        assert result.mouth_x.tolist() == expected.mouth_x.tolist()
+        assert result.face_ids.tolist() == expected.face_ids.tolist()
+        assert result.summary() == expected.summary()
+
+
+def test_frames_no_configuration_needs_are_not_decoded(tmp_path):
+    video = str(tmp_path / "clip.avi")
+    write_clip(video)
+    sweep = Sweep(video, FakePredictor(), [{"skip_frames": 2}, {"skip_frames": 5}],
+                  create=lambda config: FakeDetector())
+    first, second = sweep.run()
+    assert sweep.stats()['frames_decoded'] == 6
+    assert sorted(set(first.frames.tolist())) == [2, 4, 6, 8, 10]
+    assert sorted(set(second.frames.tolist())) == [5, 10]
+
+    paths = export_run(sweep.configs[1], second, str(tmp_path / "out" / "config2"))
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["mouth.csv", "mouth.json"]
+
+
+def test_load_configs(tmp_path):
+    path = tmp_path / "sweep.json"
+    path.write_text(json.dumps({"configurations": [
+        {}, {"name": "smooth", "exports": ["smoothed_csv"]}]}))
+    first, second = load_configs(str(path))
+    assert first["name"] == "config1" and first["skip_frames"] == 1
+    assert second["kalman"]
+
+    for configs in ([{"skip": 2}], [{"name": "a"}, {"name": "a"}], [{"detector": "auto"}],
+                    [{"exports": ["mp4"]}], [{"skip_frames": 0}], []):
+        path.write_text(json.dumps(configs))
+        with pytest.raises(ValueError):
+            load_configs(str(path))
@@ -0,0 +1,304 @@
+"""
+Tests for the TongueTracker pipeline, frame sources and results
+"""
+import io
+import shutil
+import time
+
+import numpy as np
+import pytest
+import cv2
+
+from tongue_tracking import (TongueTracker, Frame, VideoFileSource, FFmpegSource,
+                             ImageSequenceSource, ReplaySource)
+from tongue_tracking.sources import read_into, reduction_factor, sequence_files
+
+
+class FakeRect:
+    """Stands in for dlib.rectangle"""
+
+    def __init__(self, left, top, right, bottom):
+        self._box = (left, top, right, bottom)
+
+    def left(self):
+        return self._box[0]
+
+    def top(self):
+        return self._box[1]
+
+    def right(self):
+        return self._box[2]
+
+    def bottom(self):
+        return self._box[3]
+
+
+class FakeDetector:
+    """Finds one face per frame, two in every third frame"""
+
+    def detect(self, gray):
+        n = 2 if int(gray[0, 0]) % 3 == 0 else 1
+        return [FakeRect(10 * i, 10, 10 * i + 50, 60) for i in range(n)]
+
+
+class FakePredictor:
+    """Places all 68 landmarks on the rectangle corner, offset by the frame value"""
+
+    def predict(self, gray, rect, out=None):
+        if out is None:
+            out = np.empty((68, 2), np.int32)
+        out[:] = (rect.left() + int(gray[0, 0]), rect.top())
+        return out
+
+
+class FakeSource(list):
+    """List of frames with the attributes TongueTracker.run expects"""
+
+    total_frames = 4
+    source_size = (64, 48)
+    frame_size = (64, 48)
+    skip_frames = 1
+
+    @property
+    def frames_read(self):
+        return len(self)
+
+
+def make_frames(n):
+    return FakeSource(Frame(i + 1, i / 30.0, None, np.full((48, 64), i + 1, np.uint8))
+                      for i in range(n))
+
+
+def test_process_frames_is_lazy():
+    """Results are produced one frame at a time"""
+    tracker = TongueTracker(FakeDetector(), FakePredictor())
+    results = tracker.process_frames(iter(make_frames(3)))
+
+    first = next(results)
+    assert first.frame.index == 1
+    assert len(first.faces) == 1
+    assert tuple(first.faces[0].mouth) == (1, 10)
+    assert [len(r.faces) for r in results] == [1, 2]
+
+
+def test_run_collects_mouth_coordinates():
+    """All faces are collected, arrays grow past the preallocated size"""
+    tracker = TongueTracker(FakeDetector(), FakePredictor())
+    progress = []
+    result = tracker.run(make_frames(6), progress=lambda *a: progress.append(a))
+
+    # Frames 3 and 6 have two faces
+    assert result.detections == 8
+    assert result.frames.tolist() == [1, 2, 3, 3, 4, 5, 6, 6]
+    assert result.mouth_x.tolist() == [1, 2, 3, 13, 4, 5, 6, 16]
+    assert result.frames_processed == 6
+    assert progress[-1] == (6, 4, 8)
+
+
+def test_sink_can_stop_run():
+    """A sink returning False ends the run and every sink is closed"""
+
+    class StopAfterTwo:
+        def __init__(self):
+            self.written = 0
+            self.closed = False
+
+        def write(self, result):
+            self.written += 1
+            return self.written < 2
+
+        def close(self):
+            self.closed = True
+
+    sink = StopAfterTwo()
+    result = TongueTracker(FakeDetector(), FakePredictor()).run(make_frames(5), [sink])
+    assert sink.written == 2
+    assert sink.closed
+    assert result.frames.tolist() == [1, 2]
+
+
+def test_export_roundtrip(tmp_path):
+    """CSV and JSON exports contain every detection"""
+    result = TongueTracker(FakeDetector(), FakePredictor()).run(make_frames(3))
+    result.export_csv(str(tmp_path / "out.csv"))
+    result.export_json(str(tmp_path / "out.json"))
+
+    lines = (tmp_path / "out.csv").read_text().splitlines()
+    assert lines[0] == "frame,mouth_x,mouth_y"
+    assert len(lines) == 1 + result.detections
+    assert '"detections": 4' in (tmp_path / "out.json").read_text()
+
+
+def write_clip(path, n=10):
+    """Write a small MJPG clip whose frame i is filled with 20 * i"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (200, 100))
+    for i in range(n):
+        writer.write(np.full((100, 200, 3), 20 * i, np.uint8))
+    writer.release()
+
+
+def test_video_file_source(tmp_path):
+    """Frames are resized, converted to gray and numbered in the source"""
+    path = str(tmp_path / "clip.avi")
+    write_clip(path)
+
+    with VideoFileSource(path, width=100, skip_frames=3, color=False) as source:
+        frames = list(source)
+        assert source.frames_read == 10
+    assert source.frame_size == (100, 50)
+    assert [f.index for f in frames] == [3, 6, 9]
+    assert frames[0].gray.shape == (50, 100)
+    assert frames[0].image is None
+    assert frames[1].timestamp == pytest.approx(5 / 25.0)
+
+    with pytest.raises(IOError):
+        VideoFileSource(str(tmp_path / "missing.avi"))
+
+
+class ChunkedStream(io.BytesIO):
+    """Returns at most 7 bytes per read, like a pipe that is being filled"""
+
+    def readinto(self, b):
+        return super().readinto(memoryview(b)[:7])
+
+
+def test_read_into_fills_buffer_from_partial_reads():
+    buffer = np.zeros((2, 10), np.uint8)
+    stream = ChunkedStream(bytes(range(40)) + b'\x01')
+
+    assert read_into(stream, buffer)
+    assert buffer.ravel().tolist() == list(range(20))
+    assert read_into(stream, buffer)
+    assert buffer[1, 9] == 39
+    # A truncated frame at the end of the stream is dropped
+    assert not read_into(stream, buffer)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg not installed")
+def test_ffmpeg_source(tmp_path):
+    """The ffmpeg pipe yields the same frames as VideoFileSource"""
+    path = str(tmp_path / "clip.avi")
+    write_clip(path)
+
+    with FFmpegSource(path, width=100, skip_frames=3) as source:
+        frames = [(f.index, f.timestamp, f.image, f.gray.copy()) for f in source]
+        assert source.frames_read == 10
+    assert source.frame_size == (100, 50)
+    assert [f[0] for f in frames] == [3, 6, 9]
+    assert frames[1][1] == pytest.approx(5 / 25.0)
+    assert frames[0][2] is None
+    assert frames[0][3].shape == (50, 100)
+    with VideoFileSource(path, width=100, skip_frames=3, color=False) as reference:
+        for (_, _, _, gray), expected in zip(frames, reference):
+            assert np.abs(gray.astype(int) - expected.gray).max() <= 3
+
+    with FFmpegSource(path, width=100, color=True) as source:
+        frame = next(iter(source))
+        assert frame.image.shape == (50, 100, 3)
+        assert np.array_equal(frame.gray, cv2.cvtColor(frame.image, cv2.COLOR_BGR2GRAY))
+
+
+def test_ffmpeg_source_without_ffmpeg(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    write_clip(path, n=2)
+    with pytest.raises(IOError):
+        FFmpegSource(path, ffmpeg=str(tmp_path / 'no-ffmpeg'))
+
+
+def write_sequence(directory, n=12):
+    """Write PNG frames 1..n of 400x200 filled with 20 * i, numbered without padding"""
+    directory.mkdir()
+    for i in range(1, n + 1):
+        cv2.imwrite(str(directory / f"frame_{i}.png"), np.full((200, 400, 3), 20 * i, np.uint8))
+    return str(directory / "frame_*.png")
+
+
+def test_image_sequence_source(tmp_path):
+    """Images are read in numeric order, decoded ahead and delivered in order"""
+    pattern = write_sequence(tmp_path / "seq")
+    assert sequence_files(str(tmp_path / "seq"))[9].endswith("frame_10.png")
+    assert (reduction_factor(400, 100), reduction_factor(400, 500), reduction_factor(4000, 100)) == (4, 1, 8)
+
+    with ImageSequenceSource(pattern, fps=500, width=100, skip_frames=3, workers=3,
+                             prefetch=2) as source:
+        frames = [(f.index, f.timestamp, f.image, f.gray.copy()) for f in source]
+        assert source.frames_read == 12
+    assert (source.total_frames, source.source_size, source.frame_size) == (12, (400, 200), (100, 50))
+    assert [f[0] for f in frames] == [3, 6, 9, 12]
+    assert frames[1][1] == pytest.approx(5 / 500.0)
+    assert frames[0][2] is None
+    assert [int(f[3][0, 0]) for f in frames] == [60, 120, 180, 240]
+    assert frames[0][3].shape == (50, 100)
+
+    source = ImageSequenceSource(pattern, fps=500, width=100, color=True)
+    source.seek(10)
+    frames = [(f.index, f.image.shape) for f in source]
+    assert frames == [(11, (50, 100, 3)), (12, (50, 100, 3))]
+
+    # Stopping early cancels the frames decoded ahead
+    source = ImageSequenceSource(pattern, fps=500, width=100, workers=1, prefetch=4)
+    frames = iter(source)
+    next(frames)
+    frames.close()
+    assert source._pool is None and not source._pending
+
+    with pytest.raises(IOError):
+        ImageSequenceSource(str(tmp_path / "seq" / "*.jpg"), fps=500)
+
+
+def test_replay_source_paces_frames(tmp_path):
+    """Frames arrive at the playback rate, a slow consumer loses frames"""
+    path = str(tmp_path / "clip.avi")
+    write_clip(path)
+
+    with ReplaySource(path, width=100, fps=50, color=False, jitter=0.005) as source:
+        assert (source.source_size, source.frame_size) == ((200, 100), (100, 50))
+        start = time.monotonic()
+        frames = [(f.index, f.timestamp) for f in source]
+        elapsed = time.monotonic() - start
+    assert [index for index, _ in frames] == list(range(1, 11))
+    assert elapsed >= 9 / 50.0
+    assert frames[-1][1] - frames[0][1] >= 9 / 50.0 - 0.01
+    assert source.dropped == 0
+
+    with ReplaySource(path, width=100, fps=50, color=False) as source:
+        indices = []
+        for frame in source:
+            indices.append(frame.index)
+            time.sleep(0.07)
+    assert indices == sorted(indices) and indices[0] == 1
+    assert len(indices) < 10
+    assert source.published == 10
+    assert len(indices) + source.dropped == 10
+
+
+def test_shape_to_array_fills_buffer():
+    dlib = pytest.importorskip('dlib')
+    from tongue_tracking.predictors import shape_to_array
+
+    points = [(i, -i if i % 7 == 0 else 2 * i + 1) for i in range(68)]
+    shape = dlib.full_object_detection(dlib.rectangle(0, 0, 10, 10),
+                                       dlib.points([dlib.point(x, y) for x, y in points]))
+    buffer = np.zeros((68, 2), np.int32)
+
+    assert shape_to_array(shape, buffer) is buffer
+    assert buffer.tolist() == [list(p) for p in points]
+    # A buffer of the wrong shape is replaced
+    assert shape_to_array(shape, np.zeros((20, 2), np.int32)).shape == (68, 2)
+
+
+def test_video_file_source_reuses_buffers(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    write_clip(path, n=3)
+
+    with VideoFileSource(path, width=100) as source:
+        first, second = [(f.image, f.gray) for f in source][:2]
+    assert first[0] is second[0]
+    assert first[1] is second[1]
+
+
+def test_run_records_detector_name():
+    detector = FakeDetector()
+    detector.name = 'fake'
+    result = TongueTracker(detector, FakePredictor()).run(make_frames(2))
+    assert result.summary()['detector'] == 'fake'
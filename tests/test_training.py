@@ -0,0 +1,75 @@
+"""
+Tests for the mouth-only shape predictor training helpers
+"""
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from tongue_tracking.training import MOUTH_POINTS, load_annotations, subset_annotations
+
+
+def write_dataset(folder, n_images=4):
+    """iBUG-style XML with one 68-point face per image plus one ignored and one partial box"""
+    rng = np.random.default_rng(1)
+    lines = ["<?xml version='1.0'?>", "<dataset>", "<images>"]
+    for i in range(n_images):
+        image = rng.integers(0, 255, (120, 120), dtype=np.uint8)
+        cv2.imwrite(os.path.join(folder, f"img{i}.png"), image)
+        lines.append(f"  <image file='img{i}.png'>")
+        lines.append("    <box top='20' left='20' width='80' height='80'>")
+        for n in range(68):
+            lines.append(f"      <part name='{n:02d}' x='{30 + n}' y='{40 + (n * 7) % 50}'/>")
+        lines.append("    </box>")
+        if i == 0:
+            lines.append("    <box top='0' left='0' width='10' height='10' ignore='1'/>")
+            lines.append("    <box top='0' left='0' width='50' height='50'>")
+            lines.append("      <part name='48' x='5' y='5'/>")
+            lines.append("    </box>")
+        lines.append("  </image>")
+    lines += ["</images>", "</dataset>"]
+    path = os.path.join(folder, "labels.xml")
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+    return path
+
+
+def test_subset_annotations(tmp_path):
+    src = write_dataset(str(tmp_path))
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    dst = str(out_dir / "mouth.xml")
+
+    assert subset_annotations(src, dst) == (4, 4)
+
+    faces = load_annotations(dst)
+    assert len(faces) == 4
+    file, rect, parts = faces[0]
+    assert os.path.isabs(file) and os.path.exists(file)
+    assert rect == (20, 20, 80, 80)
+    # Mouth points are renumbered from 0 in the original order
+    assert sorted(parts) == list(range(len(MOUTH_POINTS)))
+    assert parts[0] == (30 + 48, 40 + (48 * 7) % 50)
+
+
+def test_mouth_only_predictor(tmp_path):
+    pytest.importorskip('dlib')
+    from tongue_tracking.predictors import LandmarkPredictor
+    from tongue_tracking.training import evaluate_predictor, train_predictor
+
+    src = write_dataset(str(tmp_path))
+    mouth_xml = str(tmp_path / "mouth.xml")
+    model = str(tmp_path / "mouth.dat")
+    subset_annotations(src, mouth_xml)
+    train_predictor(mouth_xml, model, tree_depth=2, cascade_depth=2, num_trees=5,
+                    oversampling=1, feature_pool_size=20, num_threads=1)
+
+    predictor = LandmarkPredictor(model)
+    assert predictor.num_parts == 20
+    assert predictor.landmark_ids[predictor.mouth_index] == 48
+
+    report = evaluate_predictor(model, load_annotations(src), repeats=1)
+    assert report['num_parts'] == 20
+    assert report['faces'] == 4
+    assert report['error_px'] >= 0
@@ -0,0 +1,64 @@
+"""
+Tests for loading calibration files and undistorting landmark points
+"""
+import os
+import pytest
+import numpy as np
+
+from tongue_tracking.calibration import load_calibration, PointUndistorter
+
+MTX = np.array([[1000.0, 0, 640], [0, 1000.0, 360], [0, 0, 1]])
+DIST = np.array([[-0.25, 0.08, 0.001, -0.0005, 0.0]])
+
+
+def write_calibration(folder):
+    """Write calibration files the same way calib-camera.py does"""
+    np.savetxt(os.path.join(folder, "cameraMatrix.txt"), MTX, delimiter=',')
+    np.savetxt(os.path.join(folder, "cameraDistortion.txt"), DIST, delimiter=',')
+
+
+def test_load_calibration(tmp_path):
+    """Files written by calib-camera.py load back unchanged"""
+    write_calibration(str(tmp_path))
+    mtx, dist = load_calibration(str(tmp_path))
+
+    np.testing.assert_allclose(mtx, MTX)
+    np.testing.assert_allclose(dist, DIST.ravel())
+
+
+def test_load_calibration_missing(tmp_path):
+    """A missing calibration file is reported"""
+    with pytest.raises(FileNotFoundError):
+        load_calibration(str(tmp_path))
+
+
+def test_undistort_scales_with_frame_size():
+    """Undistorting on resized frames matches the full-resolution result"""
+    points = np.array([[100, 50], [640, 360], [1200, 700]], dtype=np.float32)
+    full = PointUndistorter(MTX, DIST, (1280, 720), (1280, 720))
+    half = PointUndistorter(MTX, DIST, (1280, 720), (640, 360))
+
+    np.testing.assert_allclose(half.undistort(points / 2), full.undistort(points) / 2,
+                               atol=1e-3)
+    # The principal point is a fixed point of the distortion model
+    np.testing.assert_allclose(full.undistort([[640, 360]]), [[640, 360]], atol=1e-4)
+
+
+def test_lut_matches_direct(tmp_path):
+    """The cached lookup table gives the same result as undistortPoints"""
+    direct = PointUndistorter(MTX, DIST, (1280, 720), (500, 281))
+    lut = PointUndistorter(MTX, DIST, (1280, 720), (500, 281), use_lut=True,
+                           cache_dir=str(tmp_path))
+    assert len(os.listdir(str(tmp_path))) == 1
+
+    points = np.array([[0, 0], [10, 200], [499, 280], [250, 140]], dtype=np.float32)
+    np.testing.assert_allclose(lut.undistort(points), direct.undistort(points), atol=1e-4)
+
+    # Sub-pixel and out-of-frame points fall back to the direct computation
+    odd = np.array([[10.5, 20.25], [600, -5]], dtype=np.float32)
+    np.testing.assert_allclose(lut.undistort(odd), direct.undistort(odd), atol=1e-4)
+
+    # A second instance loads the table from the cache
+    cached = PointUndistorter(MTX, DIST, (1280, 720), (500, 281), use_lut=True,
+                              cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(cached.lut, lut.lut)
@@ -0,0 +1,45 @@
+"""
+Reusable building blocks for 3D Tongue Tip Tracking
+
+The top-level scripts (``calib-camera.py``, ``facial_landmarks_video.py``,
+...) are thin command-line wrappers around the modules in this package.
+
+The public classes below are imported on first access, so importing the
+package (or a small module such as ``tongue_tracking.service``) does not
+load OpenCV, dlib or NumPy until they are needed.
+"""
+import importlib
+
+__version__ = '1.4.0'
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    'TongueTracker': 'tracker',
+    'Frame': 'sources',
+    'VideoFileSource': 'sources',
+    'CameraSource': 'sources',
+    'ReplaySource': 'sources',
+    'FFmpegSource': 'sources',
+    'ImageSequenceSource': 'sources',
+    'DlibHogDetector': 'detectors',
+    'LandmarkPredictor': 'predictors',
+    'IdentityTracker': 'identity',
+    'Face': 'results',
+    'FrameResult': 'results',
+    'TrackingResult': 'results',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
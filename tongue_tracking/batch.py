@@ -0,0 +1,242 @@
+"""
+Parallel, resumable batch processing
+
+Jobs (one per video) are run by a pool of workers and their state is kept
+in a JSON manifest next to the results. Completed jobs whose outputs are
+unchanged are skipped on the next run, jobs interrupted while running are
+started again, and failed jobs are retried.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .utils import atomic_write, file_hash
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+MANIFEST_VERSION = 1
+
+
+class BatchJob:
+    """
+    A single unit of batch work
+
+    Args:
+        key: Unique job name (e.g. the video path)
+        cmd: Command line to run
+        outputs: Files the command is expected to create
+        info_path: Optional JSON export read for the number of processed frames
+        cwd: Optional working directory for the command
+        run: Optional callable returning (returncode, output), used
+            instead of running ``cmd`` in a subprocess
+    """
+
+    def __init__(self, key, cmd, outputs, info_path=None, cwd=None, run=None):
+        self.key = key
+        self.cmd = list(cmd or [])
+        self.outputs = list(outputs)
+        self.info_path = info_path
+        self.cwd = cwd
+        self.run = run
+
+
+class Manifest:
+    """
+    Persistent record of job states
+
+    The manifest is rewritten atomically after every state change, so it
+    is consistent even if the batch runner is killed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.jobs = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.jobs = data.get('jobs', {})
+
+    def save(self):
+        """Write the manifest to disk"""
+        with self._lock:
+            data = {'version': MANIFEST_VERSION, 'jobs': self.jobs}
+            with atomic_write(self.path) as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+
+    def get(self, key):
+        """Return the entry for a job, or None if it is unknown"""
+        return self.jobs.get(key)
+
+    def update(self, key, **fields):
+        """Update a job entry and save the manifest"""
+        with self._lock:
+            entry = self.jobs.setdefault(key, {'state': PENDING, 'attempts': 0})
+            entry.update(fields)
+        self.save()
+
+    def is_complete(self, job):
+        """True if the job finished and its outputs are still unchanged"""
+        entry = self.jobs.get(job.key)
+        if not entry or entry.get('state') != DONE:
+            return False
+        hashes = entry.get('outputs', {})
+        for path in job.outputs:
+            if path not in hashes or not os.path.exists(path):
+                return False
+            if file_hash(path) != hashes[path]:
+                return False
+        return True
+
+
+def _read_frame_count(info_path):
+    if not info_path or not os.path.exists(info_path):
+        return None
+    try:
+        with open(info_path, 'r') as f:
+            return int(json.load(f).get('frames_processed'))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _run_job(job, manifest, retries, stop=None):
+    """
+    Run a job with retries, recording every state change in the manifest
+
+    Once ``stop`` is set no new attempt is started, and an attempt that did
+    not succeed is left RUNNING (its child most likely got the same SIGINT)
+    so that the next run starts it again.
+    """
+    entry = manifest.get(job.key) or {}
+    attempts = entry.get('attempts', 0)
+
+    for _ in range(retries + 1):
+        if stop is not None and stop.is_set():
+            break
+        attempts += 1
+        start = time.time()
+        manifest.update(job.key, state=RUNNING, attempts=attempts,
+                        started=start, error=None)
+        try:
+            if job.run is not None:
+                returncode, output = job.run()
+            else:
+                result = subprocess.run(job.cmd, cwd=job.cwd, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True)
+                returncode, output = result.returncode, result.stdout
+        except Exception as e:
+            # Whatever goes wrong (e.g. a malformed service reply), the job
+            # fails and is retried instead of aborting the whole batch
+            returncode, output = -1, f"{type(e).__name__}: {e}"
+        duration = time.time() - start
+
+        missing = [p for p in job.outputs if not os.path.exists(p)]
+        if returncode == 0 and not missing:
+            manifest.update(job.key, state=DONE, finished=time.time(),
+                            duration=duration,
+                            frames=_read_frame_count(job.info_path),
+                            outputs={p: file_hash(p) for p in job.outputs})
+            return manifest.get(job.key)
+
+        if stop is not None and stop.is_set():
+            break
+        if returncode == 0:
+            error = f"missing outputs: {', '.join(missing)}"
+        else:
+            # Keep the tail of the log, that is where the error is
+            error = (output or '').strip()[-2000:] or f"exit code {returncode}"
+        manifest.update(job.key, state=FAILED, finished=time.time(),
+                        duration=duration, error=error)
+
+    return manifest.get(job.key)
+
+
+def run_batch(jobs, manifest, workers=None, retries=1, on_finish=None):
+    """
+    Run jobs in parallel, skipping the ones that are already complete
+
+    Args:
+        jobs: List of BatchJob
+        manifest: Manifest instance
+        workers: Number of parallel jobs (default: number of CPUs)
+        retries: Extra attempts for a failing job
+        on_finish: Optional callback(job, entry) called as jobs finish
+
+    Returns:
+        List of (job, entry, skipped) in the order of ``jobs``
+
+    Raises:
+        KeyboardInterrupt: After cancelling the queued jobs; jobs that were
+            running or queued are left RUNNING or PENDING in the manifest
+    """
+    workers = workers or os.cpu_count() or 1
+
+    todo = []
+    results = {}
+    for job in jobs:
+        if manifest.is_complete(job):
+            results[job.key] = (job, manifest.get(job.key), True)
+            continue
+        # Interrupted and failed jobs start again with a fresh attempt count
+        manifest.update(job.key, state=PENDING, attempts=0)
+        todo.append(job)
+
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = {pool.submit(_run_job, job, manifest, retries, stop): job for job in todo}
+    try:
+        for future in as_completed(futures):
+            job = futures[future]
+            entry = future.result()
+            results[job.key] = (job, entry, False)
+            if on_finish:
+                on_finish(job, entry)
+    except KeyboardInterrupt:
+        # Leaving the pool through its context manager would wait for every
+        # queued job. cancel_futures needs Python 3.9, cancel them one by one.
+        stop.set()
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+        raise
+    pool.shutdown()
+
+    return [results[job.key] for job in jobs]
+
+
+def format_summary(results):
+    """
+    Render batch results as a plain-text table
+
+    Args:
+        results: Return value of run_batch
+
+    Returns:
+        Table as a string
+    """
+    header = ('Video', 'State', 'Tries', 'Time (s)', 'Frames', 'FPS')
+    rows = []
+    for job, entry, skipped in results:
+        duration = entry.get('duration')
+        frames = entry.get('frames')
+        fps = frames / duration if frames and duration else None
+        rows.append((
+            os.path.basename(job.key),
+            'skipped' if skipped else entry.get('state', '?'),
+            str(entry.get('attempts', 0)),
+            f"{duration:.1f}" if duration is not None else '-',
+            str(frames) if frames is not None else '-',
+            f"{fps:.1f}" if fps is not None else '-',
+        ))
+
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    lines = ['  '.join(h.ljust(w) for h, w in zip(header, widths)).rstrip(),
+             '  '.join('-' * w for w in widths)]
+    lines += ['  '.join(c.ljust(w) for c, w in zip(row, widths)).rstrip() for row in rows]
+    return '\n'.join(lines)
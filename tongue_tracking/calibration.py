@@ -0,0 +1,422 @@
+"""
+Camera calibration helpers
+
+Chessboard corner detection with a coarse-to-fine search and an on-disk
+cache of per-image detections, so that re-running the calibration with
+different solver settings does not have to detect the corners again.
+"""
+import hashlib
+import os
+
+import numpy as np
+import cv2
+
+from .utils import atomic_write, file_hash
+
+# Flags for the coarse chessboard search. FAST_CHECK rejects images without
+# a board quickly, the other two make the search robust to uneven lighting.
+CHESSBOARD_FLAGS = (cv2.CALIB_CB_ADAPTIVE_THRESH
+                    + cv2.CALIB_CB_NORMALIZE_IMAGE
+                    + cv2.CALIB_CB_FAST_CHECK)
+
+# Longest image side used for the coarse search
+COARSE_MAX_DIM = 800
+
+# Search window of the cornerSubPix refinement
+SUBPIX_WINDOW = (11, 11)
+
+# Bumped whenever the cached format or the detection procedure changes
+CACHE_VERSION = 2
+
+
+def find_chessboard_corners(gray, pattern_size, criteria,
+                            coarse_max_dim=COARSE_MAX_DIM):
+    """
+    Find chessboard corners using a coarse-to-fine search
+
+    The board is first located on a downscaled copy of the image, then the
+    corners are scaled back and refined with ``cornerSubPix`` at full
+    resolution. If the coarse search fails the full-resolution image is
+    searched as a fallback.
+
+    Args:
+        gray: Grayscale image (uint8)
+        pattern_size: Inner corners per chessboard row and column (cols, rows)
+        criteria: Termination criteria for ``cornerSubPix``
+        coarse_max_dim: Longest side of the downscaled search image
+
+    Returns:
+        Tuple (found, corners) where corners is an (N, 1, 2) float32 array
+        or None if the pattern was not found
+    """
+    h, w = gray.shape[:2]
+    scale = min(1.0, float(coarse_max_dim) / max(h, w))
+
+    found = False
+    corners = None
+    if scale < 1.0:
+        small = cv2.resize(gray, (int(round(w * scale)), int(round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+        found, corners = cv2.findChessboardCorners(small, pattern_size,
+                                                   flags=CHESSBOARD_FLAGS)
+        if found:
+            corners = corners / scale
+
+    if not found:
+        scale = 1.0
+        found, corners = cv2.findChessboardCorners(gray, pattern_size,
+                                                   flags=CHESSBOARD_FLAGS)
+    if not found:
+        return False, None
+
+    corners = cv2.cornerSubPix(gray, corners.reshape(-1, 1, 2).astype(np.float32),
+                               SUBPIX_WINDOW, (-1, -1), criteria)
+    return True, corners
+
+
+def detection_params(criteria, coarse_max_dim=COARSE_MAX_DIM):
+    """
+    Settings that change the corners found in an image, to key the cache
+
+    Returns:
+        Short hex digest of the coarse search size, the cornerSubPix window
+        and its termination criteria
+    """
+    ctype, max_iter, eps = criteria
+    key = repr((int(coarse_max_dim), SUBPIX_WINDOW, int(ctype), int(max_iter), float(eps)))
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+class CornerCache:
+    """
+    On-disk cache of chessboard detections
+
+    Every entry is a small ``.npz`` file named after the SHA-1 of the image
+    contents, the pattern size and the detection parameters (see
+    detection_params), so renaming or copying calibration images keeps the
+    cache valid while editing an image or changing the coarse search size
+    or the refinement settings invalidates it.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, digest, pattern_size, params):
+        cols, rows = pattern_size
+        name = f"{digest}_{cols}x{rows}_{params}_v{CACHE_VERSION}.npz"
+        return os.path.join(self.cache_dir, name)
+
+    def load(self, digest, pattern_size, params):
+        """
+        Look up a cached detection
+
+        Args:
+            digest: SHA-1 of the image file
+            pattern_size: Inner corners per chessboard row and column (cols, rows)
+            params: Key of the detection parameters from detection_params()
+
+        Returns:
+            Tuple (found, corners, image_size) or None on a cache miss
+        """
+        path = self._entry_path(digest, pattern_size, params)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                found = bool(data['found'])
+                corners = data['corners'] if found else None
+                image_size = tuple(int(v) for v in data['image_size'])
+        except (OSError, KeyError, ValueError):
+            # Corrupt or partially written entry, treat as a miss
+            return None
+        return found, corners, image_size
+
+    def store(self, digest, pattern_size, params, found, corners, image_size):
+        """Store a detection result (including failed detections)"""
+        path = self._entry_path(digest, pattern_size, params)
+        with atomic_write(path, 'wb') as f:
+            np.savez(f, found=np.array(found),
+                     corners=(corners if found else np.zeros((0, 1, 2), np.float32)),
+                     image_size=np.array(image_size, dtype=np.int32))
+
+
+def detect_corners_cached(fname, pattern_size, criteria, cache=None,
+                          coarse_max_dim=COARSE_MAX_DIM):
+    """
+    Detect chessboard corners in an image file, using the cache if given
+
+    Args:
+        fname: Path to the calibration image
+        pattern_size: Inner corners per chessboard row and column (cols, rows)
+        criteria: Termination criteria for ``cornerSubPix``
+        cache: Optional CornerCache instance
+        coarse_max_dim: Longest side of the downscaled search image
+
+    Returns:
+        Tuple (found, corners, image_size, cached) where image_size is
+        (width, height), or None if the image could not be read
+    """
+    digest = params = None
+    if cache is not None:
+        digest = file_hash(fname)
+        params = detection_params(criteria, coarse_max_dim)
+        hit = cache.load(digest, pattern_size, params)
+        if hit is not None:
+            found, corners, image_size = hit
+            return found, corners, image_size, True
+
+    gray = cv2.imread(fname, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+
+    image_size = (gray.shape[1], gray.shape[0])
+    found, corners = find_chessboard_corners(gray, pattern_size, criteria,
+                                             coarse_max_dim)
+    if cache is not None:
+        cache.store(digest, pattern_size, params, found, corners, image_size)
+    return found, corners, image_size, False
+
+
+def _canonical_corners(corners, pattern_size):
+    """
+    Return the four outer board corners in a canonical order
+
+    ``findChessboardCorners`` may return the grid starting from either end,
+    so the order is flipped when needed to start at the corner closest to
+    the image origin.
+    """
+    cols, rows = pattern_size
+    pts = corners.reshape(-1, 2)
+    outer = pts[[0, cols - 1, cols * rows - 1, cols * (rows - 1)]]
+    if np.sum(outer[0]) > np.sum(outer[2]):
+        outer = outer[[2, 3, 0, 1]]
+    return outer
+
+
+def view_descriptors(imgpoints, image_size, pattern_size):
+    """
+    Describe each view by the normalized position of its outer corners
+
+    The four outer corners encode the position, scale, in-plane rotation
+    and perspective tilt of the board, which is what distinguishes one
+    calibration view from another.
+
+    Args:
+        imgpoints: List of detected corner arrays, one per view
+        image_size: Image size (width, height)
+        pattern_size: Inner corners per chessboard row and column (cols, rows)
+
+    Returns:
+        (n_views, 8) float array
+    """
+    norm = np.array(image_size, dtype=np.float64)
+    return np.array([(_canonical_corners(c, pattern_size) / norm).ravel()
+                     for c in imgpoints])
+
+
+def select_diverse_views(imgpoints, image_size, pattern_size, n_views):
+    """
+    Pick a small subset of maximally different views (farthest-point sampling)
+
+    Starts from the view whose board covers the largest image area and then
+    repeatedly adds the view farthest from everything selected so far, so
+    near-duplicate captures are only used once.
+
+    Args:
+        imgpoints: List of detected corner arrays, one per view
+        image_size: Image size (width, height)
+        pattern_size: Inner corners per chessboard row and column (cols, rows)
+        n_views: Number of views to select
+
+    Returns:
+        Sorted list of selected view indices
+    """
+    n_total = len(imgpoints)
+    if n_views >= n_total:
+        return list(range(n_total))
+
+    desc = view_descriptors(imgpoints, image_size, pattern_size)
+    areas = [cv2.contourArea(_canonical_corners(c, pattern_size).astype(np.float32))
+             for c in imgpoints]
+
+    selected = [int(np.argmax(areas))]
+    min_dist = np.linalg.norm(desc - desc[selected[0]], axis=1)
+    while len(selected) < n_views:
+        nxt = int(np.argmax(min_dist))
+        selected.append(nxt)
+        min_dist = np.minimum(min_dist, np.linalg.norm(desc - desc[nxt], axis=1))
+    return sorted(selected)
+
+
+def corner_coverage(imgpoints, image_size, grid=(10, 10)):
+    """
+    Fraction of image grid cells that contain at least one detected corner
+
+    Args:
+        imgpoints: List of detected corner arrays
+        image_size: Image size (width, height)
+        grid: Number of cells along (x, y)
+
+    Returns:
+        Coverage in [0, 1]
+    """
+    if len(imgpoints) == 0:
+        return 0.0
+    pts = np.concatenate([c.reshape(-1, 2) for c in imgpoints])
+    cells = np.floor(pts / np.array(image_size) * np.array(grid)).astype(np.int64)
+    cells = np.clip(cells, 0, np.array(grid) - 1)
+    occupied = np.unique(cells[:, 1] * grid[0] + cells[:, 0])
+    return len(occupied) / float(grid[0] * grid[1])
+
+
+def reprojection_errors(objpoints, imgpoints, mtx, dist, rvecs=None, tvecs=None):
+    """
+    Per-view reprojection error of a calibration
+
+    Views without a pose (e.g. views left out of the calibration) are
+    posed with ``solvePnP`` first, so the error can be evaluated on every
+    accepted image.
+
+    Args:
+        objpoints: List of board point arrays
+        imgpoints: List of detected corner arrays
+        mtx: Camera matrix
+        dist: Distortion coefficients
+        rvecs, tvecs: Optional lists of poses (None entries are estimated)
+
+    Returns:
+        Array of errors in pixels, one per view
+    """
+    errors = np.zeros(len(objpoints))
+    for i in range(len(objpoints)):
+        rvec = rvecs[i] if rvecs is not None else None
+        tvec = tvecs[i] if tvecs is not None else None
+        if rvec is None or tvec is None:
+            _, rvec, tvec = cv2.solvePnP(objpoints[i], imgpoints[i], mtx, dist)
+        projected, _ = cv2.projectPoints(objpoints[i], rvec, tvec, mtx, dist)
+        errors[i] = cv2.norm(imgpoints[i].reshape(-1, 1, 2).astype(np.float32),
+                             projected.astype(np.float32), cv2.NORM_L2) / len(projected)
+    return errors
+
+
+def load_calibration(folder):
+    """
+    Load the camera matrix and distortion coefficients saved by calib-camera.py
+
+    Args:
+        folder: Folder containing ``cameraMatrix.txt`` and ``cameraDistortion.txt``
+
+    Returns:
+        Tuple (camera_matrix, dist_coeffs)
+    """
+    matrix_path = os.path.join(folder, "cameraMatrix.txt")
+    dist_path = os.path.join(folder, "cameraDistortion.txt")
+    for path in (matrix_path, dist_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Calibration file not found: {path}")
+
+    mtx = np.loadtxt(matrix_path, delimiter=',').reshape(3, 3)
+    dist = np.atleast_1d(np.loadtxt(dist_path, delimiter=',')).ravel()
+    if dist.size not in (4, 5, 8, 12, 14):
+        raise ValueError(f"Unexpected number of distortion coefficients: {dist.size}")
+    return mtx, dist
+
+
+class PointUndistorter:
+    """
+    Undistort landmark coordinates instead of whole frames
+
+    The calibration is assumed to be made at the native resolution of the
+    video, while landmarks are detected on frames resized to the processing
+    width. The camera matrix is therefore scaled to the processing frame
+    size; the distortion coefficients act on normalized coordinates and
+    stay unchanged.
+
+    With ``use_lut`` the undistorted position of every integer pixel of the
+    processing frame is computed once (and cached on disk if ``cache_dir``
+    is given), after which undistorting dlib's integer landmarks is a plain
+    array lookup.
+    """
+
+    def __init__(self, mtx, dist, source_size, frame_size, use_lut=False,
+                 cache_dir=None):
+        """
+        Args:
+            mtx: Camera matrix at the source resolution
+            dist: Distortion coefficients
+            source_size: (width, height) of the original video frames
+            frame_size: (width, height) of the frames landmarks are detected on
+            use_lut: Precompute a per-pixel lookup table
+            cache_dir: Optional directory for the lookup table cache
+        """
+        sx = frame_size[0] / float(source_size[0])
+        sy = frame_size[1] / float(source_size[1])
+        self.mtx = np.array(mtx, dtype=np.float64).copy()
+        self.mtx[0] *= sx
+        self.mtx[1] *= sy
+        self.dist = np.asarray(dist, dtype=np.float64)
+        self.frame_size = tuple(int(v) for v in frame_size)
+        self.lut = None
+        if use_lut:
+            self.lut = self._load_or_build_lut(cache_dir)
+
+    def _lut_key(self):
+        sha = hashlib.sha1()
+        sha.update(self.mtx.tobytes())
+        sha.update(self.dist.tobytes())
+        sha.update(np.array(self.frame_size, dtype=np.int64).tobytes())
+        return sha.hexdigest()
+
+    def _load_or_build_lut(self, cache_dir):
+        path = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, f"undistort_{self._lut_key()}.npy")
+            if os.path.exists(path):
+                try:
+                    lut = np.load(path)
+                    if lut.shape == (self.frame_size[1], self.frame_size[0], 2):
+                        return lut
+                except (OSError, ValueError):
+                    pass
+
+        w, h = self.frame_size
+        grid = np.mgrid[0:h, 0:w][::-1].reshape(2, -1).T.astype(np.float32)
+        lut = self._undistort_direct(grid).reshape(h, w, 2)
+
+        if path:
+            with atomic_write(path, 'wb') as f:
+                np.save(f, lut)
+        return lut
+
+    def _undistort_direct(self, points):
+        pts = np.ascontiguousarray(points, dtype=np.float32).reshape(-1, 1, 2)
+        out = cv2.undistortPoints(pts, self.mtx, self.dist, P=self.mtx)
+        return out.reshape(-1, 2)
+
+    def undistort(self, points):
+        """
+        Undistort an (N, 2) array of pixel coordinates in one batched call
+
+        Returns:
+            (N, 2) float32 array of undistorted pixel coordinates
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(points) == 0:
+            return points.copy()
+
+        if self.lut is not None:
+            ix = np.rint(points[:, 0]).astype(np.intp)
+            iy = np.rint(points[:, 1]).astype(np.intp)
+            inside = ((ix == points[:, 0]) & (iy == points[:, 1])
+                      & (ix >= 0) & (iy >= 0)
+                      & (ix < self.frame_size[0]) & (iy < self.frame_size[1]))
+            if inside.all():
+                return self.lut[iy, ix]
+            out = np.empty_like(points)
+            out[inside] = self.lut[iy[inside], ix[inside]]
+            out[~inside] = self._undistort_direct(points[~inside])
+            return out
+
+        return self._undistort_direct(points)
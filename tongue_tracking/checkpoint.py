@@ -0,0 +1,160 @@
+"""
+Checkpoints of long tracking runs
+
+A Checkpoint periodically saves what a run has collected so far (the mouth
+coordinates of the TrackingResult) together with the state the tracker
+carries from frame to frame: identity tracks, motion gate references,
+seeded detector filters and the faces of the last frame. A run resumed
+from the checkpoint seeks the source to the frame after the last processed
+one and continues, so its exports are identical to those of a run that
+was never interrupted.
+
+The checkpoint is a single ``.npz`` file, replaced atomically, so a job
+that is killed while saving still leaves the previous checkpoint behind.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from .utils import atomic_write
+
+# Bumped whenever the saved state changes
+CHECKPOINT_VERSION = 1
+
+# Seconds between checkpoints
+DEFAULT_INTERVAL = 60.0
+
+
+def video_signature(path):
+    """Path, size and modification time of a video, to detect a changed input"""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+
+class Checkpoint:
+    """
+    Save and restore the progress of TongueTracker.run()
+
+    Args:
+        path: Checkpoint file (``.npz``)
+        interval: Seconds between checkpoints (0: after every frame)
+        config: JSON-serializable options of the run; a checkpoint written
+            with other options is not resumed
+    """
+
+    def __init__(self, path, interval=DEFAULT_INTERVAL, config=None):
+        self.path = path
+        self.interval = interval
+        self.config = config or {}
+        self.saved = 0
+        self.stopped = False
+        self._stop_requested = False
+        self._last_save = time.monotonic()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def request_stop(self):
+        """
+        Save and stop after the current frame
+
+        Safe to call from a signal handler (e.g. on SIGTERM when a cluster
+        preempts the job).
+        """
+        self._stop_requested = True
+
+    def read(self):
+        """
+        Read the checkpoint without checking its options
+
+        Returns:
+            Dict with ``frames_read``, ``tracker`` and ``result`` state and the
+            ``config`` it was written with
+
+        Raises:
+            ValueError: If the file is not a checkpoint of this version
+        """
+        try:
+            with np.load(self.path) as data:
+                state = json.loads(str(data['state']))
+                # The arrays of the result are .npz entries, the rest is JSON
+                state['result'].update({name: data[name] for name in data.files
+                                        if name != 'state'})
+        except (KeyError, ValueError, OSError) as e:
+            raise ValueError(f"Not a valid checkpoint: {self.path} ({e})")
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint {self.path} was written by another version")
+        return state
+
+    def load(self):
+        """
+        Read the checkpoint of a run with the same options
+
+        Raises:
+            ValueError: If the file is not a checkpoint of this version or
+                was written with different options
+        """
+        state = self.read()
+        config = json.loads(json.dumps(self.config))
+        if state['config'] != config:
+            changed = sorted(k for k in set(state['config']) | set(config)
+                             if state['config'].get(k) != config.get(k))
+            raise ValueError(f"Checkpoint {self.path} was written with different options "
+                             f"({', '.join(changed)})")
+        return state
+
+    def restore(self, tracker, result, source, rect_type=None):
+        """
+        Continue a run from the checkpoint
+
+        Restores the tracker and result state and seeks the source to the
+        first frame that was not processed.
+
+        Returns:
+            Number of frames already read from the source
+        """
+        state = self.load()
+        tracker.set_state(state['tracker'], rect_type)
+        result.set_state(state['result'])
+        source.seek(state['frames_read'])
+        return state['frames_read']
+
+    def save(self, tracker, result, source):
+        """Write the current state of a run"""
+        result_state = result.get_state()
+        arrays = {name: result_state.pop(name) for name, value in list(result_state.items())
+                  if isinstance(value, np.ndarray)}
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'config': self.config,
+            'frames_read': source.frames_read,
+            'tracker': tracker.get_state(),
+            'result': result_state,
+        }
+        with atomic_write(self.path, 'wb') as f:
+            np.savez(f, state=np.array(json.dumps(state)), **arrays)
+        self.saved += 1
+        self._last_save = time.monotonic()
+
+    def update(self, tracker, result, source):
+        """
+        Called after every frame: save when the interval has passed
+
+        Returns:
+            False if a stop was requested; the state was saved and the run
+            should end
+        """
+        if self._stop_requested:
+            self.save(tracker, result, source)
+            self.stopped = True
+            return False
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save(tracker, result, source)
+        return True
+
+    def remove(self):
+        """Delete the checkpoint (once the run is complete)"""
+        if self.exists():
+            os.remove(self.path)
@@ -0,0 +1,125 @@
+"""
+Mouth-crop sidecar videos
+
+MouthCropSink writes a small, fixed-size crop around the mouth (landmarks
+48-67) of every processed frame instead of the whole annotated frame. The
+crop follows a smoothed mouth center, so the mouth stays put in the crop
+while the head moves, and frames are written losslessly (FFV1) by default.
+A CSV map records the source frame and position of every crop, which makes
+the sidecar a cheap input for rerunning the optical flow tongue tip step.
+"""
+import csv
+import os
+
+import cv2
+import numpy as np
+
+from .predictors import LANDMARK_LAYOUTS, MOUTH_LANDMARK
+
+# (width, height) of the crop in processing pixels
+CROP_SIZE = (128, 96)
+
+# Weight of the new mouth center in the smoothed one (1: no smoothing)
+SMOOTHING = 0.3
+
+# Lossless; MJPG (written at maximum quality) is readable by more players
+CROP_CODEC = 'FFV1'
+
+
+def mouth_rows(num_points):
+    """Rows of the mouth landmarks (48-67) in a landmark array"""
+    layout = LANDMARK_LAYOUTS.get(num_points, range(num_points))
+    return [i for i, n in enumerate(layout) if n >= MOUTH_LANDMARK]
+
+
+def crop_map_path(path):
+    """Default frame map of a crop video: ``mouth.mkv`` -> ``mouth.csv``"""
+    return os.path.splitext(path)[0] + '.csv'
+
+
+class MouthCropSink:
+    """
+    Write a stabilized crop around the mouth of every frame
+
+    The crop is taken from the grayscale processing frame. Frames without
+    a face keep the last position (``detected`` is 0 in the map); frames
+    before the first face are not written. With several faces, the one
+    nearest to the current crop is followed (use ``--lock-subject`` to pick
+    a person).
+
+    Args:
+        path: Output video path
+        fps: Frame rate of the output video
+        source_size: (width, height) of the source video, for the map
+        frame_size: (width, height) of the processing frames
+        size: (width, height) of the crop
+        smoothing: Weight of the new mouth center in the smoothed center
+        codec: FourCC code of the output video
+        map_path: Frame map CSV (default: the video path with ``.csv``)
+    """
+
+    def __init__(self, path, fps, source_size, frame_size, size=CROP_SIZE,
+                 smoothing=SMOOTHING, codec=CROP_CODEC, map_path=None):
+        self.path = path
+        self.size = tuple(size)
+        self.smoothing = smoothing
+        self.scale = source_size[0] / float(frame_size[0])
+        self.map_path = map_path or crop_map_path(path)
+        self.written = 0
+        self._center = None
+        self._rows = None
+        self._crop = np.empty((self.size[1], self.size[0]), dtype=np.uint8)
+
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps,
+                                       self.size, False)
+        if not self._writer.isOpened():
+            raise IOError(f"Could not write video file: {path} (codec {codec})")
+        if codec == 'MJPG':
+            self._writer.set(cv2.VIDEOWRITER_PROP_QUALITY, 100)
+        self._map_file = open(self.map_path, 'w', newline='')
+        self._map = csv.writer(self._map_file)
+        self._map.writerow(['crop_frame', 'frame', 'timestamp', 'left', 'top', 'scale',
+                            'detected'])
+
+    def _mouth_center(self, faces):
+        """Center of the mouth to follow, None if there is no face"""
+        centers = []
+        for face in faces:
+            if self._rows is None:
+                self._rows = mouth_rows(len(face.landmarks))
+            centers.append(face.landmarks[self._rows].mean(axis=0))
+        if not centers:
+            return None
+        if self._center is None:
+            return centers[0]
+        return min(centers, key=lambda c: np.hypot(*(c - self._center)))
+
+    def write(self, result):
+        center = self._mouth_center(result.faces)
+        if center is not None:
+            if self._center is None:
+                self._center = np.asarray(center, dtype=np.float64)
+            else:
+                self._center += self.smoothing * (center - self._center)
+        elif self._center is None:
+            return True
+
+        # Whole pixels, so the crop is an exact copy of the frame (pixels
+        # outside the frame repeat its border)
+        width, height = self.size
+        left = int(round(self._center[0] - width / 2.0))
+        top = int(round(self._center[1] - height / 2.0))
+        cv2.getRectSubPix(result.frame.gray, self.size,
+                          (left + (width - 1) / 2.0, top + (height - 1) / 2.0), self._crop)
+        self._writer.write(self._crop)
+
+        self.written += 1
+        self._map.writerow([self.written, result.frame.index,
+                            f"{result.frame.timestamp:.4f}",
+                            f"{left * self.scale:.2f}", f"{top * self.scale:.2f}",
+                            f"{self.scale:.4f}", int(center is not None)])
+        return True
+
+    def close(self):
+        self._writer.release()
+        self._map_file.close()
@@ -0,0 +1,320 @@
+"""
+Face detectors
+
+A detector takes a grayscale frame and returns the face rectangles as
+``dlib.rectangle`` objects, which is what the landmark predictor expects.
+
+Available backends (see create_detector()):
+
+    hog     dlib's HOG frontal face detector (default)
+    haar    OpenCV Haar cascade
+    ssd     OpenCV DNN ResNet-10 SSD (res10_300x300_ssd_iter_140000.caffemodel
+            with deploy.prototxt)
+    yunet   OpenCV YuNet (face_detection_yunet_*.onnx)
+
+select_detector() times several backends on a few frames and picks the
+fastest one that finds the same faces as HOG.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+DETECTORS = ('hog', 'haar', 'ssd', 'yunet')
+
+# Frames and thresholds used by select_detector()
+PROBE_FRAMES = 30
+MIN_AGREEMENT = 0.9
+MIN_IOU = 0.5
+
+
+def _rectangle(x, y, w, h):
+    import dlib
+
+    return dlib.rectangle(int(x), int(y), int(x + w), int(y + h))
+
+
+class DlibHogDetector:
+    """
+    dlib's HOG-based frontal face detector
+
+    Args:
+        upsample: Number of times the image is upsampled before detection
+            (finds smaller faces, but is slower)
+    """
+
+    name = 'hog'
+
+    def __init__(self, upsample=1):
+        import dlib
+
+        self.upsample = upsample
+        self._detector = dlib.get_frontal_face_detector()
+
+    def detect(self, gray):
+        """Return the list of face rectangles in a grayscale frame"""
+        return list(self._detector(gray, self.upsample))
+
+
+class HaarCascadeDetector:
+    """
+    OpenCV Haar cascade face detector
+
+    Args:
+        cascade_path: Cascade XML file (default: the frontal face cascade
+            shipped with opencv-python)
+        scale_factor: Image pyramid scale step
+        min_neighbors: Overlapping candidates needed to accept a face
+        min_size: Smallest face size in pixels
+    """
+
+    name = 'haar'
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        if not hasattr(cv2, 'CascadeClassifier'):
+            # Moved out of the main modules in OpenCV 5
+            raise IOError("This OpenCV build has no Haar cascade support")
+        if cascade_path is None:
+            cascade_path = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        if not os.path.exists(cascade_path):
+            raise FileNotFoundError(f"Haar cascade file not found: {cascade_path}")
+        self._cascade = cv2.CascadeClassifier(cascade_path)
+        if self._cascade.empty():
+            raise IOError(f"Could not load Haar cascade: {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+
+    def detect(self, gray):
+        """Return the list of face rectangles in a grayscale frame"""
+        boxes = self._cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                               minNeighbors=self.min_neighbors,
+                                               minSize=self.min_size)
+        return [_rectangle(*box) for box in boxes]
+
+
+class _BgrInput:
+    """The DNN detectors need three channels, converted into a reused buffer"""
+
+    _bgr = None
+
+    def _to_bgr(self, gray):
+        if self._bgr is None or self._bgr.shape[:2] != gray.shape:
+            self._bgr = np.empty(gray.shape + (3,), dtype=np.uint8)
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=self._bgr)
+
+
+class DnnSsdDetector(_BgrInput):
+    """
+    OpenCV DNN single-shot detector (the ResNet-10 SSD face model)
+
+    Args:
+        model_path: Weights, e.g. res10_300x300_ssd_iter_140000.caffemodel
+        config_path: Network description, e.g. deploy.prototxt
+        confidence: Minimum detection confidence
+        input_size: Network input size
+    """
+
+    name = 'ssd'
+
+    def __init__(self, model_path, config_path=None, confidence=0.5, input_size=(300, 300)):
+        for path in (model_path, config_path):
+            if path and not os.path.exists(path):
+                raise FileNotFoundError(f"Detector model file not found: {path}")
+        self._net = cv2.dnn.readNet(model_path, config_path or '')
+        self.confidence = confidence
+        self.input_size = tuple(input_size)
+
+    def detect(self, gray):
+        """Return the list of face rectangles in a grayscale frame"""
+        h, w = gray.shape
+        blob = cv2.dnn.blobFromImage(self._to_bgr(gray), 1.0, self.input_size,
+                                     (104.0, 177.0, 123.0))
+        self._net.setInput(blob)
+        # (1, 1, N, 7): image id, class, confidence, x1, y1, x2, y2 (relative)
+        detections = self._net.forward().reshape(-1, 7)
+        detections = detections[detections[:, 2] >= self.confidence]
+        rects = []
+        for x1, y1, x2, y2 in detections[:, 3:7] * (w, h, w, h):
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, w - 1), min(y2, h - 1)
+            if x2 > x1 and y2 > y1:
+                rects.append(_rectangle(x1, y1, x2 - x1, y2 - y1))
+        return rects
+
+
+class YuNetDetector(_BgrInput):
+    """
+    OpenCV YuNet face detector
+
+    Args:
+        model_path: ONNX model, e.g. face_detection_yunet_2023mar.onnx
+        score_threshold: Minimum face score
+        nms_threshold: Non-maximum suppression IoU threshold
+    """
+
+    name = 'yunet'
+
+    def __init__(self, model_path, score_threshold=0.6, nms_threshold=0.3):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Detector model file not found: {model_path}")
+        self._detector = cv2.FaceDetectorYN.create(model_path, '', (320, 320),
+                                                   score_threshold, nms_threshold)
+        self._input_size = None
+
+    def detect(self, gray):
+        """Return the list of face rectangles in a grayscale frame"""
+        size = (gray.shape[1], gray.shape[0])
+        if size != self._input_size:
+            self._detector.setInputSize(size)
+            self._input_size = size
+        _, faces = self._detector.detect(self._to_bgr(gray))
+        if faces is None:
+            return []
+        return [_rectangle(*face[:4]) for face in faces]
+
+
+def create_detector(name, upsample=1, haar_cascade=None, ssd_model=None, ssd_config=None,
+                    yunet_model=None):
+    """
+    Create a detector by backend name
+
+    Args:
+        name: One of DETECTORS
+        upsample: HOG upsampling
+        haar_cascade: Cascade XML for 'haar' (default: OpenCV's frontal face)
+        ssd_model, ssd_config: Model files for 'ssd'
+        yunet_model: ONNX model for 'yunet'
+
+    Returns:
+        Detector instance
+    """
+    if name == 'hog':
+        return DlibHogDetector(upsample)
+    if name == 'haar':
+        return HaarCascadeDetector(haar_cascade)
+    if name == 'ssd':
+        if not ssd_model:
+            raise ValueError("The 'ssd' detector needs a model file")
+        return DnnSsdDetector(ssd_model, ssd_config)
+    if name == 'yunet':
+        if not yunet_model:
+            raise ValueError("The 'yunet' detector needs a model file")
+        return YuNetDetector(yunet_model)
+    raise ValueError(f"Unknown detector: {name} (choose from {', '.join(DETECTORS)})")
+
+
+def available_detectors(upsample=1, haar_cascade=None, ssd_model=None, ssd_config=None,
+                        yunet_model=None):
+    """
+    Create every backend that can be loaded, for select_detector()
+
+    The DNN backends are only tried when their model file is given.
+
+    Returns:
+        (detectors, errors) with HOG first and a message per backend that
+        failed to load
+    """
+    detectors = [DlibHogDetector(upsample)]
+    errors = []
+    names = ['haar']
+    if ssd_model:
+        names.append('ssd')
+    if yunet_model:
+        names.append('yunet')
+    for name in names:
+        try:
+            detectors.append(create_detector(name, upsample, haar_cascade, ssd_model,
+                                             ssd_config, yunet_model))
+        except (OSError, ValueError, cv2.error) as e:
+            errors.append(f"{name}: {e}")
+    return detectors, errors
+
+
+def iou(a, b):
+    """Intersection over union of two dlib rectangles"""
+    w = min(a.right(), b.right()) - max(a.left(), b.left())
+    h = min(a.bottom(), b.bottom()) - max(a.top(), b.top())
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    area_a = (a.right() - a.left()) * (a.bottom() - a.top())
+    area_b = (b.right() - b.left()) * (b.bottom() - b.top())
+    return inter / float(area_a + area_b - inter)
+
+
+def rect_to_box(rect):
+    """(left, top, right, bottom) of a rectangle, e.g. for saving it"""
+    return [int(rect.left()), int(rect.top()), int(rect.right()), int(rect.bottom())]
+
+
+def box_to_rect(box, rect_type=None):
+    """
+    Rectangle from a (left, top, right, bottom) box
+
+    Args:
+        box: Box as returned by rect_to_box()
+        rect_type: Rectangle class (default: ``dlib.rectangle``)
+    """
+    if rect_type is None:
+        import dlib
+
+        rect_type = dlib.rectangle
+    return rect_type(*(int(v) for v in box))
+
+
+def same_faces(reference, rects, min_iou=MIN_IOU):
+    """True if both lists hold the same number of faces, each matched by IoU"""
+    if len(reference) != len(rects):
+        return False
+    unmatched = list(rects)
+    for ref in reference:
+        best = max(unmatched, key=lambda r: iou(ref, r), default=None)
+        if best is None or iou(ref, best) < min_iou:
+            return False
+        unmatched.remove(best)
+    return True
+
+
+def select_detector(frames, candidates, min_agreement=MIN_AGREEMENT, min_iou=MIN_IOU):
+    """
+    Pick the fastest detector that finds the same faces as HOG
+
+    Args:
+        frames: Grayscale probe frames (e.g. the first frames of the video)
+        candidates: Detectors to compare; the first one with ``name == 'hog'``
+            is the reference and the fallback
+        min_agreement: Fraction of frames on which a detector must match HOG
+        min_iou: IoU needed to count two rectangles as the same face
+
+    Returns:
+        (detector, report) with one dict per candidate in the report:
+        name, seconds per frame, agreement with HOG and whether it qualified
+    """
+    reference = next((d for d in candidates if d.name == 'hog'), None)
+    if reference is None:
+        raise ValueError("select_detector needs the 'hog' detector as reference")
+
+    timings = {}
+    detections = {}
+    for detector in candidates:
+        start = time.perf_counter()
+        detections[detector] = [detector.detect(gray) for gray in frames]
+        timings[detector] = (time.perf_counter() - start) / max(len(frames), 1)
+
+    report = []
+    for detector in candidates:
+        matches = sum(same_faces(ref, rects, min_iou)
+                      for ref, rects in zip(detections[reference], detections[detector]))
+        agreement = matches / float(len(frames)) if frames else 1.0
+        report.append({
+            'name': detector.name,
+            'seconds_per_frame': timings[detector],
+            'agreement': agreement,
+            'qualified': agreement >= min_agreement,
+        })
+
+    qualified = [d for d, r in zip(candidates, report) if r['qualified']]
+    best = min(qualified, key=lambda d: timings[d])
+    return best, report
@@ -0,0 +1,294 @@
+"""
+Decoded frame cache
+
+Parameter sweeps, reprocessing and the optical flow step decode the same
+video again and again. A FrameCache decodes a video once into a raw file
+of grayscale uint8 frames at the processing width, with a JSON index next
+to it. CachedVideoSource maps that file into memory and yields frames as
+views of the mapping, so later runs neither decode nor copy, and skipped
+frames cost nothing at all.
+
+Entries are keyed by the video (path, size and modification time), the
+processing width and the decoder, so a changed video is decoded again and
+the cached frames are exactly those the decoder would produce. The least
+recently used entries are deleted when the cache would exceed its disk
+budget.
+
+Layout of an entry (e.g. for MATLAB's memmapfile):
+
+    <name>.u8    frames * height * width bytes, frame by frame, row-major
+    <name>.json  {"video": ..., "frames": N, "width": W, "height": H,
+                  "fps": ..., "data_file": "<name>.u8", "last_used": ...}
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from .checkpoint import video_signature
+from .sources import FRAME_WIDTH, FFmpegSource, Frame, VideoFileSource
+from .utils import atomic_write
+
+# Default disk budget of a cache
+DEFAULT_BUDGET = 20 * 10 ** 9
+
+CACHE_VERSION = 1
+
+
+class CachedVideoSource:
+    """
+    Frames of a video read from a FrameCache entry
+
+    Behaves like VideoFileSource with ``color=False``: frames are numbered
+    and timed as in the video. With ``color`` the gray frames are also
+    provided as BGR images (for drawing on them).
+
+    Args:
+        index_path: JSON index of the entry
+        skip_frames: Only yield every Nth frame
+        color: Also provide a BGR version of the frames
+    """
+
+    def __init__(self, index_path, skip_frames=1, color=False):
+        with open(index_path) as f:
+            self.index = json.load(f)
+        self.path = self.index['video']['path']
+        self.skip_frames = skip_frames
+        self.color = color
+        self.fps = self.index['fps']
+        self.total_frames = self.index['frames']
+        self.source_size = tuple(self.index['source_size'])
+        self.frame_size = (self.index['width'], self.index['height'])
+        self.frames_read = 0
+        data_path = os.path.join(os.path.dirname(index_path), self.index['data_file'])
+        shape = (self.total_frames, self.frame_size[1], self.frame_size[0])
+        self._frames = (np.memmap(data_path, dtype=np.uint8, mode='r', shape=shape)
+                        if self.total_frames else np.zeros(shape, dtype=np.uint8))
+
+    def seek(self, frame):
+        """Continue after the first ``frame`` frames (e.g. when resuming a run)"""
+        self.frames_read = frame
+
+    def __iter__(self):
+        image = None
+        if self.color:
+            image = np.empty(self._frames.shape[1:] + (3,), dtype=np.uint8)
+        index = self.frames_read + self.skip_frames
+        while index <= self.total_frames:
+            gray = self._frames[index - 1]
+            self.frames_read = index
+            if self.color:
+                cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=image)
+            timestamp = (index - 1) / self.fps if self.fps else 0.0
+            yield Frame(index, timestamp, image, gray)
+            index += self.skip_frames
+        self.frames_read = self.total_frames
+
+    def release(self):
+        """Unmap the frames"""
+        self._frames = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FrameCache:
+    """
+    Directory of decoded videos with a disk budget
+
+    Args:
+        directory: Cache directory (created if missing)
+        budget: Maximum size of all entries in bytes
+    """
+
+    def __init__(self, directory, budget=DEFAULT_BUDGET):
+        self.directory = directory
+        self.budget = budget
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_name(self, video, width, decoder='opencv'):
+        """File name (without extension) of the entry of a video"""
+        signature = video_signature(video)
+        key = json.dumps([signature, width, decoder, CACHE_VERSION], sort_keys=True)
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        stem = os.path.splitext(os.path.basename(video))[0]
+        return f"{stem}_{width}_{digest}"
+
+    def _index_path(self, name):
+        return os.path.join(self.directory, name + '.json')
+
+    def entries(self):
+        """Index dicts of all entries, least recently used first"""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    index = json.load(f)
+                index['index_path'] = path
+                index['bytes'] = os.path.getsize(
+                    os.path.join(self.directory, index['data_file']))
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append(index)
+        return sorted(entries, key=lambda index: index.get('last_used', 0))
+
+    def size(self):
+        """Bytes used by all entries"""
+        return sum(index['bytes'] for index in self.entries())
+
+    def remove(self, index):
+        """Delete an entry (readers that mapped it keep their frames)"""
+        for path in (os.path.join(self.directory, index['data_file']), index['index_path']):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self, needed=0, keep=()):
+        """
+        Delete least recently used entries until ``needed`` more bytes fit
+
+        Returns:
+            Names of the deleted entries
+        """
+        entries = [index for index in self.entries()
+                   if os.path.basename(index['index_path'])[:-5] not in keep]
+        total = self.size()
+        removed = []
+        for index in entries:
+            if total + needed <= self.budget:
+                break
+            self.remove(index)
+            total -= index['bytes']
+            removed.append(os.path.basename(index['index_path'])[:-5])
+        return removed
+
+    def open(self, video, width, decoder='opencv', skip_frames=1, color=False):
+        """
+        Source reading the cached frames of a video
+
+        Returns:
+            CachedVideoSource, or None if the video is not cached
+        """
+        name = self.entry_name(video, width, decoder)
+        index_path = self._index_path(name)
+        if not os.path.exists(index_path):
+            return None
+        source = CachedVideoSource(index_path, skip_frames, color)
+        source.path = video
+        # Reading counts as use for the eviction order
+        source.index['last_used'] = time.time()
+        with atomic_write(index_path) as f:
+            json.dump(source.index, f, indent=2)
+        return source
+
+    def build(self, video, width, decoder='opencv', progress=None):
+        """
+        Decode a video into the cache
+
+        Args:
+            video: Video file
+            width: Processing width
+            decoder: 'opencv' or 'ffmpeg', the decoder the frames come from
+            progress: Optional callback(frames_decoded, total_frames)
+
+        Returns:
+            Name of the entry
+
+        Raises:
+            IOError: If the video cannot be decoded or does not fit the budget
+        """
+        name = self.entry_name(video, width, decoder)
+        source_class = FFmpegSource if decoder == 'ffmpeg' else VideoFileSource
+        source = source_class(video, width=width, color=False)
+        w, h = source.frame_size
+        expected = source.total_frames * w * h
+        if expected > self.budget:
+            source.release()
+            raise IOError(f"{video} needs {expected / 1e9:.1f} GB, more than the cache "
+                          f"budget of {self.budget / 1e9:.1f} GB")
+        self.evict(expected, keep=(name,))
+
+        data_file = name + '.u8'
+        frames = 0
+        try:
+            with atomic_write(os.path.join(self.directory, data_file), 'wb') as f:
+                for frame in source:
+                    f.write(frame.gray.data)
+                    frames += 1
+                    if progress:
+                        progress(frames, source.total_frames)
+        finally:
+            source.release()
+
+        index = {
+            'version': CACHE_VERSION,
+            'video': video_signature(video),
+            'decoder': decoder,
+            'frames': frames,
+            'width': w,
+            'height': h,
+            'source_size': list(source.source_size),
+            'fps': source.fps,
+            'dtype': 'uint8',
+            'data_file': data_file,
+            'created': time.time(),
+            'last_used': time.time(),
+        }
+        with atomic_write(self._index_path(name)) as f:
+            json.dump(index, f, indent=2)
+        # The frame count in the container can be off
+        self.evict(0, keep=(name,))
+        return name
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m tongue_tracking.framecache",
+                                 description="Manage a decoded frame cache")
+    ap.add_argument("--cache", required=True, help="cache directory")
+    ap.add_argument("--budget", type=float, default=DEFAULT_BUDGET / 1e9,
+                    help="disk budget in GB (default: %(default)g)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="decode videos into the cache")
+    build.add_argument("videos", nargs="+")
+    build.add_argument("--width", type=int, default=FRAME_WIDTH,
+                       help=f"processing width (default: {FRAME_WIDTH})")
+    build.add_argument("--decoder", choices=("opencv", "ffmpeg"), default="opencv")
+    sub.add_parser("list", help="show the cached videos")
+    clear = sub.add_parser("clear", help="delete cached videos")
+    clear.add_argument("videos", nargs="*", help="only these videos (default: all)")
+    args = ap.parse_args(argv)
+
+    cache = FrameCache(args.cache, int(args.budget * 1e9))
+    if args.command == "build":
+        for video in args.videos:
+            try:
+                name = cache.build(video, args.width, args.decoder)
+            except IOError as e:
+                print(f"Error: {e}")
+                return 1
+            print(f"Cached {video} as {name}")
+    elif args.command == "list":
+        for index in cache.entries():
+            print(f"{os.path.basename(index['index_path'])[:-5]}  {index['frames']} frames "
+                  f"{index['width']}x{index['height']}  {index['bytes'] / 1e6:.1f} MB  "
+                  f"{index['video']['path']}")
+        print(f"{cache.size() / 1e9:.2f} of {cache.budget / 1e9:.2f} GB used")
+    else:
+        videos = {os.path.abspath(video) for video in args.videos}
+        for index in cache.entries():
+            if not videos or index['video']['path'] in videos:
+                cache.remove(index)
+                print(f"Removed {index['video']['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Motion gating
+
+During rest periods the mouth hardly moves, yet every frame goes through
+face detection and landmark prediction. MotionGate compares a small,
+downscaled copy of the mouth region with the one of the last processed
+frame; if the mean absolute difference stays below a threshold the frame
+is considered static and the tracker carries the previous landmarks forward
+instead of running dlib.
+"""
+import cv2
+import numpy as np
+
+# Mean absolute gray level difference below which the mouth is static
+DEFAULT_THRESHOLD = 2.0
+
+# Size the mouth region is downscaled to before comparing
+ROI_SIZE = (32, 16)
+
+
+class MotionGate:
+    """
+    Decide whether a frame can reuse the landmarks of the previous one
+
+    Args:
+        threshold: Mean absolute difference (gray levels) that counts as motion
+        size: (width, height) the mouth regions are downscaled to
+        margin: Margin added around the mouth landmarks, relative to their extent
+        max_carry: Process a frame after this many carried frames anyway, so
+            slow drifts and new faces are picked up
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, size=ROI_SIZE, margin=0.25, max_carry=30):
+        self.threshold = threshold
+        self.size = tuple(size)
+        self.margin = margin
+        self.max_carry = max_carry
+        self.carried = 0
+        self._regions = []
+        self._references = []
+        self._sample = np.empty((self.size[1], self.size[0]), dtype=np.uint8)
+
+    def _downscale(self, gray, region, out):
+        x0, y0, x1, y1 = region
+        return cv2.resize(gray[y0:y1, x0:x1], self.size, dst=out, interpolation=cv2.INTER_AREA)
+
+    def update(self, gray, mouths):
+        """
+        Remember the mouth regions of a processed frame
+
+        Args:
+            gray: Grayscale frame the landmarks were predicted on
+            mouths: (N, 2) mouth landmark arrays, one per face
+        """
+        height, width = gray.shape
+        self._regions = []
+        for points in mouths:
+            x0, y0 = points.min(axis=0)
+            x1, y1 = points.max(axis=0)
+            mx = (x1 - x0) * self.margin + 2
+            my = (y1 - y0) * self.margin + 2
+            region = (int(max(x0 - mx, 0)), int(max(y0 - my, 0)),
+                      int(min(x1 + mx, width)), int(min(y1 + my, height)))
+            if region[2] <= region[0] or region[3] <= region[1]:
+                # Mouth outside the frame, nothing to compare
+                self._regions = []
+                break
+            i = len(self._regions)
+            if i == len(self._references):
+                self._references.append(np.empty_like(self._sample))
+            self._downscale(gray, region, self._references[i])
+            self._regions.append(region)
+        self.carried = 0
+
+    def is_static(self, gray):
+        """True if no mouth region changed since the last processed frame"""
+        if not self._regions or self.carried >= self.max_carry:
+            return False
+        for region, reference in zip(self._regions, self._references):
+            sample = self._downscale(gray, region, self._sample)
+            if cv2.norm(sample, reference, cv2.NORM_L1) / sample.size > self.threshold:
+                return False
+        self.carried += 1
+        return True
+
+    def get_state(self):
+        """Mouth regions and their reference samples, as JSON-serializable values"""
+        return {
+            'regions': [list(region) for region in self._regions],
+            'references': [ref.tolist() for ref in self._references[:len(self._regions)]],
+            'carried': self.carried,
+        }
+
+    def set_state(self, state):
+        """Restore the state saved by get_state()"""
+        self._regions = [tuple(region) for region in state['regions']]
+        self._references = [np.array(ref, dtype=np.uint8) for ref in state['references']]
+        self.carried = state['carried']
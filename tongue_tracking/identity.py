@@ -0,0 +1,125 @@
+"""
+Face identity tracking
+
+IdentityTracker gives every face a stable id across frames by matching the
+rectangles of consecutive frames, first by overlap (IoU) and then by the
+distance of their centers. Faces that are not seen for a while are
+forgotten, except for the locked subject (see TongueTracker), which is kept
+until it shows up again.
+"""
+from .detectors import box_to_rect, iou, rect_to_box
+
+# Lock onto the largest face of the first frame with faces
+LARGEST = 'largest'
+
+
+def _center(rect):
+    return ((rect.left() + rect.right()) / 2.0, (rect.top() + rect.bottom()) / 2.0)
+
+
+def _size(rect):
+    return max(rect.right() - rect.left(), rect.bottom() - rect.top(), 1)
+
+
+def largest_face(rects):
+    """Index of the largest rectangle"""
+    return max(range(len(rects)),
+               key=lambda i: (rects[i].right() - rects[i].left()) * (rects[i].bottom() - rects[i].top()))
+
+
+class IdentityTracker:
+    """
+    Assign stable ids to the faces found in consecutive frames
+
+    Args:
+        min_iou: Overlap needed to match a face to a track
+        max_distance: Largest center distance, relative to the face size,
+            for matching the faces left after the IoU pass
+        max_missing: Frames a track is kept without a match
+    """
+
+    def __init__(self, min_iou=0.3, max_distance=0.5, max_missing=15):
+        self.min_iou = min_iou
+        self.max_distance = max_distance
+        self.max_missing = max_missing
+        self.tracks = {}   # id -> [last rect, frames missing]
+        self.pinned = set()
+        self._next_id = 1
+
+    def pin(self, face_id):
+        """Never forget this track (used for the locked subject)"""
+        self.pinned.add(face_id)
+
+    def assign(self, rects):
+        """
+        Match the faces of a new frame to the known tracks
+
+        Args:
+            rects: Face rectangles of the frame
+
+        Returns:
+            List with the id of every rectangle
+        """
+        ids = [None] * len(rects)
+        free = set(self.tracks)
+
+        # Greedy matching, best overlap first
+        pairs = sorted(((iou(self.tracks[t][0], r), t, i)
+                        for t in free for i, r in enumerate(rects)), reverse=True)
+        for overlap, track, i in pairs:
+            if overlap < self.min_iou:
+                break
+            if track in free and ids[i] is None:
+                ids[i] = track
+                free.discard(track)
+
+        # Faces that moved too far for any overlap, by center distance
+        pairs = []
+        for i, rect in enumerate(rects):
+            if ids[i] is not None:
+                continue
+            cx, cy = _center(rect)
+            for track in free:
+                last = self.tracks[track][0]
+                lx, ly = _center(last)
+                distance = ((cx - lx) ** 2 + (cy - ly) ** 2) ** 0.5 / _size(last)
+                if distance <= self.max_distance:
+                    pairs.append((distance, track, i))
+        for distance, track, i in sorted(pairs):
+            if track in free and ids[i] is None:
+                ids[i] = track
+                free.discard(track)
+
+        for i, rect in enumerate(rects):
+            if ids[i] is None:
+                ids[i] = self._next_id
+                self._next_id += 1
+            self.tracks[ids[i]] = [rect, 0]
+
+        for track in free:
+            self.tracks[track][1] += 1
+            if self.tracks[track][1] > self.max_missing and track not in self.pinned:
+                del self.tracks[track]
+        return ids
+
+    def get_state(self):
+        """Tracks and id counter, as JSON-serializable values"""
+        return {
+            'tracks': [[t, rect_to_box(rect), missing]
+                       for t, (rect, missing) in self.tracks.items()],
+            'pinned': sorted(self.pinned),
+            'next_id': self._next_id,
+        }
+
+    def set_state(self, state, rect_type=None):
+        """
+        Restore the state saved by get_state()
+
+        Args:
+            state: Dict from get_state()
+            rect_type: Rectangle class of the tracks (default: dlib.rectangle)
+        """
+        self.tracks = {t: [box_to_rect(box, rect_type), missing]
+                       for t, box, missing in state['tracks']}
+        self.pinned = set(state['pinned'])
+        self._next_id = state['next_id']
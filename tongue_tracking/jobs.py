@@ -0,0 +1,224 @@
+"""
+Tracking scripts run as background jobs
+
+ScriptJob starts a script (e.g. ``facial_landmarks_video.py`` with
+``--progress-events``) in a subprocess and reads its output on a thread.
+Progress events only replace the latest progress, regular lines are
+collected until the owner takes them, so a GUI can poll a job at its own
+rate without a callback per line. JobQueue runs many of them with a limit
+on the number running at the same time.
+"""
+import collections
+import os
+import subprocess
+import threading
+import time
+
+from .progress import parse_event
+from .service import DONE, FAILED, QUEUED, RUNNING
+
+CANCELLED = 'cancelled'
+
+# Output lines kept until they are taken, older ones are dropped
+MAX_PENDING_LINES = 1000
+
+
+class ScriptJob:
+    """
+    A tracking script running in a subprocess
+
+    Args:
+        cmd: Command line
+        cwd: Working directory of the script
+        name: Label of the job (e.g. the video file)
+    """
+
+    def __init__(self, cmd, cwd=None, name=None):
+        self.cmd = list(cmd)
+        self.cwd = cwd
+        self.name = name
+        self.attempts = 0
+        self.state = QUEUED
+        self.progress = None      # latest 'progress' event
+        self.summary = None       # 'finish' event
+        self.returncode = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._lines = collections.deque(maxlen=MAX_PENDING_LINES)
+        self._lock = threading.Lock()
+        self._proc = None
+        self._thread = None
+        self._cancelled = False
+
+    def start(self):
+        """Start the script and the thread reading its output"""
+        with self._lock:
+            if self._cancelled:
+                return
+            self.state = RUNNING
+            self.attempts += 1
+            self.started = time.time()
+            self.finished = None
+            self.progress = self.summary = self.returncode = self.error = None
+            try:
+                # Unbuffered, so messages arrive as they are printed, not
+                # when the pipe buffer of the script is full
+                env = dict(os.environ, PYTHONUNBUFFERED='1')
+                self._proc = subprocess.Popen(self.cmd, cwd=self.cwd, env=env,
+                                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                              text=True, bufsize=1)
+            except OSError as e:
+                self._finish(FAILED, str(e))
+                return
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _finish(self, state, error=None):
+        self.state = state
+        self.error = error
+        self.finished = time.time()
+
+    def _read(self):
+        for line in self._proc.stdout:
+            line = line.rstrip('\n')
+            event = parse_event(line)
+            with self._lock:
+                if event is None:
+                    self._lines.append(line)
+                elif event['event'] == 'progress':
+                    self.progress = event
+                elif event['event'] == 'finish':
+                    self.summary = event
+        returncode = self._proc.wait()
+        self._proc.stdout.close()
+        with self._lock:
+            self.returncode = returncode
+            if self._cancelled:
+                self._finish(CANCELLED)
+            elif returncode == 0:
+                self._finish(DONE)
+            else:
+                self._finish(FAILED, f"exit code {returncode}")
+
+    def take_lines(self):
+        """Output lines since the last call"""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+        return lines
+
+    def last_lines(self, n=20):
+        """The last ``n`` output lines not taken yet (e.g. to show an error)"""
+        with self._lock:
+            return list(self._lines)[-n:]
+
+    def cancel(self):
+        """
+        Stop the job
+
+        The script gets SIGTERM, so a run with ``--checkpoint`` saves its
+        progress before it exits.
+        """
+        with self._lock:
+            self._cancelled = True
+            if self.state == QUEUED:
+                self._finish(CANCELLED)
+            elif self._proc is not None and self._proc.poll() is None:
+                self._proc.terminate()
+
+    def reset(self):
+        """Queue a failed or cancelled job again"""
+        with self._lock:
+            if self.state not in (FAILED, CANCELLED):
+                return False
+            self.state = QUEUED
+            self._cancelled = False
+            self._lines.clear()
+            self._proc = None
+            return True
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    @property
+    def elapsed(self):
+        """Seconds since the job started, until it finished"""
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    def wait(self, timeout=None):
+        """Wait for the script to end, True if it did"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.active
+
+
+def default_concurrency():
+    """One job per CPU, leaving one for decoding and the GUI"""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+class JobQueue:
+    """
+    ScriptJobs started in order, at most ``max_running`` at a time
+
+    The queue has no thread of its own: pump() starts waiting jobs when
+    there is room and is meant to be called periodically (e.g. from the
+    GUI's poll loop).
+
+    Args:
+        max_running: Jobs running at the same time (default: CPUs - 1)
+    """
+
+    def __init__(self, max_running=None):
+        self.max_running = max_running or default_concurrency()
+        self.jobs = []
+
+    def add(self, job):
+        self.jobs.append(job)
+        return job
+
+    def remove(self, job):
+        """Cancel a job and drop it from the queue"""
+        job.cancel()
+        self.jobs.remove(job)
+
+    def retry(self, job):
+        """Queue a failed or cancelled job again, True if it was"""
+        return job.reset()
+
+    @property
+    def running(self):
+        return [job for job in self.jobs if job.state == RUNNING]
+
+    def counts(self):
+        """Number of jobs in every state"""
+        counts = {}
+        for job in self.jobs:
+            counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
+
+    def pump(self):
+        """
+        Start queued jobs while fewer than max_running are running
+
+        Returns:
+            The jobs started
+        """
+        free = self.max_running - len(self.running)
+        started = []
+        for job in self.jobs:
+            if free <= 0:
+                break
+            if job.state == QUEUED:
+                job.start()
+                started.append(job)
+                free -= 1
+        return started
+
+    def cancel_all(self):
+        for job in self.jobs:
+            job.cancel()
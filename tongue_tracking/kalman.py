@@ -0,0 +1,317 @@
+"""
+Kalman filtering of landmark trajectories
+
+A constant-velocity model (position and velocity per coordinate, white
+noise acceleration) is run forward over the frames of a trajectory and
+smoothed backwards with the Rauch-Tung-Striebel smoother. Frames without
+a measurement (skipped or carried-forward frames) are filled in by the
+model, so sparse processing still gives a dense, per-frame signal with an
+uncertainty estimate.
+
+The same model predicts where a face rectangle will be in the next frame,
+which SeededDetector uses to search a small region first.
+"""
+import csv
+import json
+
+import numpy as np
+
+# Standard deviations: of the acceleration (pixels/frame^2) and of a
+# landmark measurement (pixels)
+PROCESS_NOISE = 0.5
+MEASUREMENT_NOISE = 1.0
+
+# Initial velocity uncertainty (pixels/frame)
+INITIAL_VELOCITY_STD = 10.0
+
+_F = np.array([[1.0, 1.0], [0.0, 1.0]])
+_G = np.array([[0.5], [1.0]])
+
+
+class ConstantVelocityFilter:
+    """
+    Kalman filter for several coordinates that follow the same model
+
+    All coordinates are measured together, so they share one 2x2
+    covariance; the state is a (2, n) array of positions and velocities.
+
+    Args:
+        position: Initial measurement, one value per coordinate
+        process_noise: Acceleration standard deviation (pixels/frame^2)
+        measurement_noise: Measurement standard deviation (pixels)
+    """
+
+    def __init__(self, position, process_noise=PROCESS_NOISE,
+                 measurement_noise=MEASUREMENT_NOISE):
+        position = np.asarray(position, dtype=np.float64)
+        self.state = np.vstack((position, np.zeros_like(position)))
+        self.covariance = np.diag([measurement_noise ** 2, INITIAL_VELOCITY_STD ** 2])
+        self.Q = (process_noise ** 2) * (_G @ _G.T)
+        self.R = measurement_noise ** 2
+
+    def predict(self, steps=1):
+        """Advance the state by ``steps`` frames and return the positions"""
+        for _ in range(steps):
+            self.state = _F @ self.state
+            self.covariance = _F @ self.covariance @ _F.T + self.Q
+        return self.state[0]
+
+    def update(self, position):
+        """Correct the state with a measurement of all coordinates"""
+        P = self.covariance
+        gain = P[:, 0] / (P[0, 0] + self.R)
+        self.state = self.state + np.outer(gain, np.asarray(position) - self.state[0])
+        self.covariance = P - np.outer(gain, P[0])
+        return self.state[0]
+
+    def get_state(self):
+        """State and covariance, as JSON-serializable values"""
+        return {'state': self.state.tolist(), 'covariance': self.covariance.tolist()}
+
+    def set_state(self, state):
+        """Restore the state saved by get_state()"""
+        self.state = np.array(state['state'], dtype=np.float64)
+        self.covariance = np.array(state['covariance'], dtype=np.float64)
+
+
+def smooth(frames, positions, process_noise=PROCESS_NOISE, measurement_noise=MEASUREMENT_NOISE,
+           dense=True):
+    """
+    Kalman filter and RTS-smooth one trajectory
+
+    Args:
+        frames: Increasing frame numbers of the measurements
+        positions: (N, D) measured coordinates
+        process_noise, measurement_noise: See ConstantVelocityFilter
+        dense: Estimate every frame from the first to the last measurement,
+            not only the measured ones
+
+    Returns:
+        (frames, positions, std, measured): output frame numbers, (M, D)
+        smoothed coordinates, (M,) standard deviation of each coordinate
+        and (M,) flags of the frames that had a measurement
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    positions = np.asarray(positions, dtype=np.float64)
+    if len(frames) == 0:
+        return frames, positions.reshape(0, positions.shape[-1]), np.zeros(0), np.zeros(0, bool)
+    if np.any(np.diff(frames) <= 0):
+        raise ValueError("Frame numbers must be strictly increasing")
+
+    steps = frames[-1] - frames[0] + 1
+    kf = ConstantVelocityFilter(positions[0], process_noise, measurement_noise)
+    dims = positions.shape[1]
+    predicted = np.empty((steps, 2, dims))
+    predicted_cov = np.empty((steps, 2, 2))
+    filtered = np.empty((steps, 2, dims))
+    filtered_cov = np.empty((steps, 2, 2))
+    measured = np.zeros(steps, dtype=bool)
+    measured[frames - frames[0]] = True
+
+    m = 0
+    for t in range(steps):
+        if t:
+            kf.predict()
+        predicted[t], predicted_cov[t] = kf.state, kf.covariance
+        if measured[t]:
+            kf.update(positions[m])
+            m += 1
+        filtered[t], filtered_cov[t] = kf.state, kf.covariance
+
+    # Rauch-Tung-Striebel backward pass
+    state = filtered[-1]
+    cov = filtered_cov[-1]
+    smoothed = np.empty((steps, dims))
+    variance = np.empty(steps)
+    smoothed[-1], variance[-1] = state[0], cov[0, 0]
+    for t in range(steps - 2, -1, -1):
+        gain = filtered_cov[t] @ _F.T @ np.linalg.inv(predicted_cov[t + 1])
+        state = filtered[t] + gain @ (state - predicted[t + 1])
+        cov = filtered_cov[t] + gain @ (cov - predicted_cov[t + 1]) @ gain.T
+        smoothed[t], variance[t] = state[0], cov[0, 0]
+
+    out_frames = np.arange(frames[0], frames[-1] + 1)
+    std = np.sqrt(np.maximum(variance, 0))
+    if not dense:
+        keep = measured
+        return out_frames[keep], smoothed[keep], std[keep], measured[keep]
+    return out_frames, smoothed, std, measured
+
+
+class SmoothedTrajectory:
+    """
+    Kalman-smoothed mouth coordinates of a run, one trajectory per face
+
+    Attributes:
+        frames, face_ids, mouth_x, mouth_y: Smoothed coordinates
+        std: Standard deviation of mouth_x and mouth_y (pixels)
+        measured: True where the frame had a measurement
+    """
+
+    def __init__(self, frames, face_ids, mouth_x, mouth_y, std, measured,
+                 process_noise, measurement_noise, dense):
+        self.frames = frames
+        self.face_ids = face_ids
+        self.mouth_x = mouth_x
+        self.mouth_y = mouth_y
+        self.std = std
+        self.measured = measured
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.dense = dense
+
+    @classmethod
+    def from_result(cls, result, process_noise=PROCESS_NOISE,
+                    measurement_noise=MEASUREMENT_NOISE, dense=True):
+        """
+        Smooth the trajectory of every face of a TrackingResult
+
+        Rows carried forward by the motion gate are not measurements and
+        are left to the model.
+        """
+        parts = []
+        keep = ~result.carried
+        for face_id in np.unique(result.face_ids):
+            rows = keep & (result.face_ids == face_id)
+            points = np.column_stack((result.mouth_x[rows], result.mouth_y[rows]))
+            frames, positions, std, measured = smooth(result.frames[rows], points,
+                                                      process_noise, measurement_noise, dense)
+            parts.append((frames, np.full(len(frames), face_id, dtype=np.int32),
+                          positions, std, measured))
+
+        if parts:
+            frames, face_ids, positions, std, measured = (np.concatenate(p) for p in zip(*parts))
+        else:
+            frames, face_ids = np.zeros(0, np.int64), np.zeros(0, np.int32)
+            positions, std, measured = np.zeros((0, 2)), np.zeros(0), np.zeros(0, bool)
+        return cls(frames, face_ids, positions[:, 0], positions[:, 1], std, measured,
+                   process_noise, measurement_noise, dense)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def export_csv(self, path):
+        """Write frame, face_id, mouth_x, mouth_y, std, measured rows to a CSV file"""
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['frame', 'face_id', 'mouth_x', 'mouth_y', 'std', 'measured'])
+            for i in range(len(self)):
+                writer.writerow([self.frames[i], self.face_ids[i],
+                                 f"{self.mouth_x[i]:.3f}", f"{self.mouth_y[i]:.3f}",
+                                 f"{self.std[i]:.3f}", int(self.measured[i])])
+
+    def export_json(self, path):
+        """Write the smoothing parameters and coordinates to a JSON file"""
+        data = {
+            'process_noise': self.process_noise,
+            'measurement_noise': self.measurement_noise,
+            'dense': self.dense,
+            'coordinates': [
+                {
+                    'frame': int(self.frames[i]),
+                    'face_id': int(self.face_ids[i]),
+                    'mouth_x': float(self.mouth_x[i]),
+                    'mouth_y': float(self.mouth_y[i]),
+                    'std': float(self.std[i]),
+                    'measured': bool(self.measured[i])
+                }
+                for i in range(len(self))
+            ]
+        }
+        with open(path, 'w') as jsonfile:
+            json.dump(data, jsonfile, indent=2)
+
+
+class SeededDetector:
+    """
+    Search faces around their predicted position before the whole frame
+
+    The rectangles of the last detection are followed with constant-velocity
+    filters. The wrapped detector first runs on the region around the
+    predicted rectangles; only if it does not find the same number of faces
+    there is the full frame searched. The full frame is also searched every
+    ``refresh`` frames, so faces that appear elsewhere are picked up.
+
+    Args:
+        detector: Detector to wrap
+        margin: Margin around the predicted rectangles, relative to their size
+        refresh: Frames between full-frame searches
+    """
+
+    def __init__(self, detector, margin=0.5, refresh=15):
+        self.detector = detector
+        self.margin = margin
+        self.refresh = refresh
+        self.seeded = 0
+        self.full = 0
+        self._since_full = 0
+        self._filters = []
+
+    @property
+    def name(self):
+        return getattr(self.detector, 'name', None)
+
+    def _region(self, predicted, shape):
+        height, width = shape
+        boxes = np.array(predicted)
+        size = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        pad = self.margin * size.max()
+        x0, y0 = boxes[:, 0].min() - pad, boxes[:, 1].min() - pad
+        x1, y1 = boxes[:, 2].max() + pad, boxes[:, 3].max() + pad
+        return (int(max(x0, 0)), int(max(y0, 0)), int(min(x1, width)), int(min(y1, height)))
+
+    def _follow(self, rects, predicted):
+        """Update the rectangle filters, matching rectangles by center distance"""
+        boxes = [(r.left(), r.top(), r.right(), r.bottom()) for r in rects]
+        if len(boxes) != len(self._filters):
+            self._filters = [ConstantVelocityFilter(b) for b in boxes]
+            return
+        centers = np.array([((b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0) for b in boxes])
+        filters = list(self._filters)
+        for p in predicted:
+            center = ((p[0] + p[2]) / 2.0, (p[1] + p[3]) / 2.0)
+            i = int(np.argmin(np.hypot(*(centers - center).T)))
+            filters.pop(0).update(boxes[i])
+            centers[i] = np.inf
+
+    def detect(self, gray):
+        """Return the list of face rectangles in a grayscale frame"""
+        predicted = [f.predict() for f in self._filters]
+        self._since_full += 1
+        if predicted and self._since_full < self.refresh:
+            x0, y0, x1, y1 = self._region(predicted, gray.shape)
+            if x1 > x0 and y1 > y0:
+                crop = np.ascontiguousarray(gray[y0:y1, x0:x1])
+                rects = self.detector.detect(crop)
+                if len(rects) == len(predicted):
+                    rects = [type(r)(r.left() + x0, r.top() + y0, r.right() + x0, r.bottom() + y0)
+                             for r in rects]
+                    self.seeded += 1
+                    self._follow(rects, predicted)
+                    return rects
+
+        rects = self.detector.detect(gray)
+        self.full += 1
+        self._since_full = 0
+        self._follow(rects, predicted)
+        return rects
+
+    def get_state(self):
+        """Rectangle filters and counters, as JSON-serializable values"""
+        return {
+            'filters': [f.get_state() for f in self._filters],
+            'seeded': self.seeded,
+            'full': self.full,
+            'since_full': self._since_full,
+        }
+
+    def set_state(self, state):
+        """Restore the state saved by get_state()"""
+        self._filters = []
+        for saved in state['filters']:
+            f = ConstantVelocityFilter(np.zeros(4))
+            f.set_state(saved)
+            self._filters.append(f)
+        self.seeded = state['seeded']
+        self.full = state['full']
+        self._since_full = state['since_full']
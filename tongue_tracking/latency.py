@@ -0,0 +1,163 @@
+"""
+Capture-to-result latency of the live path
+
+LatencyMonitor records four wall-clock timestamps per frame:
+
+    capture    the frame was captured (CameraSource.capture_time: the
+               backend's buffer timestamp, or when grab() returned,
+               before decoding; ReplaySource: the frame was published)
+    detect     tracking of the frame started
+    landmarks  the landmarks of all faces were ready
+    publish    the result was recorded, drawn and sent to the preview
+
+and derives the intervals between them: ``queue`` (capture to detect,
+including decoding, resizing and gray conversion), ``tracking`` (detect to
+landmarks), ``publish`` (landmarks to publish) and ``total`` (capture to
+publish). Rolling percentiles over the last frames are available for an
+overlay, percentiles over the whole session for the summary.
+
+Dropped frames are counted from gaps in the frame numbers (ReplaySource
+skips the numbers of frames it dropped) or, when the frame rate is known,
+from gaps between capture times longer than one and a half frames, which
+is how frames dropped by a camera driver show up.
+
+With a metrics file, one CSV row is written per frame and a JSON summary
+next to it (``latency.csv`` -> ``latency.json``).
+"""
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from .utils import atomic_write
+
+STAGES = ('capture', 'detect', 'landmarks', 'publish')
+
+# Interval -> (from stage, to stage)
+INTERVALS = {
+    'queue': ('capture', 'detect'),
+    'tracking': ('detect', 'landmarks'),
+    'publish': ('landmarks', 'publish'),
+    'total': ('capture', 'publish'),
+}
+
+PERCENTILES = (50, 95, 99)
+
+# Frames in the rolling window
+WINDOW = 300
+
+
+def summary_path(path):
+    """Summary written next to a metrics file: ``latency.csv`` -> ``latency.json``"""
+    return os.path.splitext(path)[0] + '.json'
+
+
+class LatencyMonitor:
+    """
+    Per-frame latency of the live path
+
+    Call begin() when a frame is about to be tracked, landmarks_ready()
+    after the tracker returned and published() once the result is out.
+
+    Args:
+        fps: Frame rate of the source, to count frames dropped between
+            captures (None or 0: only count gaps in the frame numbers)
+        window: Frames in the rolling percentiles
+        path: Optional metrics CSV file
+    """
+
+    def __init__(self, fps=None, window=WINDOW, path=None):
+        self.fps = fps
+        self.window = window
+        self.path = path
+        self.frames = 0
+        self.dropped = 0
+        self._stamps = None
+        self._last = None
+        # Intervals in seconds, a ring buffer of the last frames and a list
+        # of all frames of the session
+        self._recent = np.zeros((window, len(INTERVALS)))
+        self._history = []
+        self._file = None
+        if path:
+            self._file = open(path, 'w', newline='')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(['frame'] + list(STAGES) +
+                               [f'{name}_ms' for name in INTERVALS] + ['dropped'])
+
+    def begin(self, index, captured, now=None):
+        """
+        A frame is about to be tracked
+
+        Args:
+            index: Frame number from the source
+            captured: Wall-clock capture time (seconds since the epoch)
+            now: Detection start (default: the current time)
+        """
+        if self._last is not None:
+            last_index, last_captured = self._last
+            missing = index - last_index - 1
+            if missing <= 0 and self.fps:
+                missing = int(round((captured - last_captured) * self.fps)) - 1
+            self.dropped += max(missing, 0)
+        self._last = (index, captured)
+        self._stamps = {'frame': index, 'capture': captured,
+                        'detect': time.time() if now is None else now}
+
+    def landmarks_ready(self, now=None):
+        """The tracker returned the faces of the frame"""
+        self._stamps['landmarks'] = time.time() if now is None else now
+
+    def published(self, now=None):
+        """
+        The result of the frame is out
+
+        Returns:
+            Dict of the frame's intervals in seconds
+        """
+        stamps = self._stamps
+        stamps['publish'] = time.time() if now is None else now
+        intervals = [stamps[end] - stamps[start] for start, end in INTERVALS.values()]
+        self._recent[self.frames % self.window] = intervals
+        self._history.append(intervals)
+        self.frames += 1
+        if self._file is not None:
+            self._csv.writerow([stamps['frame']] + [f"{stamps[stage]:.6f}" for stage in STAGES] +
+                               [f"{1000 * value:.3f}" for value in intervals] + [self.dropped])
+        return dict(zip(INTERVALS, intervals))
+
+    def percentiles(self, interval='total'):
+        """
+        Rolling percentiles of an interval in milliseconds
+
+        Returns:
+            {50: ms, 95: ms, 99: ms}, empty before the first frame
+        """
+        if not self.frames:
+            return {}
+        column = list(INTERVALS).index(interval)
+        values = self._recent[:min(self.frames, self.window), column]
+        return dict(zip(PERCENTILES, 1000 * np.percentile(values, PERCENTILES)))
+
+    def summary(self):
+        """Percentiles, mean and maximum of every interval over the session, in ms"""
+        summary = {'frames': self.frames, 'dropped': self.dropped, 'window': self.window}
+        history = 1000 * np.array(self._history).reshape(-1, len(INTERVALS))
+        for column, name in enumerate(INTERVALS):
+            values = history[:, column]
+            summary[name] = {f'p{p}': float(np.percentile(values, p)) if len(values) else None
+                             for p in PERCENTILES}
+            summary[name]['mean'] = float(values.mean()) if len(values) else None
+            summary[name]['max'] = float(values.max()) if len(values) else None
+        return summary
+
+    def close(self):
+        """Close the metrics file and write the summary next to it"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        with atomic_write(summary_path(self.path)) as f:
+            json.dump(self.summary(), f, indent=2)
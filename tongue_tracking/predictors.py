@@ -0,0 +1,96 @@
+"""
+Facial landmark predictors
+"""
+import os
+
+import numpy as np
+
+# dlib's 68-point model: landmark 48 is the left corner of the mouth
+MOUTH_LANDMARK = 48
+
+# 68-point landmark numbers of the rows predicted by the supported models,
+# by number of parts: the full iBUG layout and the mouth-only models made by
+# train_mouth_predictor.py (points 48-67)
+LANDMARK_LAYOUTS = {
+    68: tuple(range(68)),
+    20: tuple(range(48, 68)),
+}
+
+# str(shape.parts()) looks like "points[(x, y), (x, y), ...]"; stripping it
+# down to the numbers lets NumPy parse all coordinates in a single call
+_POINTS_TABLE = str.maketrans('[](),', '     ', 'points')
+
+
+def shape_to_array(shape, out=None):
+    """
+    Convert a dlib full_object_detection to an (N, 2) int32 array
+
+    Reading ``.x``/``.y`` of every point goes through pybind11 twice per
+    landmark; parsing the text form of all parts at once is about 8x faster.
+    This is not allocation-free: the text form, its translated copy and the
+    parsed values are temporary objects created for every face. Only the
+    result array is reused when ``out`` is given.
+
+    Args:
+        shape: dlib.full_object_detection
+        out: Optional (N, 2) int32 array to fill instead of allocating one
+
+    Returns:
+        Landmark array (``out`` if it was given and has the right shape)
+    """
+    n = shape.num_parts
+    if out is None or out.shape != (n, 2):
+        out = np.empty((n, 2), dtype=np.int32)
+    parts = shape.parts()
+    values = np.fromstring(str(parts).translate(_POINTS_TABLE), dtype=np.int32, sep=' ')
+    if values.size == 2 * n:
+        out.ravel()[:] = values
+    else:
+        # Unexpected text format, read the points one by one
+        for i, p in enumerate(parts):
+            out[i] = (p.x, p.y)
+    return out
+
+
+class LandmarkPredictor:
+    """
+    dlib shape predictor returning landmarks as an (N, 2) integer array
+
+    Both the 68-point model and mouth-only models (points 48-67) are
+    supported; ``landmark_ids`` holds the 68-point number of every row and
+    ``mouth_index`` the row of MOUTH_LANDMARK.
+
+    Args:
+        model_path: Path to the shape predictor model file
+    """
+
+    def __init__(self, model_path):
+        import dlib
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Shape predictor file not found: {model_path}")
+        self.model_path = model_path
+        self._predictor = dlib.shape_predictor(model_path)
+
+        # The model does not expose its number of parts, predict once to see
+        probe = self._predictor(np.zeros((16, 16), dtype=np.uint8), dlib.rectangle(0, 0, 15, 15))
+        self.num_parts = probe.num_parts
+        if self.num_parts not in LANDMARK_LAYOUTS:
+            raise ValueError(f"Unsupported shape predictor with {self.num_parts} landmarks "
+                             f"(expected one of {sorted(LANDMARK_LAYOUTS)})")
+        self.landmark_ids = LANDMARK_LAYOUTS[self.num_parts]
+        self.mouth_index = self.landmark_ids.index(MOUTH_LANDMARK)
+
+    def predict(self, gray, rect, out=None):
+        """
+        Predict the landmarks of the face in ``rect``
+
+        Args:
+            gray: Grayscale frame
+            rect: dlib.rectangle of the face
+            out: Optional landmark array to reuse, see shape_to_array()
+
+        Returns:
+            (N, 2) int32 landmark array
+        """
+        return shape_to_array(self._predictor(gray, rect), out)
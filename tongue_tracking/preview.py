@@ -0,0 +1,199 @@
+"""
+Live preview through shared memory
+
+A PreviewChannel is a block of shared memory holding the latest preview
+frame of a tracking process: a downscaled grayscale image plus the face
+boxes and landmarks scaled to it. The GUI creates the channel and passes
+its name to the script (``--preview-shm``), whose PreviewSink writes at
+most ``fps`` frames per second into it; the GUI reads the latest frame at
+its own display rate and draws the landmarks itself.
+
+Writing never waits for the reader: a sequence number is made odd while a
+frame is written and even afterwards (a seqlock), and the reader retries
+or skips a frame that changed while it was copied. Tracking therefore
+only pays for downscaling the frames that are shown.
+"""
+import time
+
+import numpy as np
+
+# Largest preview image; frames are scaled to fit, keeping their aspect ratio
+PREVIEW_SIZE = (320, 320)
+
+# Frames per second written to the channel
+PREVIEW_FPS = 15
+
+# Faces and landmarks per face the channel has room for
+MAX_FACES = 4
+MAX_POINTS = 68
+
+# Header: sequence number, frame index, faces, landmarks per face, width, height
+_HEADER = 6
+
+
+def _attach(name):
+    """Open an existing block without adopting it"""
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 the resource tracker of every process that
+        # opens a block unlinks it at exit, even if it did not create it
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except (ImportError, AttributeError, KeyError):
+            pass
+        return shm
+
+
+class PreviewChannel:
+    """
+    Latest preview frame and landmarks in shared memory
+
+    Use PreviewChannel.create() in the reading process and
+    PreviewChannel(name) in the writing one.
+
+    Args:
+        name: Name of an existing channel
+        size: (width, height) of the largest image, the same for both sides
+    """
+
+    def __init__(self, name=None, size=PREVIEW_SIZE, _create=False):
+        self.size = tuple(size)
+        width, height = self.size
+        nbytes = (8 * _HEADER + 4 * MAX_FACES * 4 + 4 * MAX_FACES * MAX_POINTS * 2
+                  + width * height)
+        if _create:
+            # Python 3.8+; imported here so the GUI still starts without it
+            from multiprocessing import shared_memory
+
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        else:
+            self._shm = _attach(name)
+        self._owner = _create
+        self.name = self._shm.name
+
+        buf = self._shm.buf
+        offset = 0
+        self._header = np.ndarray((_HEADER,), np.int64, buf, offset)
+        offset += 8 * _HEADER
+        self._boxes = np.ndarray((MAX_FACES, 4), np.float32, buf, offset)
+        offset += 4 * MAX_FACES * 4
+        self._points = np.ndarray((MAX_FACES, MAX_POINTS, 2), np.float32, buf, offset)
+        offset += 4 * MAX_FACES * MAX_POINTS * 2
+        self._pixels = np.ndarray((width * height,), np.uint8, buf, offset)
+        if _create:
+            self._header[:] = 0
+
+    @classmethod
+    def create(cls, size=PREVIEW_SIZE):
+        """Allocate a new channel (the reading side owns and unlinks it)"""
+        return cls(size=size, _create=True)
+
+    def preview_size(self, frame_size):
+        """(width, height) a frame of ``frame_size`` is scaled to"""
+        scale = min(self.size[0] / float(frame_size[0]), self.size[1] / float(frame_size[1]), 1.0)
+        return max(int(frame_size[0] * scale), 1), max(int(frame_size[1] * scale), 1)
+
+    def write(self, gray, faces, frame_index):
+        """
+        Publish a frame
+
+        Args:
+            gray: Grayscale frame
+            faces: Faces of the frame (rect and landmarks)
+            frame_index: Frame number in the source
+        """
+        import cv2
+
+        height, width = gray.shape[:2]
+        pw, ph = self.preview_size((width, height))
+        scale_x, scale_y = pw / float(width), ph / float(height)
+        header = self._header
+
+        header[0] += 1  # odd: being written
+        image = self._pixels[:pw * ph].reshape(ph, pw)
+        cv2.resize(gray, (pw, ph), dst=image, interpolation=cv2.INTER_AREA)
+        faces = faces[:MAX_FACES]
+        n_points = 0
+        for i, face in enumerate(faces):
+            rect = face.rect
+            self._boxes[i] = (rect.left() * scale_x, rect.top() * scale_y,
+                              rect.right() * scale_x, rect.bottom() * scale_y)
+            landmarks = face.landmarks[:MAX_POINTS]
+            n_points = len(landmarks)
+            self._points[i, :n_points] = landmarks * (scale_x, scale_y)
+        header[1:] = (frame_index, len(faces), n_points, pw, ph)
+        header[0] += 1  # even: complete
+
+    @property
+    def sequence(self):
+        """Number of the last complete write times two"""
+        return int(self._header[0])
+
+    def read(self, last_sequence=None, retries=3):
+        """
+        Copy the latest frame
+
+        Args:
+            last_sequence: Sequence of the frame the caller already has
+            retries: Attempts when the frame changes while it is copied
+
+        Returns:
+            None if there is no new complete frame, otherwise a dict with
+            ``sequence``, ``frame``, ``image`` ((H, W) uint8), ``boxes``
+            ((N, 4)) and ``landmarks`` ((N, P, 2)), scaled to the image
+        """
+        for _ in range(retries):
+            sequence = int(self._header[0])
+            if sequence == 0 or sequence % 2 or sequence == last_sequence:
+                return None
+            frame, n_faces, n_points, width, height = (int(v) for v in self._header[1:])
+            image = self._pixels[:width * height].reshape(height, width).copy()
+            boxes = self._boxes[:n_faces].copy()
+            landmarks = self._points[:n_faces, :n_points].copy()
+            if int(self._header[0]) == sequence:
+                return {'sequence': sequence, 'frame': frame, 'image': image,
+                        'boxes': boxes, 'landmarks': landmarks}
+        return None
+
+    def close(self):
+        """Detach from the channel; the creating side also removes it"""
+        # Views into the buffer must be gone before it can be closed
+        self._header = self._boxes = self._points = self._pixels = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class PreviewSink:
+    """
+    Sink writing decimated frames to a PreviewChannel
+
+    Args:
+        channel: PreviewChannel, or the name of one
+        fps: Frames per second written at most
+    """
+
+    def __init__(self, channel, fps=PREVIEW_FPS):
+        if isinstance(channel, str):
+            channel = PreviewChannel(channel)
+        self.channel = channel
+        self.interval = 1.0 / fps if fps else 0.0
+        self.written = 0
+        self._last = None
+
+    def write(self, result):
+        now = time.monotonic()
+        if self._last is None or now - self._last >= self.interval:
+            self._last = now
+            self.channel.write(result.frame.gray, result.faces, result.frame.index)
+            self.written += 1
+        return True
+
+    def close(self):
+        self.channel.close()
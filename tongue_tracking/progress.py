@@ -0,0 +1,118 @@
+"""
+Machine-readable progress events
+
+With ``--progress-events`` the tracking scripts print one JSON event per
+line, prefixed with EVENT_PREFIX so they can be told apart from the regular
+messages:
+
+    @event {"event": "start", "video": "clip.avi", "total_frames": 9000}
+    @event {"event": "progress", "frames": 1200, "total_frames": 9000,
+            "detections": 1187, "fps": 41.3, "eta": 188.9}
+    @event {"event": "finish", "frames": 9000, "detections": 8890, ...}
+
+Progress events are throttled (at most one every ``interval`` seconds), so
+a reader never has to keep up with the frame rate. parse_event() turns a
+line back into a dict.
+"""
+import json
+import sys
+import time
+
+EVENT_PREFIX = '@event '
+
+# Seconds between progress events
+DEFAULT_INTERVAL = 0.5
+
+
+def format_event(event, **fields):
+    """One event line (without the newline)"""
+    return EVENT_PREFIX + json.dumps(dict(event=event, **fields))
+
+
+def parse_event(line):
+    """
+    Parse an event line
+
+    Returns:
+        The event dict, or None if the line is a regular message
+    """
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        event = json.loads(line[len(EVENT_PREFIX):])
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) and 'event' in event else None
+
+
+class ProgressReporter:
+    """
+    Print progress events; usable as the ``progress`` callback of
+    TongueTracker.run()
+
+    The frame rate counts frames read from the source between the first
+    and the last report (skipped frames included, as they advance through
+    the video), so resumed runs report the rate of this session only.
+
+    Args:
+        stream: Text stream the events are written to
+        interval: Minimum seconds between progress events
+    """
+
+    def __init__(self, stream=None, interval=DEFAULT_INTERVAL):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.frames = 0
+        self.total_frames = 0
+        self.detections = 0
+        self._start = None
+        self._first_frame = 0
+        self._last_frame = None
+        self._last_emit = None
+
+    def emit(self, event, **fields):
+        self.stream.write(format_event(event, **fields) + '\n')
+        self.stream.flush()
+
+    def start(self, **info):
+        """Announce a run (e.g. video and total_frames)"""
+        self.emit('start', **info)
+
+    @property
+    def fps(self):
+        elapsed = self._last_frame - self._start if self._start is not None else 0
+        return (self.frames - self._first_frame) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left, None if the total or the rate is not known"""
+        fps = self.fps
+        if not self.total_frames or not fps:
+            return None
+        return max(self.total_frames - self.frames, 0) / fps
+
+    def __call__(self, frames, total_frames, detections):
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+            self._first_frame = frames
+            self._last_emit = now
+        self._last_frame = now
+        self.frames = frames
+        self.total_frames = total_frames
+        self.detections = detections
+        if now - self._last_emit >= self.interval:
+            self._last_emit = now
+            self.progress()
+
+    def progress(self):
+        """Emit the current progress right away"""
+        eta = self.eta
+        self.emit('progress', frames=self.frames, total_frames=self.total_frames,
+                  detections=self.detections, fps=round(self.fps, 2),
+                  eta=round(eta, 1) if eta is not None else None)
+
+    def finish(self, **summary):
+        """Final progress and the end of the run"""
+        self.progress()
+        self.emit('finish', **summary)
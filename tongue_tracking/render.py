@@ -0,0 +1,271 @@
+"""
+Annotated videos rendered from stored landmarks
+
+Instead of drawing and encoding every frame while tracking
+(``--output-video``), a run can keep its landmarks
+(``--export-landmarks``) and render_video() draws them afterwards, only for
+the frame ranges that are reviewed. Drawing is vectorized: the landmark
+dots of all faces of a frame are one NumPy assignment rather than a
+``cv2.circle`` call per point. Encoding runs on a separate thread, so
+decoding and drawing the next frames overlaps with it.
+"""
+import json
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Colors of the live annotation (sinks.annotate), BGR
+BOX_COLOR = (0, 255, 0)
+POINT_COLOR = (0, 0, 255)
+
+# Frames decoded ahead of the encoder
+QUEUE_SIZE = 8
+
+
+class Annotations:
+    """
+    Landmarks and face boxes written by TrackingResult.export_landmarks()
+
+    Attributes:
+        frames: Frame number of every face (ascending)
+        face_ids: Face id of every face (0 if faces were not tracked)
+        boxes: (N, 4) left, top, right, bottom
+        landmarks: (N, P, 2) landmarks
+        meta: Run metadata (video_file, skip_frames, frame_size, ...)
+    """
+
+    def __init__(self, frames, face_ids, boxes, landmarks, meta):
+        self.frames = frames
+        self.face_ids = face_ids
+        self.boxes = boxes
+        self.landmarks = landmarks
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an ``.npz`` file written by export_landmarks()
+
+        Raises:
+            ValueError: If the file is not a landmarks export
+        """
+        try:
+            with np.load(path) as data:
+                return cls(data['frames'], data['face_ids'], data['boxes'],
+                           data['landmarks'], json.loads(str(data['meta'])))
+        except (KeyError, ValueError, OSError) as e:
+            raise ValueError(f"Not a landmarks file: {path} ({e})")
+
+    @property
+    def skip_frames(self):
+        return max(int(self.meta.get('skip_frames') or 1), 1)
+
+    @property
+    def frame_size(self):
+        return tuple(self.meta['frame_size'])
+
+    def faces(self, frame):
+        """
+        Rows of the faces shown in a frame
+
+        Frames that were skipped while tracking show the faces of the last
+        processed frame before them.
+
+        Returns:
+            slice into frames, face_ids, boxes and landmarks
+        """
+        processed = frame - frame % self.skip_frames
+        start = np.searchsorted(self.frames, processed, 'left')
+        stop = np.searchsorted(self.frames, processed, 'right')
+        return slice(start, stop)
+
+
+def parse_ranges(text, total_frames):
+    """
+    Parse frame ranges such as ``"100-400,900-1200,5000-"``
+
+    Frame numbers are 1-based and inclusive; an open end runs to the last
+    frame, an empty string selects the whole video.
+
+    Returns:
+        Sorted list of (first, last) tuples, overlapping ranges merged
+
+    Raises:
+        ValueError: If a range is malformed or outside the video
+    """
+    if not text or not text.strip():
+        return [(1, total_frames)]
+    ranges = []
+    for part in text.split(','):
+        first, sep, last = part.strip().partition('-')
+        try:
+            first = int(first)
+            last = int(last) if last.strip() else total_frames
+            if not sep:
+                last = first
+        except ValueError:
+            raise ValueError(f"Invalid frame range: {part.strip()!r}")
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid frame range: {part.strip()!r}")
+        if total_frames and first > total_frames:
+            raise ValueError(f"Frame range {part.strip()!r} starts after the last frame "
+                             f"({total_frames})")
+        ranges.append((first, min(last, total_frames) if total_frames else last))
+
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def disc_offsets(radius):
+    """(dy, dx) offsets of the pixels of a filled disc"""
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    inside = dy * dy + dx * dx <= radius * radius
+    return dy[inside], dx[inside]
+
+
+def draw_annotations(image, boxes, landmarks, labels, radius=2, offsets=None):
+    """
+    Draw face boxes, labels and landmarks
+
+    Args:
+        image: BGR image, drawn on in place
+        boxes: (N, 4) left, top, right, bottom in image pixels
+        landmarks: (N, P, 2) landmarks in image pixels
+        labels: Text shown above every box
+        radius: Radius of the landmark dots
+        offsets: disc_offsets(radius), to reuse them between frames
+    """
+    if not len(boxes):
+        return image
+    boxes = np.rint(boxes).astype(np.int32)
+    corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+    cv2.polylines(image, list(corners), True, BOX_COLOR, 2)
+    for (x, y, _, _), label in zip(boxes, labels):
+        cv2.putText(image, label, (int(x) - 10, int(y) - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, BOX_COLOR, 2)
+
+    # All dots at once: every landmark plus every offset of the disc
+    dy, dx = offsets if offsets is not None else disc_offsets(radius)
+    points = np.rint(landmarks.reshape(-1, 2)).astype(np.intp)
+    xs = (points[:, :1] + dx).ravel()
+    ys = (points[:, 1:] + dy).ravel()
+    height, width = image.shape[:2]
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    image[ys[inside], xs[inside]] = POINT_COLOR
+    return image
+
+
+class _Encoder(threading.Thread):
+    """Writes queued frames to a cv2.VideoWriter"""
+
+    def __init__(self, writer, size):
+        super().__init__(daemon=True)
+        self.writer = writer
+        self.queue = queue.Queue(size)
+        self.error = None
+
+    def run(self):
+        while True:
+            image = self.queue.get()
+            if image is None:
+                return
+            try:
+                self.writer.write(image)
+            except cv2.error as e:
+                self.error = e
+
+
+def render_video(annotations, video, output, ranges=None, width=None, codec='XVID',
+                 radius=None, frame_numbers=True, queue_size=QUEUE_SIZE):
+    """
+    Render an annotated video from stored landmarks
+
+    Args:
+        annotations: Annotations
+        video: The tracked video
+        output: Output video path
+        ranges: (first, last) frame ranges, see parse_ranges() (default: all)
+        width: Output width (default: the width of the video)
+        codec: FourCC code of the output
+        radius: Landmark dot radius (default: scaled with the output width)
+        frame_numbers: Show the frame number in the corner
+        queue_size: Frames decoded ahead of the encoder
+
+    Returns:
+        Dict with ``frames`` written and ``seconds`` taken
+
+    Raises:
+        IOError: If the video cannot be read or the output not written
+    """
+    from .sources import VideoFileSource, scaled_size
+
+    started = time.monotonic()
+    source = VideoFileSource(video, color=True)
+    try:
+        size = scaled_size(source.source_size, width) if width else source.source_size
+        if ranges is None:
+            ranges = parse_ranges('', source.total_frames)
+        writer = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*codec), source.fps or 30.0, size)
+        if not writer.isOpened():
+            raise IOError(f"Could not write video file: {output}")
+
+        # Stored coordinates are in processing pixels
+        scale = size[0] / float(annotations.frame_size[0])
+        if radius is None:
+            radius = max(int(round(2 * scale)), 1)
+        offsets = disc_offsets(radius)
+
+        # Frames are decoded into a ring of buffers: the encoder still owns
+        # those in the queue and the one it is writing
+        buffers = [None] * (queue_size + 2)
+        captured = None
+        encoder = _Encoder(writer, queue_size)
+        encoder.start()
+        written = 0
+        try:
+            for first, last in ranges:
+                if first - 1 != source.frames_read:
+                    source.seek(first - 1)
+                for frame in range(first, last + 1):
+                    slot = written % len(buffers)
+                    if width:
+                        ret, captured = source.cap.read(captured)
+                        if ret:
+                            image = cv2.resize(captured, size, dst=buffers[slot],
+                                               interpolation=cv2.INTER_AREA)
+                    else:
+                        ret, image = source.cap.read(buffers[slot])
+                    if not ret:
+                        break
+                    source.frames_read += 1
+                    buffers[slot] = image
+
+                    rows = annotations.faces(frame)
+                    ids = annotations.face_ids[rows]
+                    labels = [f"Face #{face_id if face_id else i + 1}"
+                              for i, face_id in enumerate(ids)]
+                    draw_annotations(image, annotations.boxes[rows] * scale,
+                                     annotations.landmarks[rows] * scale, labels,
+                                     offsets=offsets)
+                    if frame_numbers:
+                        cv2.putText(image, f"Frame {frame}", (10, 20),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                    encoder.queue.put(image)
+                    written += 1
+        finally:
+            encoder.queue.put(None)
+            encoder.join()
+            writer.release()
+        if encoder.error is not None:
+            raise IOError(f"Could not write video file: {output} ({encoder.error})")
+    finally:
+        source.release()
+    return {'frames': written, 'seconds': time.monotonic() - started}
@@ -0,0 +1,290 @@
+"""
+Tracking results
+
+FrameResult holds what the tracker found in a single frame, TrackingResult
+collects the mouth coordinates of a whole run and exports them.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+
+from .predictors import MOUTH_LANDMARK
+from .utils import atomic_write
+
+
+class Face:
+    """
+    A detected face: its rectangle and the predicted landmarks
+
+    Args:
+        rect: Face rectangle
+        landmarks: (N, 2) landmark array
+        mouth_index: Row of the tracked mouth landmark in ``landmarks``
+            (differs from MOUTH_LANDMARK for mouth-only models)
+        face_id: Identity of the face across frames, if tracked
+    """
+
+    __slots__ = ('rect', 'landmarks', 'mouth_index', 'face_id')
+
+    def __init__(self, rect, landmarks, mouth_index=MOUTH_LANDMARK, face_id=None):
+        self.rect = rect
+        self.landmarks = landmarks
+        self.mouth_index = mouth_index
+        self.face_id = face_id
+
+    @property
+    def mouth(self):
+        """(x, y) of the tracked mouth landmark"""
+        return self.landmarks[self.mouth_index]
+
+
+class FrameResult:
+    """
+    Faces found in one frame
+
+    ``carried`` is set when the motion gate found the frame static and the
+    faces of the last processed frame were reused.
+    """
+
+    __slots__ = ('frame', 'faces', 'annotated', 'carried')
+
+    def __init__(self, frame, faces, carried=False):
+        self.frame = frame
+        self.faces = faces
+        self.annotated = False
+        self.carried = carried
+
+
+class TrackingResult:
+    """Mouth coordinates collected from one video"""
+
+    def __init__(self, video_file, skip_frames, total_frames, source_size, frame_size,
+                 detector=None, identities=False, motion_gate=None, keep_landmarks=False):
+        self.video_file = video_file
+        self.skip_frames = skip_frames
+        self.total_frames = total_frames
+        self.source_size = source_size
+        self.frame_size = frame_size
+        self.detector = detector
+        # Face ids are exported when the tracker assigned them
+        self.identities = identities
+        self.subject = None
+        # Threshold of the motion gate, carried-forward flags are exported
+        # when it is set
+        self.motion_gate = motion_gate
+        self.frames_tracked = 0
+        self.frames_gated = 0
+        self.frames_processed = 0
+        self.calibration = None
+
+        # Preallocate arrays for better performance (avoid repeated
+        # list.append()), they grow if there are more detections than
+        # expected and are trimmed to the actual count by finish()
+        capacity = max(total_frames // max(skip_frames, 1), 1)
+        self.frames = np.zeros(capacity, dtype=np.int32)
+        self.mouth_x = np.zeros(capacity, dtype=np.float32)
+        self.mouth_y = np.zeros(capacity, dtype=np.float32)
+        self.face_ids = np.zeros(capacity, dtype=np.int32)
+        self.carried = np.zeros(capacity, dtype=bool)
+        # All landmarks and face boxes, for rendering annotated videos
+        # later (see export_landmarks()); the landmark array is allocated
+        # on the first face, when the number of points is known
+        self.keep_landmarks = keep_landmarks
+        self.boxes = np.zeros((capacity, 4), dtype=np.int32) if keep_landmarks else None
+        self.landmarks = None
+        self._count = 0
+
+    def add(self, result):
+        """Append the mouth coordinates of every face in a FrameResult"""
+        self.frames_tracked += 1
+        if result.carried:
+            self.frames_gated += 1
+        for face in result.faces:
+            if self._count == len(self.frames):
+                capacity = 2 * len(self.frames)
+                self.frames = np.resize(self.frames, capacity)
+                self.mouth_x = np.resize(self.mouth_x, capacity)
+                self.mouth_y = np.resize(self.mouth_y, capacity)
+                self.face_ids = np.resize(self.face_ids, capacity)
+                self.carried = np.resize(self.carried, capacity)
+                if self.keep_landmarks:
+                    self.boxes = np.resize(self.boxes, (capacity, 4))
+                    if self.landmarks is not None:
+                        self.landmarks = np.resize(self.landmarks,
+                                                   (capacity,) + self.landmarks.shape[1:])
+            if self.keep_landmarks:
+                if self.landmarks is None:
+                    self.landmarks = np.zeros((len(self.boxes),) + face.landmarks.shape,
+                                              dtype=np.float32)
+                rect = face.rect
+                self.boxes[self._count] = (rect.left(), rect.top(), rect.right(), rect.bottom())
+                self.landmarks[self._count] = face.landmarks
+            self.mouth_x[self._count], self.mouth_y[self._count] = face.mouth
+            self.frames[self._count] = result.frame.index
+            self.face_ids[self._count] = face.face_id or 0
+            self.carried[self._count] = result.carried
+            self._count += 1
+
+    def finish(self, frames_processed):
+        """Trim the arrays to the actual number of detections"""
+        self.frames_processed = frames_processed
+        self.frames = self.frames[:self._count]
+        self.mouth_x = self.mouth_x[:self._count]
+        self.mouth_y = self.mouth_y[:self._count]
+        self.face_ids = self.face_ids[:self._count]
+        self.carried = self.carried[:self._count]
+        if self.keep_landmarks:
+            self.boxes = self.boxes[:self._count]
+            if self.landmarks is not None:
+                self.landmarks = self.landmarks[:self._count]
+
+    def get_state(self):
+        """Counters and the coordinates collected so far"""
+        n = self._count
+        state = {
+            'frames_tracked': self.frames_tracked,
+            'frames_gated': self.frames_gated,
+            'frames': self.frames[:n].copy(),
+            'mouth_x': self.mouth_x[:n].copy(),
+            'mouth_y': self.mouth_y[:n].copy(),
+            'face_ids': self.face_ids[:n].copy(),
+            'carried': self.carried[:n].copy(),
+        }
+        if self.keep_landmarks:
+            state['boxes'] = self.boxes[:n].copy()
+            if self.landmarks is not None:
+                state['landmarks'] = self.landmarks[:n].copy()
+        return state
+
+    def set_state(self, state):
+        """Continue collecting after the coordinates saved by get_state()"""
+        self.frames_tracked = int(state['frames_tracked'])
+        self.frames_gated = int(state['frames_gated'])
+        n = len(state['frames'])
+        capacity = max(len(self.frames), 2 * n, 1)
+        for name in ('frames', 'mouth_x', 'mouth_y', 'face_ids', 'carried'):
+            values = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            values[:n] = state[name]
+            setattr(self, name, values)
+        if self.keep_landmarks:
+            self.boxes = np.zeros((capacity, 4), dtype=np.int32)
+            self.boxes[:n] = state['boxes']
+            self.landmarks = None
+            if 'landmarks' in state:
+                landmarks = state['landmarks']
+                self.landmarks = np.zeros((capacity,) + landmarks.shape[1:], dtype=np.float32)
+                self.landmarks[:n] = landmarks
+        self._count = n
+
+    @property
+    def detections(self):
+        return self._count
+
+    @property
+    def undistorted(self):
+        return self.calibration is not None
+
+    def undistort(self, calibration, use_lut=False):
+        """
+        Undistort the mouth coordinates in one batched call
+
+        Args:
+            calibration: Folder written by calib-camera.py
+            use_lut: Use the cached per-pixel lookup table
+        """
+        from .calibration import load_calibration, PointUndistorter
+
+        mtx, dist = load_calibration(calibration)
+        if self.detections:
+            undistorter = PointUndistorter(
+                mtx, dist, self.source_size, self.frame_size, use_lut=use_lut,
+                cache_dir=os.path.join(calibration, ".undistort_cache"))
+            points = undistorter.undistort(np.column_stack((self.mouth_x, self.mouth_y)))
+            self.mouth_x = np.ascontiguousarray(points[:, 0])
+            self.mouth_y = np.ascontiguousarray(points[:, 1])
+        self.calibration = calibration
+
+    def smooth(self, **options):
+        """
+        Kalman-smooth the mouth trajectory of every face
+
+        Args:
+            **options: process_noise, measurement_noise and dense, see
+                SmoothedTrajectory.from_result()
+
+        Returns:
+            SmoothedTrajectory
+        """
+        from .kalman import SmoothedTrajectory
+
+        return SmoothedTrajectory.from_result(self, **options)
+
+    def summary(self):
+        """Metadata of the run (the JSON export without coordinates)"""
+        return {
+            'video_file': self.video_file,
+            'total_frames': self.total_frames,
+            'frames_processed': self.frames_processed,
+            'detections': self.detections,
+            'skip_frames': self.skip_frames,
+            'detector': self.detector,
+            'subject': self.subject,
+            'motion_gate': self.motion_gate,
+            'gated_fraction': (self.frames_gated / float(self.frames_tracked)
+                               if self.motion_gate is not None and self.frames_tracked else None),
+            'undistorted': self.undistorted,
+            'calibration': self.calibration,
+        }
+
+    def export_csv(self, path):
+        """Write frame, (face_id,) mouth_x, mouth_y (, carried) rows to a CSV file"""
+        columns = [('frame', self.frames)]
+        if self.identities:
+            columns.append(('face_id', self.face_ids))
+        columns += [('mouth_x', self.mouth_x), ('mouth_y', self.mouth_y)]
+        if self.motion_gate is not None:
+            columns.append(('carried', self.carried.astype(np.uint8)))
+
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow([name for name, _ in columns])
+            for i in range(self.detections):
+                writer.writerow([values[i] for _, values in columns])
+
+    def export_json(self, path):
+        """Write the run metadata and coordinates to a JSON file"""
+        data = self.summary()
+        data['coordinates'] = []
+        for i in range(self.detections):
+            entry = {'frame': int(self.frames[i])}
+            if self.identities:
+                entry['face_id'] = int(self.face_ids[i])
+            entry['mouth_x'] = float(self.mouth_x[i])
+            entry['mouth_y'] = float(self.mouth_y[i])
+            if self.motion_gate is not None:
+                entry['carried'] = bool(self.carried[i])
+            data['coordinates'].append(entry)
+        with open(path, 'w') as jsonfile:
+            json.dump(data, jsonfile, indent=2)
+
+    def export_landmarks(self, path):
+        """
+        Write all landmarks and face boxes to a ``.npz`` file
+
+        Only available if the result was created with ``keep_landmarks``.
+        The coordinates are in pixels of the processing frame size (never
+        undistorted), as render_annotations.py draws them on the video.
+        """
+        if not self.keep_landmarks:
+            raise ValueError("Landmarks were not kept, run with keep_landmarks=True")
+        landmarks = self.landmarks
+        if landmarks is None:
+            landmarks = np.zeros((0, 0, 2), dtype=np.float32)
+        meta = self.summary()
+        meta.update(source_size=list(self.source_size), frame_size=list(self.frame_size))
+        with atomic_write(path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), frames=self.frames,
+                     face_ids=self.face_ids, carried=self.carried, boxes=self.boxes,
+                     landmarks=landmarks)
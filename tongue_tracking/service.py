@@ -0,0 +1,343 @@
+"""
+Long-lived tracking worker service
+
+Loads the face detector and the shape predictor once and processes
+tracking jobs from a queue, so short clips do not pay for interpreter
+startup, imports and model deserialization every time. Jobs are
+submitted over a small JSON/HTTP API on localhost:
+
+    POST /jobs          submit a job, returns {"id": ...}
+    GET  /jobs          list the queued, running and recently finished jobs
+    GET  /jobs/<id>     job state, progress and result
+    GET  /health        liveness check
+
+Only the last finished jobs are kept (see MAX_FINISHED_JOBS), so a
+long-lived service does not accumulate every clip it ever processed.
+
+Start the service with:
+
+    python -m tongue_tracking.service --shape-predictor model.dat --port 8765
+
+and use TrackingClient to talk to it.
+"""
+import argparse
+import itertools
+import json
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Finished (done or failed) jobs kept for status requests; older ones are evicted
+MAX_FINISHED_JOBS = 1000
+
+# Options accepted in a job submission, with their defaults
+JOB_OPTIONS = {
+    'video': None,
+    'skip_frames': 1,
+    'export_csv': None,
+    'export_json': None,
+    'calibration': None,
+    'undistort_lut': False,
+}
+
+
+def make_tracking_runner(shape_predictor):
+    """
+    Load the models once and return a function that processes one job
+
+    Args:
+        shape_predictor: Path to the shape predictor model file
+
+    Returns:
+        Callable(options, progress) returning the result summary dict
+    """
+    from .sources import VideoFileSource
+    from .tracker import TongueTracker
+
+    tracker = TongueTracker.from_model(shape_predictor)
+
+    def run(options, progress):
+        with VideoFileSource(options['video'], skip_frames=options['skip_frames'],
+                             color=False) as source:
+            result = tracker.run(source, progress=progress)
+        if options['calibration']:
+            result.undistort(options['calibration'], use_lut=options['undistort_lut'])
+        if options['export_csv']:
+            result.export_csv(options['export_csv'])
+        if options['export_json']:
+            result.export_json(options['export_json'])
+        return result.summary()
+
+    return run
+
+
+class TrackingService:
+    """
+    Job queue processed by a single worker thread
+
+    Args:
+        runner: Callable(options, progress) that processes one job, see
+            make_tracking_runner()
+        max_finished: Finished jobs kept; the oldest are evicted beyond that
+    """
+
+    def __init__(self, runner, max_finished=MAX_FINISHED_JOBS):
+        self.runner = runner
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def submit(self, **options):
+        """
+        Queue a job
+
+        Returns:
+            Job id
+        """
+        unknown = set(options) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+        if not options.get('video'):
+            raise ValueError("A job needs a 'video'")
+        merged = dict(JOB_OPTIONS, **options)
+        merged['skip_frames'] = int(merged['skip_frames'])
+        if merged['skip_frames'] < 1:
+            raise ValueError("'skip_frames' must be at least 1")
+
+        with self._lock:
+            job_id = str(next(self._ids))
+            self.jobs[job_id] = {
+                'id': job_id,
+                'state': QUEUED,
+                'options': merged,
+                'submitted': time.time(),
+                'frames_done': 0,
+                'total_frames': 0,
+                'detections': 0,
+                'result': None,
+                'error': None,
+            }
+        self._queue.put(job_id)
+        return job_id
+
+    def status(self, job_id):
+        """Snapshot of a job, or None if the id is unknown"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        """Snapshots of all jobs in submission order"""
+        with self._lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields)
+
+    def _evict_finished(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self.jobs.items()
+                        if job['state'] in (DONE, FAILED)]
+            # Jobs finish in submission order, the first ones are the oldest
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            options = self.status(job_id)['options']
+            self._update(job_id, state=RUNNING, started=time.time())
+
+            def progress(frames_done, total_frames, detections, job_id=job_id):
+                self._update(job_id, frames_done=frames_done,
+                             total_frames=total_frames, detections=detections)
+
+            try:
+                result = self.runner(options, progress)
+            except Exception as e:
+                self._update(job_id, state=FAILED, finished=time.time(),
+                             error=f"{type(e).__name__}: {e}")
+            else:
+                self._update(job_id, state=DONE, finished=time.time(), result=result)
+            finally:
+                self._evict_finished()
+                self._queue.task_done()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = self.path.strip('/').split('/')
+            if parts == ['health']:
+                self._reply(200, {'status': 'ok'})
+            elif parts == ['jobs']:
+                self._reply(200, service.list_jobs())
+            elif len(parts) == 2 and parts[0] == 'jobs':
+                job = service.status(parts[1])
+                if job is None:
+                    self._reply(404, {'error': f"Unknown job: {parts[1]}"})
+                else:
+                    self._reply(200, job)
+            else:
+                self._reply(404, {'error': f"Not found: {self.path}"})
+
+        def do_POST(self):
+            if self.path.strip('/') != 'jobs':
+                self._reply(404, {'error': f"Not found: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                options = json.loads(self.rfile.read(length) or b'{}')
+                job_id = service.submit(**options)
+            except (ValueError, TypeError) as e:
+                self._reply(400, {'error': str(e)})
+                return
+            self._reply(201, {'id': job_id})
+
+        def log_message(self, format, *args):
+            # Keep the console for job messages
+            pass
+
+    return Handler
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Create the HTTP server for a service (call serve_forever() on it)
+
+    Returns:
+        HTTPServer instance; ``server_address`` holds the bound port
+    """
+    return _ThreadingHTTPServer((host, port), _make_handler(service))
+
+
+class TrackingClient:
+    """
+    Client for a running tracking service
+
+    Args:
+        url: Base URL of the service (default: http://127.0.0.1:8765)
+    """
+
+    def __init__(self, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=10):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            message = json.loads(e.read() or b'{}').get('error', str(e))
+            raise RuntimeError(f"Tracking service error: {message}") from None
+
+    def health(self):
+        """True if the service answers"""
+        try:
+            return self._request('GET', '/health').get('status') == 'ok'
+        except (OSError, RuntimeError):
+            return False
+
+    def submit(self, video, **options):
+        """
+        Submit a job (options as in JOB_OPTIONS)
+
+        Returns:
+            Job id
+        """
+        return self._request('POST', '/jobs', dict(options, video=video))['id']
+
+    def status(self, job_id):
+        """Current state, progress and result of a job"""
+        return self._request('GET', f"/jobs/{job_id}")
+
+    def wait(self, job_id, poll_interval=0.2, on_progress=None):
+        """
+        Block until a job has finished
+
+        Args:
+            job_id: Id returned by submit()
+            poll_interval: Seconds between status requests
+            on_progress: Optional callback(status) called on every poll
+
+        Returns:
+            Final job status
+        """
+        while True:
+            job = self.status(job_id)
+            if on_progress:
+                on_progress(job)
+            if job['state'] in (DONE, FAILED):
+                return job
+            time.sleep(poll_interval)
+
+    def run(self, video, **options):
+        """Submit a job and wait for it to finish"""
+        return self.wait(self.submit(video, **options))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Tracking worker service")
+    ap.add_argument("-p", "--shape-predictor", required=True,
+        help="path to facial landmark predictor")
+    ap.add_argument("--host", default=DEFAULT_HOST,
+        help=f"address to listen on (default: {DEFAULT_HOST})")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT,
+        help=f"port to listen on (default: {DEFAULT_PORT})")
+    ap.add_argument("--keep-jobs", type=int, default=MAX_FINISHED_JOBS,
+        help=f"finished jobs kept for status requests (default: {MAX_FINISHED_JOBS})")
+    args = ap.parse_args()
+
+    print("Loading facial landmark predictor...")
+    try:
+        runner = make_tracking_runner(args.shape_predictor)
+    except Exception as e:
+        print(f"Error initializing face detector or predictor: {e}")
+        return 1
+
+    server = serve(TrackingService(runner, max(0, args.keep_jobs)), args.host, args.port)
+    print(f"Tracking service listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Result sinks
+
+A sink receives every FrameResult of a run through ``write()``; returning
+False from ``write()`` stops the run. ``close()`` is called at the end.
+"""
+import cv2
+
+
+def annotate(result, radius=3):
+    """
+    Draw face boxes, face numbers and landmarks onto the frame image
+
+    Drawing happens at most once per frame, so several sinks can share
+    the annotated image.
+    """
+    if result.annotated or result.frame.image is None:
+        return result.frame.image
+    image = result.frame.image
+    for (i, face) in enumerate(result.faces):
+        # convert dlib's rectangle to an OpenCV-style bounding box
+        rect = face.rect
+        x, y = rect.left(), rect.top()
+        w, h = rect.right() - x, rect.bottom() - y
+        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)
+
+        # show the face number (its identity if faces are tracked)
+        number = face.face_id if face.face_id is not None else i + 1
+        cv2.putText(image, f"Face #{number}", (x - 10, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+        # draw the facial landmarks
+        for (lx, ly) in face.landmarks:
+            cv2.circle(image, (int(lx), int(ly)), radius, (0, 0, 255), -1)
+    result.annotated = True
+    return image
+
+
+class AnnotatedVideoSink:
+    """
+    Write annotated frames to a video file
+
+    Args:
+        path: Output video path
+        fps: Frame rate of the output video
+        frame_size: (width, height) of the frames
+        codec: FourCC code of the video codec
+    """
+
+    def __init__(self, path, fps, frame_size, codec='XVID'):
+        self.path = path
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec),
+                                       fps, frame_size)
+
+    def write(self, result):
+        self._writer.write(annotate(result))
+        return True
+
+    def close(self):
+        self._writer.release()
+
+
+class DisplaySink:
+    """
+    Show annotated frames in a window, pressing 'q' stops the run
+
+    Args:
+        window_name: Title of the OpenCV window
+    """
+
+    def __init__(self, window_name='image'):
+        self.window_name = window_name
+        self.interrupted = False
+
+    def write(self, result):
+        cv2.imshow(self.window_name, annotate(result))
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            self.interrupted = True
+            return False
+        return True
+
+    def close(self):
+        cv2.destroyAllWindows()
@@ -0,0 +1,612 @@
+"""
+Frame sources
+
+A source is an iterable of Frame objects holding the frame resized to the
+processing width and its grayscale version, which is what the detector
+and the predictor work on.
+
+Sources decode, resize and convert into buffers that are allocated once and
+reused, so the arrays of a Frame are only valid until the next frame is
+read. Copy them to keep them longer.
+"""
+import glob
+import itertools
+import os
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Frames are resized to this width before detection
+FRAME_WIDTH = 500
+
+# Oldest plausible frame timestamp of a camera backend, in seconds; older
+# values are stream positions rather than capture times
+MAX_FRAME_AGE = 1.0
+
+# Files of an image sequence given as a directory
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.pgm', '.ppm')
+
+# Reduction factor -> (gray, color) imread flags; JPEG decodes straight to
+# the reduced size, other formats are decoded fully and then reduced
+_IMREAD_REDUCED = {
+    1: (cv2.IMREAD_GRAYSCALE, cv2.IMREAD_COLOR),
+    2: (cv2.IMREAD_REDUCED_GRAYSCALE_2, cv2.IMREAD_REDUCED_COLOR_2),
+    4: (cv2.IMREAD_REDUCED_GRAYSCALE_4, cv2.IMREAD_REDUCED_COLOR_4),
+    8: (cv2.IMREAD_REDUCED_GRAYSCALE_8, cv2.IMREAD_REDUCED_COLOR_8),
+}
+
+
+class Frame:
+    """
+    A single frame ready for processing
+
+    Attributes:
+        index: 1-based frame number in the source
+        timestamp: Seconds since the start of the source
+        image: Resized BGR frame, or None if the source only decodes gray
+        gray: Resized grayscale frame
+    """
+
+    __slots__ = ('index', 'timestamp', 'image', 'gray')
+
+    def __init__(self, index, timestamp, image, gray):
+        self.index = index
+        self.timestamp = timestamp
+        self.image = image
+        self.gray = gray
+
+
+def scaled_size(size, width):
+    """Frame size after resizing a (width, height) frame to ``width``"""
+    return (width, int(size[1] * width / float(size[0] or 1)))
+
+
+class _CaptureSource:
+    """Common parts of the sources reading from a cv2.VideoCapture"""
+
+    def __init__(self, cap, width, color):
+        self.cap = cap
+        self.width = width
+        self.color = color
+        self.frames_read = 0
+        self.source_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.frame_size = scaled_size(self.source_size, width)
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        # Buffers reused for every frame (allocated on the first one, as
+        # cameras may not report their real frame size up front)
+        self._captured = None
+        self._resized = None
+        self._gray = None
+
+    def _read(self):
+        """Decode the next frame into the capture buffer, None at the end"""
+        ret, image = self.cap.read(self._captured)
+        if not ret:
+            return None
+        self._captured = image
+        return image
+
+    def _prepare(self, image, timestamp):
+        size = scaled_size((image.shape[1], image.shape[0]), self.width)
+        if self._gray is None or self._gray.shape != (size[1], size[0]):
+            self._resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self._gray = np.empty((size[1], size[0]), dtype=np.uint8)
+        cv2.resize(image, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return Frame(self.frames_read, timestamp, self._resized if self.color else None,
+                     self._gray)
+
+    def release(self):
+        """Release the underlying capture"""
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class VideoFileSource(_CaptureSource):
+    """
+    Frames of a video file
+
+    Args:
+        path: Path to the video file
+        width: Processing width
+        skip_frames: Only yield every Nth frame
+        color: Keep the resized BGR frame (needed for annotation)
+    """
+
+    def __init__(self, path, width=FRAME_WIDTH, skip_frames=1, color=True):
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video file: {path}")
+        super().__init__(cap, width, color)
+        self.path = path
+        self.skip_frames = skip_frames
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def seek(self, frame):
+        """
+        Continue after the first ``frame`` frames (e.g. when resuming a run)
+
+        Frame numbers and timestamps continue from there, as if the frames
+        before had been read.
+        """
+        if frame and not (self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+                          and int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame):
+            # Backend cannot seek, skip frame by frame
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            for _ in range(frame):
+                if not self.cap.grab():
+                    raise IOError(f"Could not seek to frame {frame} of {self.path}")
+        self.frames_read = frame
+
+    def __iter__(self):
+        skip_counter = 0
+        while True:
+            skip_counter += 1
+            if skip_counter < self.skip_frames:
+                # grab() skips the conversion of frames that are not used
+                if not self.cap.grab():
+                    return
+                self.frames_read += 1
+                continue
+            skip_counter = 0
+
+            image = self._read()
+            if image is None:
+                return
+            self.frames_read += 1
+            timestamp = (self.frames_read - 1) / self.fps if self.fps else 0.0
+            yield self._prepare(image, timestamp)
+
+
+class CameraSource(_CaptureSource):
+    """
+    Live frames from a camera
+
+    ``capture_time`` is the wall-clock time the last frame was captured,
+    and frame timestamps count from ``start_time`` to it. It is the
+    backend's buffer timestamp (``CAP_PROP_POS_MSEC``, e.g. V4L2 on the
+    monotonic clock) when that is a recent time. Otherwise it is the time
+    ``grab()`` returned, before the frame is decoded. Time spent in the
+    driver's buffer is only included in the first case.
+
+    Args:
+        index: Camera device index
+        width: Processing width (also requested from the camera)
+        fps: Requested camera frame rate
+        color: Keep the resized BGR frame (needed for annotation)
+    """
+
+    def __init__(self, index=0, width=640, fps=30, color=True):
+        cap = cv2.VideoCapture(index)
+        if not cap.isOpened():
+            raise IOError(f"Could not open camera {index}")
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FPS, fps)
+        super().__init__(cap, width, color)
+        self.index = index
+        self.total_frames = 0
+        self.start_time = time.time()
+        self.capture_time = None
+
+    def restart_clock(self):
+        """Reset frame numbers and timestamps (e.g. when clearing a recording)"""
+        self.frames_read = 0
+        self.start_time = time.time()
+
+    def _capture_time(self):
+        """Wall-clock capture time of the grabbed frame"""
+        now = time.time()
+        msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if msec > 0:
+            age = time.monotonic() - msec / 1000.0
+            if 0 <= age <= MAX_FRAME_AGE:
+                return now - age
+        return now
+
+    def __iter__(self):
+        while True:
+            # Timestamp between grab() and the decoding in retrieve()
+            if not self.cap.grab():
+                return
+            self.capture_time = self._capture_time()
+            ret, image = self.cap.retrieve(self._captured)
+            if not ret:
+                return
+            self._captured = image
+            self.frames_read += 1
+            yield self._prepare(image, self.capture_time - self.start_time)
+
+
+class ReplaySource(_CaptureSource):
+    """
+    A video file played back like a live camera
+
+    A capture thread decodes the video and publishes its frames at their
+    native frame rate by the wall clock, optionally delayed by a random
+    jitter. Like a camera driver it only buffers ``buffer_size`` frames: if
+    the consumer falls behind, the oldest frames are dropped (counted in
+    ``dropped``) and the frame numbers skip them. This makes the live path
+    (facial_landmarks_webcam.py) testable on machines without a camera.
+
+    Args:
+        path: Path to the video file
+        width: Processing width
+        fps: Playback frame rate (default: the frame rate of the video)
+        color: Keep the resized BGR frame (needed for annotation)
+        jitter: Maximum extra delay of a frame in seconds (uniformly
+            distributed, reproducible through ``seed``)
+        seed: Seed of the jitter
+        buffer_size: Frames buffered for the consumer
+    """
+
+    def __init__(self, path, width=640, fps=None, color=True, jitter=0.0, seed=0, buffer_size=1):
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video file: {path}")
+        super().__init__(cap, width, color)
+        self.path = path
+        self.fps = fps or self.fps or 30.0
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.jitter = jitter
+        self.dropped = 0
+        self.published = 0
+        self.start_time = time.time()
+        self.capture_time = None
+        self._random = random.Random(seed)
+        self._buffer = deque(maxlen=buffer_size)
+        self._ready = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._finished = False
+        self._index_offset = 0
+        self._last_index = 0
+
+    def restart_clock(self):
+        """Reset frame numbers and timestamps (e.g. when clearing a recording)"""
+        with self._ready:
+            self._index_offset = self._last_index
+        self.frames_read = 0
+        self.start_time = time.time()
+
+    def _capture(self):
+        """Publish the frames of the video at their due times"""
+        start = time.monotonic()
+        index = 0
+        try:
+            while not self._stop.is_set():
+                ret, image = self.cap.read()
+                if not ret:
+                    break
+                due = start + index / self.fps
+                if self.jitter:
+                    due += self._random.uniform(0.0, self.jitter)
+                index += 1
+                delay = due - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                with self._ready:
+                    if len(self._buffer) == self._buffer.maxlen:
+                        self.dropped += 1
+                    self._buffer.append((index, time.time(), image))
+                    self._last_index = index
+                    self.published += 1
+                    self._ready.notify()
+        finally:
+            with self._ready:
+                self._finished = True
+                self._ready.notify()
+
+    def __iter__(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._capture, name='replay', daemon=True)
+            self._thread.start()
+        while True:
+            with self._ready:
+                while not self._buffer and not self._finished:
+                    self._ready.wait()
+                if not self._buffer:
+                    return
+                index, captured, image = self._buffer.popleft()
+                offset = self._index_offset
+            if index <= offset:
+                # Captured before restart_clock()
+                continue
+            self.frames_read = index - offset
+            self.capture_time = captured
+            yield self._prepare(image, captured - self.start_time)
+
+    def release(self):
+        """Stop the capture thread and release the video"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        super().release()
+
+
+def read_into(stream, buffer):
+    """
+    Fill a NumPy buffer from a binary stream
+
+    Args:
+        stream: Binary file object (e.g. a pipe)
+        buffer: Contiguous uint8 array to fill
+
+    Returns:
+        True if the buffer was filled, False at the end of the stream
+    """
+    view = memoryview(buffer).cast('B')
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            return False
+        filled += n
+    return True
+
+
+class FFmpegSource:
+    """
+    Frames decoded by an ``ffmpeg`` subprocess
+
+    ffmpeg scales the frames to the processing width and converts them to
+    grayscale before writing raw pixels to a pipe, which is read into a
+    reused NumPy buffer. This replaces the full-resolution BGR decode,
+    resize and color conversion of VideoFileSource. BGR frames are only
+    decoded when ``color`` is set (e.g. for an annotated output video).
+
+    Args:
+        path: Path to the video file
+        width: Processing width
+        skip_frames: Only yield every Nth frame
+        color: Also provide the resized BGR frame
+        ffmpeg: Name or path of the ffmpeg executable
+    """
+
+    def __init__(self, path, width=FRAME_WIDTH, skip_frames=1, color=False, ffmpeg='ffmpeg'):
+        self.ffmpeg = shutil.which(ffmpeg)
+        if not self.ffmpeg:
+            raise IOError("ffmpeg executable not found, install ffmpeg or use the opencv decoder")
+
+        # The container metadata is read through OpenCV, which does not
+        # decode any frame for it
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video file: {path}")
+        self.source_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        self.path = path
+        self.width = width
+        self.skip_frames = skip_frames
+        self.color = color
+        self.frame_size = scaled_size(self.source_size, width)
+        self.frames_read = 0
+        self._start = 0
+        self._proc = None
+
+    def seek(self, frame):
+        """
+        Continue after the first ``frame`` frames (e.g. when resuming a run)
+
+        The frames before are still decoded by ffmpeg, but dropped before
+        scaling; time-based seeking is not frame exact for every codec.
+        """
+        self._start = frame
+        self.frames_read = frame
+
+    def command(self):
+        """The ffmpeg command line decoding the video to raw frames on stdout"""
+        w, h = self.frame_size
+        filters = f"scale={w}:{h}:flags=area"
+        if self._start:
+            filters = f"select=gte(n\\,{self._start}),{filters}"
+        return [
+            self.ffmpeg, '-v', 'error', '-nostdin',
+            '-i', self.path,
+            '-vf', filters,
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24' if self.color else 'gray',
+            '-',
+        ]
+
+    def __iter__(self):
+        w, h = self.frame_size
+        gray = np.empty((h, w), dtype=np.uint8)
+        image = np.empty((h, w, 3), dtype=np.uint8) if self.color else None
+        buffer = image if self.color else gray
+
+        self._proc = subprocess.Popen(self.command(), stdout=subprocess.PIPE,
+                                      bufsize=buffer.nbytes)
+        try:
+            skip_counter = 0
+            while read_into(self._proc.stdout, buffer):
+                self.frames_read += 1
+
+                # Skip frames if requested
+                skip_counter += 1
+                if skip_counter < self.skip_frames:
+                    continue
+                skip_counter = 0
+
+                if self.color:
+                    cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=gray)
+                timestamp = (self.frames_read - 1) / self.fps if self.fps else 0.0
+                yield Frame(self.frames_read, timestamp, image, gray)
+
+            if self._proc.wait() != 0:
+                raise IOError(f"ffmpeg failed to decode {self.path} "
+                              f"(exit code {self._proc.returncode})")
+        finally:
+            self.release()
+
+    def release(self):
+        """Stop the ffmpeg process"""
+        if self._proc is not None:
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.stdout.close()
+            self._proc.wait()
+            self._proc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def is_image_sequence(path):
+    """True if ``path`` names an image sequence (a directory or a glob pattern)"""
+    return os.path.isdir(path) or any(c in path for c in '*?[')
+
+
+def _natural_key(path):
+    """Sort key putting frame_2.png before frame_10.png"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path)]
+
+
+def sequence_files(pattern):
+    """
+    Image files of a sequence, in frame order
+
+    Args:
+        pattern: Directory (all images in it) or glob pattern such as
+            ``frames/cam1_*.jpg``
+    """
+    if os.path.isdir(pattern):
+        files = [os.path.join(pattern, name) for name in os.listdir(pattern)
+                 if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+    else:
+        files = glob.glob(pattern)
+    return sorted(files, key=_natural_key)
+
+
+def reduction_factor(source_width, width):
+    """Largest imread reduction (1, 2, 4 or 8) that still leaves ``width`` pixels"""
+    factor = 1
+    while factor < 8 and source_width // (2 * factor) >= width:
+        factor *= 2
+    return factor
+
+
+class ImageSequenceSource:
+    """
+    Frames of a numbered image sequence, e.g. from a high-speed camera
+
+    Images are decoded by a pool of threads (OpenCV releases the GIL while
+    decoding) a few frames ahead and delivered in order. They are decoded
+    straight to grayscale, at a reduced size when the processing width
+    allows it (``IMREAD_REDUCED_GRAYSCALE_2`` etc., which JPEG decodes at a
+    fraction of the cost), and resized to the processing width. Skipped
+    frames are never read.
+
+    Args:
+        pattern: Directory or glob pattern of the images, sorted by the
+            numbers in their names
+        fps: Frame rate the sequence was recorded at (for the timestamps)
+        width: Processing width
+        skip_frames: Only yield every Nth frame
+        color: Also provide the resized BGR frame
+        workers: Decoding threads (default: number of CPUs, at most 8)
+        prefetch: Frames decoded ahead (default: twice the workers)
+    """
+
+    def __init__(self, pattern, fps, width=FRAME_WIDTH, skip_frames=1, color=False,
+                 workers=None, prefetch=None):
+        self.files = sequence_files(pattern)
+        if not self.files:
+            raise IOError(f"No images found: {pattern}")
+        first = cv2.imread(self.files[0], cv2.IMREAD_UNCHANGED)
+        if first is None:
+            raise IOError(f"Could not read image: {self.files[0]}")
+        self.path = pattern
+        self.fps = float(fps)
+        self.width = width
+        self.skip_frames = skip_frames
+        self.color = color
+        self.source_size = (first.shape[1], first.shape[0])
+        self.frame_size = scaled_size(self.source_size, width)
+        self.total_frames = len(self.files)
+        self.frames_read = 0
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.prefetch = prefetch or 2 * self.workers
+        self.reduction = reduction_factor(self.source_size[0], width)
+        self._pool = None
+        self._pending = deque()
+
+    def signature(self):
+        """Pattern, frame count, total size and newest modification time"""
+        stats = [os.stat(path) for path in self.files]
+        return {'path': os.path.abspath(self.path), 'frames': len(self.files),
+                'size': sum(stat.st_size for stat in stats),
+                'mtime': int(max(stat.st_mtime for stat in stats))}
+
+    def seek(self, frame):
+        """Continue after the first ``frame`` frames (e.g. when resuming a run)"""
+        self.frames_read = frame
+
+    def _decode(self, path):
+        """(BGR or None, gray) of one image at the processing size"""
+        image = cv2.imread(path, _IMREAD_REDUCED[self.reduction][int(self.color)])
+        if image is None:
+            raise IOError(f"Could not read image: {path}")
+        if (image.shape[1], image.shape[0]) != self.frame_size:
+            image = cv2.resize(image, self.frame_size, interpolation=cv2.INTER_AREA)
+        if self.color:
+            return image, cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return None, image
+
+    def __iter__(self):
+        indices = iter(range(self.frames_read + self.skip_frames, self.total_frames + 1,
+                             self.skip_frames))
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='decode')
+        pending = self._pending
+        pending.extend((index, self._pool.submit(self._decode, self.files[index - 1]))
+                       for index in itertools.islice(indices, self.prefetch))
+        try:
+            while pending:
+                index, future = pending.popleft()
+                image, gray = future.result()
+                # Keep the pool busy while the frame is processed
+                for index_ahead in itertools.islice(indices, 1):
+                    pending.append((index_ahead, self._pool.submit(
+                        self._decode, self.files[index_ahead - 1])))
+                self.frames_read = index
+                timestamp = (index - 1) / self.fps if self.fps else 0.0
+                yield Frame(index, timestamp, image, gray)
+            self.frames_read = self.total_frames
+        finally:
+            self.release()
+
+    def release(self):
+        """Stop the decoding threads"""
+        # Frames decoded ahead are not needed any more (shutdown() only
+        # cancels them itself from Python 3.9 on)
+        while self._pending:
+            self._pending.popleft()[1].cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
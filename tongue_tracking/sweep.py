@@ -0,0 +1,409 @@
+"""
+Parameter sweeps sharing decoding and detection
+
+Comparing skip rates, processing widths or filter settings used to take a
+full run of facial_landmarks_video.py per configuration. A sweep runs all
+configurations in a single pass over the video instead:
+
+- every frame is decoded once, and only if some configuration processes it
+  (frames no configuration needs are grabbed without decoding);
+- every processing width is resized and converted to gray once per frame;
+- configurations with the same width and detector share one detector: the
+  full-frame detection and the landmarks of a face are computed for the
+  first configuration that asks for them and reused by the others.
+
+Each configuration keeps its own tracker (identities, locked subject,
+motion gate, seeded detection) and result, so its exports are identical to
+those of a separate run with the same settings. Configurations with a
+motion gate or seeded detection still save work whenever they do run a
+full-frame detection, crops searched by seeded detection are not shared.
+
+The configurations are a JSON list of objects (or ``{"configurations":
+[...]}``) with the keys of CONFIG_DEFAULTS, e.g.::
+
+    [{"name": "every_frame"},
+     {"name": "skip3_gated", "skip_frames": 3, "motion_gate": 2.0},
+     {"name": "small", "width": 320, "kalman": true,
+      "exports": ["csv", "smoothed_csv"]}]
+"""
+import json
+import os
+
+import cv2
+import numpy as np
+
+from .detectors import create_detector
+from .gating import MotionGate
+from .identity import LARGEST, IdentityTracker
+from .kalman import MEASUREMENT_NOISE, PROCESS_NOISE, SeededDetector
+from .predictors import MOUTH_LANDMARK, LandmarkPredictor
+from .sources import FRAME_WIDTH, Frame, scaled_size
+from .tracker import TongueTracker
+
+# Settings of a configuration and their defaults (those of
+# facial_landmarks_video.py)
+CONFIG_DEFAULTS = {
+    'name': None,
+    'skip_frames': 1,
+    'width': FRAME_WIDTH,
+    'detector': 'hog',
+    'haar_cascade': None,
+    'ssd_model': None,
+    'ssd_config': None,
+    'yunet_model': None,
+    'lock_subject': None,
+    'motion_gate': None,
+    'seed_detection': False,
+    'kalman': False,
+    'kalman_process_noise': PROCESS_NOISE,
+    'kalman_measurement_noise': MEASUREMENT_NOISE,
+    'calibration': None,
+    'undistort_lut': False,
+    'exports': ['csv', 'json'],
+}
+
+# Export -> file name in the directory of a configuration
+EXPORTS = {
+    'csv': 'mouth.csv',
+    'json': 'mouth.json',
+    'landmarks': 'landmarks.npz',
+    'smoothed_csv': 'smoothed.csv',
+    'smoothed_json': 'smoothed.json',
+}
+
+DETECTORS = ('hog', 'haar', 'ssd', 'yunet')
+
+# Settings that select the detector, configurations agreeing on these (and
+# the width) share detections
+DETECTOR_KEYS = ('detector', 'haar_cascade', 'ssd_model', 'ssd_config', 'yunet_model')
+
+
+def check_config(config, number=1):
+    """
+    Validate a configuration and fill in the defaults
+
+    Args:
+        config: Dict with keys of CONFIG_DEFAULTS
+        number: Position in the sweep, for the default name
+
+    Returns:
+        Complete configuration dict
+
+    Raises:
+        ValueError: If a key or value is invalid
+    """
+    if not isinstance(config, dict):
+        raise ValueError(f"Configuration {number} is not an object")
+    unknown = sorted(set(config) - set(CONFIG_DEFAULTS))
+    if unknown:
+        raise ValueError(f"Configuration {number}: unknown setting(s) {', '.join(unknown)}")
+    config = dict(CONFIG_DEFAULTS, **config)
+    config['exports'] = list(config['exports'])
+    name = config['name'] = str(config['name'] or f"config{number}")
+    if not name or os.sep in name or name in ('.', '..'):
+        raise ValueError(f"Configuration {number}: invalid name {name!r}")
+    for key in ('skip_frames', 'width'):
+        if not isinstance(config[key], int) or config[key] < 1:
+            raise ValueError(f"{name}: {key} must be a positive integer")
+    if config['detector'] not in DETECTORS:
+        raise ValueError(f"{name}: detector must be one of {', '.join(DETECTORS)}")
+    subject = config['lock_subject']
+    if subject is not None and subject != LARGEST and not (
+            isinstance(subject, int) and not isinstance(subject, bool) and subject >= 1):
+        raise ValueError(f"{name}: lock_subject must be \"{LARGEST}\" or a face id")
+    unknown = sorted(set(config['exports']) - set(EXPORTS))
+    if unknown:
+        raise ValueError(f"{name}: unknown export(s) {', '.join(unknown)}")
+    if any(export.startswith('smoothed') for export in config['exports']):
+        config['kalman'] = True
+    if config['undistort_lut'] and not config['calibration']:
+        raise ValueError(f"{name}: undistort_lut requires calibration")
+    return config
+
+
+def load_configs(path):
+    """
+    Read the configurations of a sweep from a JSON file
+
+    Returns:
+        List of complete configuration dicts
+
+    Raises:
+        ValueError: If the file or a configuration is invalid
+    """
+    with open(path) as f:
+        configs = json.load(f)
+    if isinstance(configs, dict):
+        configs = configs.get('configurations')
+    if not isinstance(configs, list) or not configs:
+        raise ValueError(f"{path} does not contain a list of configurations")
+    configs = [check_config(config, number) for number, config in enumerate(configs, 1)]
+    names = [config['name'] for config in configs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate configuration name(s): {', '.join(duplicates)}")
+    return configs
+
+
+class SharedFaces:
+    """
+    Detector and predictor whose results are shared by several trackers
+
+    Used as both the detector and the predictor of the trackers of one
+    group. The full-frame detection of the current frame (see new_frame())
+    and the landmarks of each detected rectangle are computed once and
+    copied to every tracker asking for them. Other images, such as the
+    crops searched by SeededDetector, go straight to the wrapped detector.
+
+    Args:
+        detector: Face detector
+        predictor: Landmark predictor
+    """
+
+    def __init__(self, detector, predictor):
+        self.detector = detector
+        self.predictor = predictor
+        self.mouth_index = getattr(predictor, 'mouth_index', MOUTH_LANDMARK)
+        self.landmark_ids = getattr(predictor, 'landmark_ids', range(68))
+        self.detections = 0
+        self.detections_shared = 0
+        self.predictions = 0
+        self.predictions_shared = 0
+        self._gray = None
+        self._rects = None
+        self._landmarks = {}
+
+    @property
+    def name(self):
+        return getattr(self.detector, 'name', None)
+
+    def new_frame(self, gray):
+        """Forget the results of the previous frame"""
+        self._gray = gray
+        self._rects = None
+        self._landmarks.clear()
+
+    def detect(self, gray):
+        """Return the list of face rectangles in a grayscale frame"""
+        if gray is not self._gray:
+            self.detections += 1
+            return self.detector.detect(gray)
+        if self._rects is None:
+            self.detections += 1
+            self._rects = list(self.detector.detect(gray))
+        else:
+            self.detections_shared += 1
+        return list(self._rects)
+
+    def predict(self, gray, rect, out=None):
+        """Landmarks of a face, filling ``out`` when it is given"""
+        if gray is not self._gray:
+            self.predictions += 1
+            return self.predictor.predict(gray, rect, out=out)
+        key = (rect.left(), rect.top(), rect.right(), rect.bottom())
+        landmarks = self._landmarks.get(key)
+        if landmarks is None:
+            self.predictions += 1
+            landmarks = self._landmarks[key] = self.predictor.predict(gray, rect)
+        else:
+            self.predictions_shared += 1
+        if out is None or out.shape != landmarks.shape:
+            return landmarks.copy()
+        out[...] = landmarks
+        return out
+
+
+class _Group:
+    """Configurations processed at the same width with the same detector"""
+
+    def __init__(self, width, faces):
+        self.width = width
+        self.faces = faces
+        self.runs = []
+
+
+class _Run:
+    """Tracker and result of one configuration"""
+
+    def __init__(self, config, tracker, result):
+        self.config = config
+        self.tracker = tracker
+        self.result = result
+
+
+class _SweepSource:
+    """What TongueTracker.start_result() needs to know about the video"""
+
+    def __init__(self, path, skip_frames, total_frames, source_size, frame_size):
+        self.path = path
+        self.skip_frames = skip_frames
+        self.total_frames = total_frames
+        self.source_size = source_size
+        self.frame_size = frame_size
+
+
+class Sweep:
+    """
+    Run several configurations in one pass over a video
+
+    Args:
+        video: Video file
+        shape_predictor: Landmark model, or a predictor object
+        configs: Configuration dicts (see check_config())
+        create: Optional callable(config) returning the face detector of a
+            configuration (default: create_detector() with its settings)
+
+    Raises:
+        IOError: If the video cannot be opened
+        ValueError: If a configuration is invalid
+    """
+
+    def __init__(self, video, shape_predictor, configs, create=None):
+        self.video = video
+        self.configs = [check_config(config, number) for number, config in enumerate(configs, 1)]
+        self.cap = cv2.VideoCapture(video)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video file: {video}")
+        self.source_size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frames_read = 0
+        self.frames_decoded = 0
+
+        predictor = shape_predictor
+        if isinstance(shape_predictor, str):
+            predictor = LandmarkPredictor(shape_predictor)
+        groups = {}
+        self.runs = []
+        for config in self.configs:
+            key = (config['width'],) + tuple(config[k] for k in DETECTOR_KEYS)
+            if key not in groups:
+                if create is not None:
+                    detector = create(config)
+                else:
+                    detector = create_detector(config['detector'], **{
+                        k: config[k] for k in DETECTOR_KEYS[1:]})
+                groups[key] = _Group(config['width'], SharedFaces(detector, predictor))
+            group = groups[key]
+            detector = group.faces
+            if config['seed_detection']:
+                detector = SeededDetector(detector)
+            gate = MotionGate(config['motion_gate']) if config['motion_gate'] is not None else None
+            tracker = TongueTracker(detector, group.faces, identities=IdentityTracker(),
+                                    subject=config['lock_subject'], gate=gate)
+            source = _SweepSource(video, config['skip_frames'], self.total_frames,
+                                  self.source_size, scaled_size(self.source_size, config['width']))
+            run = _Run(config, tracker, tracker.start_result(source, 'landmarks' in config['exports']))
+            group.runs.append(run)
+            self.runs.append(run)
+        self.groups = list(groups.values())
+
+    def run(self, progress=None):
+        """
+        Process the video with every configuration
+
+        Args:
+            progress: Optional callback(frames_read, total_frames)
+
+        Returns:
+            TrackingResult of every configuration, in order
+        """
+        captured = None
+        # Resized and gray buffers per width, like those of VideoFileSource
+        buffers = {}
+        try:
+            while True:
+                index = self.frames_read + 1
+                groups = [group for group in self.groups
+                          if any(index % run.config['skip_frames'] == 0 for run in group.runs)]
+                if not groups:
+                    # grab() skips the conversion of frames that are not used
+                    if not self.cap.grab():
+                        break
+                    self.frames_read = index
+                    continue
+                ret, image = self.cap.read(captured)
+                if not ret:
+                    break
+                captured = image
+                self.frames_read = index
+                self.frames_decoded += 1
+                timestamp = (index - 1) / self.fps if self.fps else 0.0
+
+                grays = {}
+                for group in groups:
+                    if group.width not in grays:
+                        grays[group.width] = self._prepare(image, group.width, buffers)
+                    gray = grays[group.width]
+                    group.faces.new_frame(gray)
+                    for run in group.runs:
+                        if index % run.config['skip_frames'] == 0:
+                            frame = Frame(index, timestamp, None, gray)
+                            run.result.add(run.tracker.process_frame(frame))
+                if progress:
+                    progress(self.frames_read, self.total_frames)
+        finally:
+            self.cap.release()
+        for run in self.runs:
+            run.tracker.finish_result(run.result, self.frames_read)
+        return [run.result for run in self.runs]
+
+    @staticmethod
+    def _prepare(image, width, buffers):
+        """Gray frame at ``width``, converted as VideoFileSource does"""
+        size = scaled_size((image.shape[1], image.shape[0]), width)
+        resized, gray = buffers.get(width, (None, None))
+        if gray is None or gray.shape != (size[1], size[0]):
+            resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            gray = np.empty((size[1], size[0]), dtype=np.uint8)
+            buffers[width] = (resized, gray)
+        cv2.resize(image, size, dst=resized, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY, dst=gray)
+        return gray
+
+    def stats(self):
+        """Work done and saved by sharing, as a dict"""
+        faces = [group.faces for group in self.groups]
+        return {
+            'frames_read': self.frames_read,
+            'frames_decoded': self.frames_decoded,
+            'detector_groups': len(self.groups),
+            'detections': sum(f.detections for f in faces),
+            'detections_shared': sum(f.detections_shared for f in faces),
+            'predictions': sum(f.predictions for f in faces),
+            'predictions_shared': sum(f.predictions_shared for f in faces),
+        }
+
+
+def export_run(config, result, directory):
+    """
+    Post-process a configuration's result and write its exports
+
+    Undistorts and Kalman-smooths as configured, like facial_landmarks_video.py.
+
+    Returns:
+        Paths of the written files
+    """
+    os.makedirs(directory, exist_ok=True)
+    if config['calibration']:
+        result.undistort(config['calibration'], use_lut=config['undistort_lut'])
+    smoothed = None
+    if config['kalman'] and result.detections:
+        smoothed = result.smooth(process_noise=config['kalman_process_noise'],
+                                 measurement_noise=config['kalman_measurement_noise'])
+    writers = {
+        'csv': result.export_csv,
+        'json': result.export_json,
+        'landmarks': result.export_landmarks,
+        'smoothed_csv': smoothed.export_csv if smoothed is not None else None,
+        'smoothed_json': smoothed.export_json if smoothed is not None else None,
+    }
+    paths = []
+    for export in config['exports']:
+        if writers[export] is None:
+            continue
+        path = os.path.join(directory, EXPORTS[export])
+        writers[export](path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,210 @@
+"""
+The tongue tracking pipeline
+
+TongueTracker combines a face detector and a landmark predictor. It turns
+an iterable of frames into a stream of FrameResult objects, which can be
+consumed directly (``process_frames``) or fed into sinks and collected
+into a TrackingResult (``run``).
+"""
+import numpy as np
+
+from .detectors import DlibHogDetector, box_to_rect, rect_to_box
+from .identity import LARGEST, IdentityTracker, largest_face
+from .predictors import MOUTH_LANDMARK, LandmarkPredictor
+from .results import Face, FrameResult, TrackingResult
+
+
+class TongueTracker:
+    """
+    Detect faces and predict their landmarks frame by frame
+
+    Args:
+        detector: Face detector with a ``detect(gray)`` method
+        predictor: Landmark predictor with a ``predict(gray, rect, out=None)``
+            method, filling ``out`` when it is given
+        identities: Optional IdentityTracker giving every face a ``face_id``
+        subject: Only predict the landmarks of this face: a face id, or
+            ``'largest'`` for the largest face of the first frame with faces
+            (implies identity tracking)
+        gate: Optional MotionGate; frames it finds static reuse the faces
+            of the last processed frame
+
+    The landmark arrays of a FrameResult are reused for the next frame, like
+    the frame images of the sources; copy them to keep them longer.
+    """
+
+    def __init__(self, detector, predictor, identities=None, subject=None, gate=None):
+        self.detector = detector
+        self.predictor = predictor
+        self.gate = gate
+        self._last_faces = []
+        if subject is not None and identities is None:
+            identities = IdentityTracker()
+        self.identities = identities
+        self.subject = subject
+        if subject not in (None, LARGEST):
+            identities.pin(subject)
+        # Row of the mouth landmark, mouth-only models predict fewer points
+        self.mouth_index = getattr(predictor, 'mouth_index', MOUTH_LANDMARK)
+        landmark_ids = getattr(predictor, 'landmark_ids', range(68))
+        self._mouth_rows = [i for i, n in enumerate(landmark_ids) if n >= MOUTH_LANDMARK]
+        # One landmark buffer per face slot, refilled on every frame
+        self._landmarks = []
+
+    @classmethod
+    def from_model(cls, shape_predictor, upsample=1, detector=None, identities=None,
+                   subject=None, gate=None):
+        """
+        Tracker with the given shape predictor
+
+        Args:
+            shape_predictor: Path to the shape predictor model file
+            upsample: HOG upsampling, used when no detector is given
+            detector: Face detector (default: dlib's HOG detector)
+            identities, subject, gate: See TongueTracker
+        """
+        return cls(detector or DlibHogDetector(upsample), LandmarkPredictor(shape_predictor),
+                   identities, subject, gate)
+
+    def _subject_faces(self, rects, ids):
+        """Keep only the locked subject's rectangle"""
+        if self.subject == LARGEST:
+            if not rects:
+                return [], []
+            self.subject = ids[largest_face(rects)]
+            self.identities.pin(self.subject)
+        keep = [i for i, face_id in enumerate(ids) if face_id == self.subject]
+        return [rects[i] for i in keep], [ids[i] for i in keep]
+
+    def process_frame(self, frame):
+        """Detect the faces in one frame and predict their landmarks"""
+        if self.gate is not None and self._last_faces and self.gate.is_static(frame.gray):
+            return FrameResult(frame, self._last_faces, carried=True)
+
+        rects = self.detector.detect(frame.gray)
+        if self.identities is not None:
+            ids = self.identities.assign(rects)
+            if self.subject is not None:
+                rects, ids = self._subject_faces(rects, ids)
+        else:
+            ids = [None] * len(rects)
+
+        faces = []
+        for i, (rect, face_id) in enumerate(zip(rects, ids)):
+            if i == len(self._landmarks):
+                self._landmarks.append(None)
+            landmarks = self.predictor.predict(frame.gray, rect, out=self._landmarks[i])
+            self._landmarks[i] = landmarks
+            faces.append(Face(rect, landmarks, self.mouth_index, face_id))
+
+        if self.gate is not None:
+            self.gate.update(frame.gray, [face.landmarks[self._mouth_rows] for face in faces])
+        self._last_faces = faces
+        return FrameResult(frame, faces)
+
+    def get_state(self):
+        """
+        State carried from frame to frame, as JSON-serializable values
+
+        Covers the faces of the last frame and the state of the identity
+        tracker, the motion gate and the detector (if it has any), so a
+        tracker restored with set_state() continues exactly where this one
+        stopped.
+        """
+        stateful = {'identities': self.identities, 'gate': self.gate, 'detector': self.detector}
+        state = {name: part.get_state() for name, part in stateful.items()
+                 if hasattr(part, 'get_state')}
+        state['subject'] = self.subject
+        state['last_faces'] = [[rect_to_box(face.rect), face.landmarks.tolist(), face.face_id]
+                               for face in self._last_faces]
+        return state
+
+    def set_state(self, state, rect_type=None):
+        """
+        Restore the state saved by get_state()
+
+        Args:
+            state: Dict from get_state()
+            rect_type: Rectangle class (default: dlib.rectangle)
+        """
+        if self.identities is not None:
+            self.identities.set_state(state['identities'], rect_type)
+        if self.gate is not None:
+            self.gate.set_state(state['gate'])
+        if 'detector' in state and hasattr(self.detector, 'set_state'):
+            self.detector.set_state(state['detector'])
+        self.subject = state['subject']
+        self._landmarks = [np.array(landmarks, dtype=np.int32)
+                           for _, landmarks, _ in state['last_faces']]
+        self._last_faces = [Face(box_to_rect(box, rect_type), landmarks, self.mouth_index, face_id)
+                            for (box, _, face_id), landmarks
+                            in zip(state['last_faces'], self._landmarks)]
+
+    def process_frames(self, frames):
+        """
+        Process an iterable of frames
+
+        Args:
+            frames: Iterable of Frame objects (e.g. a source)
+
+        Yields:
+            FrameResult for every frame
+        """
+        for frame in frames:
+            yield self.process_frame(frame)
+
+    def run(self, source, sinks=(), progress=None, checkpoint=None, resume=False,
+            keep_landmarks=False):
+        """
+        Process a whole source and collect the mouth coordinates
+
+        Args:
+            source: Frame source, e.g. VideoFileSource
+            sinks: Sinks receiving every FrameResult; a sink returning False
+                from ``write()`` stops the run
+            progress: Optional callback(frames_read, total_frames, detections)
+            checkpoint: Optional Checkpoint, saved periodically during the run
+            resume: Continue from the checkpoint if it exists
+            keep_landmarks: Also collect all landmarks and face boxes (see
+                TrackingResult.export_landmarks())
+
+        Returns:
+            TrackingResult
+        """
+        result = self.start_result(source, keep_landmarks)
+        if resume and checkpoint is not None and checkpoint.exists():
+            checkpoint.restore(self, result, source)
+        try:
+            for frame_result in self.process_frames(source):
+                result.add(frame_result)
+                if progress:
+                    progress(source.frames_read, source.total_frames, result.detections)
+                stop = False
+                for sink in sinks:
+                    if sink.write(frame_result) is False:
+                        stop = True
+                if checkpoint is not None and not checkpoint.update(self, result, source):
+                    stop = True
+                if stop:
+                    break
+        finally:
+            for sink in sinks:
+                sink.close()
+        self.finish_result(result, source.frames_read)
+        return result
+
+    def start_result(self, source, keep_landmarks=False):
+        """Empty TrackingResult for the frames of ``source``, see run()"""
+        return TrackingResult(getattr(source, 'path', None),
+                              getattr(source, 'skip_frames', 1),
+                              source.total_frames, source.source_size,
+                              source.frame_size, getattr(self.detector, 'name', None),
+                              self.identities is not None,
+                              self.gate.threshold if self.gate is not None else None,
+                              keep_landmarks)
+
+    def finish_result(self, result, frames_read):
+        """Complete a result after ``frames_read`` frames of the source"""
+        result.finish(frames_read)
+        if self.subject != LARGEST:
+            result.subject = self.subject
@@ -0,0 +1,199 @@
+"""
+Training and evaluation of shape predictors
+
+Helpers for ``train_mouth_predictor.py``: reduce iBUG-style XML annotations
+(the format of the iBUG 300-W training set, written by dlib's imglab or
+``dlib.save_image_dataset_metadata``) to the mouth landmarks, train a dlib
+shape predictor on them and compare models on the mouth points.
+"""
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from .predictors import LandmarkPredictor
+
+# 68-point numbers of the mouth landmarks (outer and inner lip contour)
+MOUTH_POINTS = tuple(range(48, 68))
+
+# Mouth corners, their distance normalizes the landmark error
+MOUTH_CORNERS = (48, 54)
+
+
+def subset_annotations(src, dst, points=MOUTH_POINTS):
+    """
+    Write a copy of an iBUG-style XML file with only some of the landmarks
+
+    The kept parts are renamed 00, 01, ... in the order of ``points`` so
+    dlib trains a predictor with ``len(points)`` parts. Boxes that are
+    ignored or miss one of the points are dropped. Image paths are made
+    absolute, so ``dst`` can be written anywhere.
+
+    Args:
+        src: Source XML with 68-point annotations
+        dst: Output XML
+        points: 68-point landmark numbers to keep
+
+    Returns:
+        (images, boxes) written
+    """
+    tree = ET.parse(src)
+    root = tree.getroot()
+    base = os.path.dirname(os.path.abspath(src))
+    position = {n: i for i, n in enumerate(points)}
+
+    images = root.find('images')
+    n_images = n_boxes = 0
+    for image in list(images):
+        image.set('file', os.path.join(base, image.get('file')))
+        for box in list(image.findall('box')):
+            parts = {int(p.get('name')): p for p in box.findall('part')}
+            if box.get('ignore') == '1' or not all(n in parts for n in points):
+                image.remove(box)
+                continue
+            for n, part in parts.items():
+                if n in position:
+                    part.set('name', f"{position[n]:02d}")
+                else:
+                    box.remove(part)
+            # dlib reads the parts in file order
+            kept = sorted(box.findall('part'), key=lambda p: p.get('name'))
+            for part in kept:
+                box.remove(part)
+            box.extend(kept)
+            n_boxes += 1
+        if image.findall('box'):
+            n_images += 1
+        else:
+            images.remove(image)
+
+    tree.write(dst)
+    return n_images, n_boxes
+
+
+def load_annotations(path):
+    """
+    Read the annotated faces of an iBUG-style XML file
+
+    Returns:
+        List of (image path, (left, top, width, height), {landmark number: (x, y)})
+    """
+    root = ET.parse(path).getroot()
+    base = os.path.dirname(os.path.abspath(path))
+    faces = []
+    for image in root.find('images'):
+        file = os.path.join(base, image.get('file'))
+        for box in image.findall('box'):
+            if box.get('ignore') == '1':
+                continue
+            rect = tuple(int(box.get(k)) for k in ('left', 'top', 'width', 'height'))
+            parts = {int(p.get('name')): (float(p.get('x')), float(p.get('y')))
+                     for p in box.findall('part')}
+            faces.append((file, rect, parts))
+    return faces
+
+
+def train_predictor(xml_path, output_path, tree_depth=4, cascade_depth=10, num_trees=500,
+                    nu=0.1, oversampling=20, feature_pool_size=400, num_threads=0,
+                    verbose=False):
+    """
+    Train a dlib shape predictor
+
+    Args:
+        xml_path: Training annotations (e.g. written by subset_annotations())
+        output_path: Model file to write
+        tree_depth: Depth of the regression trees (2^depth leaves)
+        cascade_depth: Number of cascade levels
+        num_trees: Trees per cascade level
+        nu: Regularization (shrinkage) of the trees
+        oversampling: Random initializations per training face
+        feature_pool_size: Pixels sampled per cascade level
+        num_threads: Training threads (0: one per CPU)
+        verbose: Print dlib's training progress
+
+    Returns:
+        Training time in seconds
+    """
+    import dlib
+
+    options = dlib.shape_predictor_training_options()
+    options.tree_depth = tree_depth
+    options.cascade_depth = cascade_depth
+    options.num_trees_per_cascade_level = num_trees
+    options.nu = nu
+    options.oversampling_amount = oversampling
+    options.feature_pool_size = feature_pool_size
+    options.num_threads = num_threads or os.cpu_count() or 1
+    options.be_verbose = verbose
+
+    start = time.perf_counter()
+    dlib.train_shape_predictor(xml_path, output_path, options)
+    return time.perf_counter() - start
+
+
+def evaluate_predictor(model_path, faces, points=MOUTH_POINTS, repeats=3):
+    """
+    Measure speed and mouth landmark error of a model
+
+    The error is the mean distance of ``points`` to the annotation, in
+    pixels and relative to the distance of the mouth corners. Models with
+    any supported layout can be compared, as the rows are mapped back to
+    68-point numbers.
+
+    Args:
+        model_path: Shape predictor model file
+        faces: Annotations from load_annotations()
+        points: 68-point landmark numbers to compare
+        repeats: Predictions per face for the timing
+
+    Returns:
+        Dict with the model size, load time, prediction time and errors
+    """
+    import cv2
+    import dlib
+
+    start = time.perf_counter()
+    predictor = LandmarkPredictor(model_path)
+    load_seconds = time.perf_counter() - start
+
+    rows = [predictor.landmark_ids.index(n) for n in points]
+    errors = []
+    normalized = []
+    predict_seconds = 0.0
+    images = {}
+    for file, (left, top, width, height), parts in faces:
+        if not all(n in parts for n in points):
+            continue
+        if file not in images:
+            images[file] = cv2.imread(file, cv2.IMREAD_GRAYSCALE)
+        gray = images[file]
+        if gray is None:
+            raise IOError(f"Could not read image: {file}")
+        rect = dlib.rectangle(left, top, left + width - 1, top + height - 1)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            landmarks = predictor.predict(gray, rect)
+        predict_seconds += (time.perf_counter() - start) / repeats
+
+        truth = np.array([parts[n] for n in points])
+        error = np.linalg.norm(landmarks[rows] - truth, axis=1).mean()
+        errors.append(error)
+        if all(n in parts for n in MOUTH_CORNERS):
+            mouth_width = np.linalg.norm(np.subtract(parts[MOUTH_CORNERS[0]],
+                                                     parts[MOUTH_CORNERS[1]]))
+            if mouth_width > 0:
+                normalized.append(error / mouth_width)
+
+    n = len(errors)
+    return {
+        'model': model_path,
+        'num_parts': predictor.num_parts,
+        'size_bytes': os.path.getsize(model_path),
+        'load_seconds': load_seconds,
+        'faces': n,
+        'predict_ms': 1000 * predict_seconds / n if n else None,
+        'error_px': float(np.mean(errors)) if n else None,
+        'error_normalized': float(np.mean(normalized)) if normalized else None,
+    }
@@ -0,0 +1,42 @@
+"""
+Small file helpers shared by the tracking modules
+"""
+import contextlib
+import hashlib
+import os
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-1 hex digest of a file's contents
+
+    Args:
+        path: Path to the file
+        chunk_size: Number of bytes read per iteration
+
+    Returns:
+        Hex digest string
+    """
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w'):
+    """
+    Open a temporary file that replaces ``path`` once it is fully written
+
+    Readers never see a partially written file, even if the writing
+    process is killed.
+    """
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -11,18 +11,130 @@ This provides a user-friendly interface for:
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import threading
-import subprocess
 import os
 import sys
 from pathlib import Path
 
+from tongue_tracking.jobs import CANCELLED, JobQueue, ScriptJob
+from tongue_tracking.preview import PREVIEW_FPS, PREVIEW_SIZE, PreviewChannel
+from tongue_tracking.service import DONE, FAILED, QUEUED, RUNNING
+
+# The tracking scripts live next to this file
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Jobs are polled at most this often, so fast progress does not flood Tk
+POLL_INTERVAL_MS = 200
+
+# Lines kept in a log widget
+MAX_LOG_LINES = 2000
+
+VIDEO_TYPES = ("*.avi", "*.mp4", "*.mov", "*.mkv")
+
+# The embedded preview is redrawn this often while a job writes to it
+PREVIEW_INTERVAL_MS = 1000 // PREVIEW_FPS
+
+
+def format_duration(seconds):
+    """m:ss (or h:mm:ss) of a number of seconds"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_progress(event):
+    """Status text of a progress event"""
+    text = f"{event['frames']}"
+    if event.get('total_frames'):
+        text += f"/{event['total_frames']}"
+    text += f" frames, {event['fps']:.1f} fps, {event['detections']} detections"
+    if event.get('eta') is not None:
+        text += f", {format_duration(event['eta'])} left"
+    return text
+
+
+class PreviewPane:
+    """
+    Canvas showing the frames a script writes to a PreviewChannel
+
+    The image is redrawn only when the script published a new frame, and
+    the boxes and landmarks are drawn as canvas items on top of it, so the
+    script never has to annotate or encode the preview.
+
+    Args:
+        parent: Widget the canvas is created in
+    """
+
+    def __init__(self, parent):
+        width, height = PREVIEW_SIZE
+        self.canvas = tk.Canvas(parent, width=width, height=height, background='black',
+                                highlightthickness=0)
+        self.channel = None
+        self._sequence = None
+        self._photo = None
+        self._image_item = None
+
+    @property
+    def active(self):
+        return self.channel is not None
+
+    def attach(self):
+        """
+        Create a channel for a new job
+
+        Returns:
+            The channel name to pass with --preview-shm, None if shared
+            memory is not available
+        """
+        self.detach()
+        try:
+            self.channel = PreviewChannel.create()
+        except (ImportError, OSError):
+            # No shared memory (before Python 3.8), run without a preview
+            return None
+        self._sequence = None
+        return self.channel.name
+
+    def detach(self):
+        """Remove the channel of the finished job, the last frame stays visible"""
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+
+    def refresh(self):
+        """Draw the latest frame if it is new"""
+        if self.channel is None:
+            return
+        preview = self.channel.read(self._sequence)
+        if preview is None:
+            return
+        self._sequence = preview['sequence']
+
+        image = preview['image']
+        height, width = image.shape
+        # Binary PGM, which PhotoImage reads without Pillow
+        data = f"P5 {width} {height} 255\n".encode() + image.tobytes()
+        self._photo = tk.PhotoImage(data=data, format='PPM')
+        if self._image_item is None:
+            self._image_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self._photo)
+        else:
+            self.canvas.itemconfig(self._image_item, image=self._photo)
+
+        self.canvas.delete('overlay')
+        for box in preview['boxes']:
+            self.canvas.create_rectangle(*box, outline='#00ff00', tags='overlay')
+        for points in preview['landmarks']:
+            for x, y in points:
+                self.canvas.create_rectangle(x - 1, y - 1, x + 1, y + 1, fill='red',
+                                             outline='', tags='overlay')
+        self.canvas.create_text(4, 4, anchor=tk.NW, fill='white', tags='overlay',
+                                text=f"Frame {preview['frame']}")
+
 
 class TongueTrackingGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("3D Tongue Tip Tracking")
-        self.root.geometry("800x600")
+        self.root.geometry("1000x750")
 
         # Variables
         self.model_path = tk.StringVar()
@@ -34,8 +146,34 @@ class TongueTrackingGUI:
         self.export_json = tk.BooleanVar(value=True)
         self.export_video = tk.BooleanVar(value=False)
         self.camera_index = tk.IntVar(value=0)
+        self.video_preview = tk.BooleanVar(value=True)
+        self.webcam_preview = tk.BooleanVar(value=True)
+
+        # Running scripts, polled by poll_jobs()
+        self.video_job = None
+        self.webcam_job = None
+        self.job_queue = JobQueue()
+        self.max_jobs = tk.IntVar(value=self.job_queue.max_running)
+        self._queue_rows = {}    # Treeview item -> ScriptJob
+        self._queue_names = {}   # Treeview item -> name of the output files
+        self._poll_id = None
+        self._preview_id = None
 
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        """Stop the running jobs with the window"""
+        jobs = [job for job in self.job_queue.jobs + [self.video_job, self.webcam_job]
+                if job is not None and job.active]
+        if jobs:
+            if not messagebox.askyesno("Quit", f"Cancel {len(jobs)} running or queued job(s) and quit?"):
+                return
+            for job in jobs:
+                job.cancel()
+        for pane in self.preview_panes:
+            pane.detach()
+        self.root.destroy()
 
     def setup_ui(self):
         """Setup the user interface"""
@@ -48,17 +186,22 @@ class TongueTrackingGUI:
         notebook.add(video_frame, text="Video Processing")
         self.setup_video_tab(video_frame)
 
-        # Tab 2: Webcam
+        # Tab 2: Queue of videos processed in parallel
+        queue_frame = ttk.Frame(notebook)
+        notebook.add(queue_frame, text="Queue")
+        self.setup_queue_tab(queue_frame)
+
+        # Tab 3: Webcam
         webcam_frame = ttk.Frame(notebook)
         notebook.add(webcam_frame, text="Webcam (Live)")
         self.setup_webcam_tab(webcam_frame)
 
-        # Tab 3: Settings
+        # Tab 4: Settings
         settings_frame = ttk.Frame(notebook)
         notebook.add(settings_frame, text="Settings")
         self.setup_settings_tab(settings_frame)
 
-        # Tab 4: About
+        # Tab 5: About
         about_frame = ttk.Frame(notebook)
         notebook.add(about_frame, text="About")
         self.setup_about_tab(about_frame)
@@ -122,6 +265,10 @@ class TongueTrackingGUI:
             options_frame, text="No Display (faster)", variable=self.no_display
         ).grid(row=1, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
 
+        ttk.Checkbutton(
+            options_frame, text="Embedded Preview", variable=self.video_preview
+        ).grid(row=1, column=2, sticky=tk.W, padx=5, pady=2)
+
         ttk.Checkbutton(
             options_frame, text="Export CSV", variable=self.export_csv
         ).grid(row=2, column=0, sticky=tk.W, padx=5, pady=2)
@@ -134,23 +281,90 @@ class TongueTrackingGUI:
             options_frame, text="Export Annotated Video", variable=self.export_video
         ).grid(row=3, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
 
-        # Process button
+        # Process and cancel buttons
+        button_frame = ttk.Frame(parent)
+        button_frame.pack(pady=10)
         ttk.Button(
-            parent,
+            button_frame,
             text="Start Processing",
             command=self.process_video,
             style='Accent.TButton'
-        ).pack(pady=20)
+        ).pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(
+            button_frame, text="Cancel", command=self.cancel_video, state='disabled'
+        )
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
+        # Progress
+        progress_frame = ttk.Frame(parent)
+        progress_frame.pack(fill='x', padx=10, pady=5)
+        self.video_progress = ttk.Progressbar(progress_frame, mode='determinate', maximum=1.0)
+        self.video_progress.pack(fill='x')
+        self.video_progress_label = ttk.Label(progress_frame, text="")
+        self.video_progress_label.pack(anchor=tk.W)
 
-        # Output log
-        log_frame = ttk.LabelFrame(parent, text="Output Log", padding=10)
-        log_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        # Output log next to the preview
+        bottom_frame = ttk.Frame(parent)
+        bottom_frame.pack(fill='both', expand=True, padx=10, pady=5)
+
+        preview_frame = ttk.LabelFrame(bottom_frame, text="Preview", padding=10)
+        preview_frame.pack(side=tk.RIGHT, fill='y', padx=(5, 0))
+        self.video_pane = PreviewPane(preview_frame)
+        self.video_pane.canvas.pack()
+
+        log_frame = ttk.LabelFrame(bottom_frame, text="Output Log", padding=10)
+        log_frame.pack(side=tk.LEFT, fill='both', expand=True)
 
         self.video_log = scrolledtext.ScrolledText(
             log_frame, height=10, state='disabled'
         )
         self.video_log.pack(fill='both', expand=True)
 
+    def setup_queue_tab(self, parent):
+        """Setup the tab processing many videos in parallel"""
+        toolbar = ttk.Frame(parent)
+        toolbar.pack(fill='x', padx=10, pady=5)
+        ttk.Button(toolbar, text="Add Videos...", command=self.queue_add_videos).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="Add Folder...", command=self.queue_add_folder).pack(
+            side=tk.LEFT, padx=5
+        )
+        ttk.Button(toolbar, text="Retry", command=self.queue_retry).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="Cancel", command=self.queue_cancel).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="Remove", command=self.queue_remove).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="Clear Finished", command=self.queue_clear_finished).pack(
+            side=tk.LEFT, padx=5
+        )
+
+        ttk.Label(toolbar, text="Parallel jobs:").pack(side=tk.LEFT, padx=(15, 5))
+        ttk.Spinbox(
+            toolbar, from_=1, to=os.cpu_count() or 1, textvariable=self.max_jobs, width=5,
+            command=self.queue_set_limit
+        ).pack(side=tk.LEFT)
+
+        columns = ('state', 'progress', 'fps', 'detections', 'time', 'tries')
+        tree_frame = ttk.Frame(parent)
+        tree_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        self.queue_tree = ttk.Treeview(tree_frame, columns=columns, selectmode='extended')
+        self.queue_tree.heading('#0', text="Video")
+        self.queue_tree.column('#0', width=240)
+        for column, title, width in zip(
+                columns, ("State", "Progress", "FPS", "Detections", "Time", "Tries"),
+                (80, 80, 60, 80, 120, 50)):
+            self.queue_tree.heading(column, text=title)
+            self.queue_tree.column(column, width=width, anchor=tk.E)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.queue_tree.yview)
+        self.queue_tree.configure(yscrollcommand=scrollbar.set)
+        self.queue_tree.pack(side=tk.LEFT, fill='both', expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill='y')
+        self.queue_tree.bind('<Double-1>', self.queue_show_output)
+
+        self.queue_summary = ttk.Label(
+            parent,
+            text="Videos use the model, output directory and options of the Video "
+                 "Processing tab, without display and plots. Double-click a job for its output."
+        )
+        self.queue_summary.pack(anchor=tk.W, padx=10, pady=5)
+
     def setup_webcam_tab(self, parent):
         """Setup webcam tab"""
         # Model file
@@ -177,10 +391,14 @@ class TongueTrackingGUI:
         ttk.Label(camera_frame, text="(0 = default camera)").grid(
             row=0, column=2, sticky=tk.W, padx=5, pady=2
         )
+        ttk.Checkbutton(
+            camera_frame, text="Embedded Preview (records until stopped)",
+            variable=self.webcam_preview
+        ).grid(row=1, column=0, columnspan=3, sticky=tk.W, padx=5, pady=2)
 
         # Instructions
         instructions = """
-        Controls:
+        Controls (webcam window):
         - Press 'q' to quit
         - Press 'r' to start/stop recording
         - Press 'c' to clear recorded data
@@ -191,22 +409,42 @@ class TongueTrackingGUI:
         - Highlighted mouth position
         - Live FPS counter
         - Recording status
+
+        With the embedded preview the
+        tracking is shown here instead;
+        use Stop to end the session.
         """
 
-        info_frame = ttk.LabelFrame(parent, text="Instructions", padding=10)
-        info_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        body_frame = ttk.Frame(parent)
+        body_frame.pack(fill='both', expand=True, padx=10, pady=5)
+
+        preview_frame = ttk.LabelFrame(body_frame, text="Preview", padding=10)
+        preview_frame.pack(side=tk.RIGHT, fill='y', padx=(5, 0))
+        self.webcam_pane = PreviewPane(preview_frame)
+        self.webcam_pane.canvas.pack()
+
+        info_frame = ttk.LabelFrame(body_frame, text="Instructions", padding=10)
+        info_frame.pack(side=tk.LEFT, fill='both', expand=True)
 
         ttk.Label(info_frame, text=instructions, justify=tk.LEFT).pack(
             anchor=tk.W, padx=5, pady=5
         )
 
-        # Start button
+        # Start and stop buttons
+        button_frame = ttk.Frame(parent)
+        button_frame.pack(pady=10)
         ttk.Button(
-            parent,
+            button_frame,
             text="Start Webcam Tracking",
             command=self.start_webcam,
             style='Accent.TButton'
-        ).pack(pady=20)
+        ).pack(side=tk.LEFT, padx=5)
+        self.stop_webcam_button = ttk.Button(
+            button_frame, text="Stop", command=self.stop_webcam, state='disabled'
+        )
+        self.stop_webcam_button.pack(side=tk.LEFT, padx=5)
+        self.webcam_progress_label = ttk.Label(parent, text="")
+        self.webcam_progress_label.pack()
 
     def setup_settings_tab(self, parent):
         """Setup settings tab"""
@@ -283,6 +521,53 @@ class TongueTrackingGUI:
         if filename:
             self.video_path.set(filename)
 
+    def check_model(self):
+        """Show an error and return False if no valid model file is selected"""
+        if not self.model_path.get():
+            messagebox.showerror("Error", "Please select a model file")
+            return False
+
+        if not os.path.exists(self.model_path.get()):
+            messagebox.showerror("Error", "Model file does not exist")
+            return False
+        return True
+
+    def video_command(self, video, no_display, plots=True, name=None):
+        """
+        Command line of facial_landmarks_video.py with the current options
+
+        The exports are named after the video unless ``name`` is given.
+        """
+        video_name = name or Path(video).stem
+        cmd = [
+            sys.executable, str(SCRIPT_DIR / "facial_landmarks_video.py"),
+            "--shape-predictor", self.model_path.get(),
+            "--video", video,
+            "--skip-frames", str(self.skip_frames.get()),
+            "--progress-events"
+        ]
+
+        if no_display:
+            cmd.append("--no-display")
+
+        if not plots:
+            cmd.append("--no-plots")
+
+        if self.export_csv.get():
+            csv_path = os.path.join(self.output_dir.get(), f"{video_name}.csv")
+            cmd.extend(["--export-csv", csv_path])
+
+        if self.export_json.get():
+            json_path = os.path.join(self.output_dir.get(), f"{video_name}.json")
+            cmd.extend(["--export-json", json_path])
+
+        if self.export_video.get():
+            video_path = os.path.join(
+                self.output_dir.get(), f"{video_name}_annotated.avi"
+            )
+            cmd.extend(["--output-video", video_path])
+        return cmd
+
     def browse_output(self):
         """Browse for output directory"""
         dirname = filedialog.askdirectory(title="Select Output Directory")
@@ -290,27 +575,30 @@ class TongueTrackingGUI:
             self.output_dir.set(dirname)
 
     def log_message(self, message, log_widget):
-        """Add message to log widget"""
+        """Add message (one or more lines) to log widget"""
         log_widget.configure(state='normal')
         log_widget.insert(tk.END, message + '\n')
+        # Keep the widget small, it is re-laid out on every insert
+        lines = int(log_widget.index('end-1c').split('.')[0])
+        if lines > MAX_LOG_LINES:
+            log_widget.delete('1.0', f"{lines - MAX_LOG_LINES}.0")
         log_widget.see(tk.END)
         log_widget.configure(state='disabled')
 
     def process_video(self):
         """Process video file"""
+        if self.video_job is not None and self.video_job.active:
+            messagebox.showwarning("Busy", "A video is already being processed")
+            return
+
         # Validate inputs
-        if not self.model_path.get():
-            messagebox.showerror("Error", "Please select a model file")
+        if not self.check_model():
             return
 
         if not self.video_path.get():
             messagebox.showerror("Error", "Please select a video file")
             return
 
-        if not os.path.exists(self.model_path.get()):
-            messagebox.showerror("Error", "Model file does not exist")
-            return
-
         if not os.path.exists(self.video_path.get()):
             messagebox.showerror("Error", "Video file does not exist")
             return
@@ -318,101 +606,300 @@ class TongueTrackingGUI:
         # Create output directory
         os.makedirs(self.output_dir.get(), exist_ok=True)
 
-        # Build command
-        video_name = Path(self.video_path.get()).stem
-        cmd = [
-            sys.executable, "facial_landmarks_video.py",
-            "--shape-predictor", self.model_path.get(),
-            "--video", self.video_path.get(),
-            "--skip-frames", str(self.skip_frames.get())
-        ]
-
-        if self.no_display.get():
-            cmd.append("--no-display")
-
-        if self.export_csv.get():
-            csv_path = os.path.join(self.output_dir.get(), f"{video_name}.csv")
-            cmd.extend(["--export-csv", csv_path])
+        # Build command; the embedded preview replaces the OpenCV window
+        name = self.video_pane.attach() if self.video_preview.get() else None
+        cmd = self.video_command(self.video_path.get(), self.no_display.get() or name is not None)
+        if name is not None:
+            cmd.extend(["--preview-shm", name])
 
-        if self.export_json.get():
-            json_path = os.path.join(self.output_dir.get(), f"{video_name}.json")
-            cmd.extend(["--export-json", json_path])
-
-        if self.export_video.get():
-            video_path = os.path.join(
-                self.output_dir.get(), f"{video_name}_annotated.avi"
-            )
-            cmd.extend(["--output-video", video_path])
-
-        # Run in thread
+        # Run in a subprocess, its output is read on a background thread
         self.status_bar.config(text="Processing...")
         self.video_log.configure(state='normal')
         self.video_log.delete('1.0', tk.END)
         self.video_log.configure(state='disabled')
+        self.video_progress['value'] = 0
+        self.video_progress_label.config(text="Starting...")
+        self.cancel_button.config(state='normal')
 
-        thread = threading.Thread(
-            target=self.run_command, args=(cmd, self.video_log)
-        )
-        thread.daemon = True
-        thread.start()
+        self.video_job = ScriptJob(cmd, cwd=os.getcwd())
+        self.video_job.start()
+        self.schedule_poll()
+        self.schedule_preview()
+
+    def cancel_video(self):
+        """Stop the running video job"""
+        if self.video_job is not None:
+            self.video_job.cancel()
+            self.status_bar.config(text="Cancelling...")
 
     def start_webcam(self):
         """Start webcam tracking"""
-        # Validate model
-        if not self.model_path.get():
-            messagebox.showerror("Error", "Please select a model file")
+        if self.webcam_job is not None and self.webcam_job.active:
+            messagebox.showwarning("Busy", "Webcam tracking is already running")
             return
 
-        if not os.path.exists(self.model_path.get()):
-            messagebox.showerror("Error", "Model file does not exist")
+        # Validate model
+        if not self.check_model():
             return
 
         # Build command
         cmd = [
-            sys.executable, "facial_landmarks_webcam.py",
+            sys.executable, str(SCRIPT_DIR / "facial_landmarks_webcam.py"),
             "--shape-predictor", self.model_path.get(),
-            "--camera", str(self.camera_index.get())
+            "--camera", str(self.camera_index.get()),
+            "--progress-events"
         ]
+        if self.webcam_preview.get():
+            name = self.webcam_pane.attach()
+            if name is not None:
+                # There are no keys without the window: record from the start
+                cmd.extend(["--no-display", "--record", "--preview-shm", name])
 
-        # Run webcam (blocking)
+        # The webcam window is run by the script, the GUI stays responsive
         self.status_bar.config(text="Webcam running...")
-        try:
-            subprocess.run(cmd)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to start webcam: {e}")
-        finally:
-            self.status_bar.config(text="Ready")
+        self.stop_webcam_button.config(state='normal')
+        self.webcam_job = ScriptJob(cmd, cwd=os.getcwd())
+        self.webcam_job.start()
+        self.schedule_poll()
+        self.schedule_preview()
+
+    def queue_add_videos(self):
+        """Add video files to the queue"""
+        filenames = filedialog.askopenfilenames(
+            title="Select Video Files",
+            filetypes=[("Video files", " ".join(VIDEO_TYPES)), ("All files", "*.*")]
+        )
+        self._queue_add(filenames)
+
+    def queue_add_folder(self):
+        """Add all videos of a folder to the queue"""
+        dirname = filedialog.askdirectory(title="Select Folder with Videos")
+        if dirname:
+            self._queue_add(sorted(str(p) for pattern in VIDEO_TYPES
+                                   for p in Path(dirname).glob(pattern)))
+
+    def _queue_add(self, videos):
+        if not videos or not self.check_model():
+            return
+        os.makedirs(self.output_dir.get(), exist_ok=True)
+        used = set(self._queue_names.values())
+        for video in videos:
+            name = self._queue_output_name(video, used)
+            used.add(name)
+            # Parallel runs would overwrite each other's plot_x.png/plot_y.png
+            cmd = self.video_command(video, no_display=True, plots=False, name=name)
+            job = self.job_queue.add(ScriptJob(cmd, cwd=os.getcwd(), name=video))
+            text = Path(video).name if name == Path(video).stem else f"{Path(video).name} ({name})"
+            item = self.queue_tree.insert('', tk.END, text=text)
+            self._queue_rows[item] = job
+            self._queue_names[item] = name
+        self.queue_set_limit()
+        self.schedule_poll()
+
+    @staticmethod
+    def _queue_output_name(video, used):
+        """
+        Output name of a queued video that no other queued video uses
 
-    def run_command(self, cmd, log_widget):
-        """Run command and capture output"""
+        Videos with the same file name from different folders (day1/trial01.avi,
+        day2/trial01.avi) get the folder name, then a number, added.
+        """
+        path = Path(video)
+        name = path.stem
+        if name in used and path.parent.name:
+            name = f"{path.parent.name}_{path.stem}"
+        base, number = name, 2
+        while name in used:
+            name = f"{base}_{number}"
+            number += 1
+        return name
+
+    def _queue_selection(self):
+        return [self._queue_rows[item] for item in self.queue_tree.selection()]
+
+    def queue_retry(self):
+        """Queue the selected failed or cancelled jobs again (all if none is selected)"""
+        jobs = self._queue_selection() or self.job_queue.jobs
+        for job in jobs:
+            if job.state in (FAILED, CANCELLED):
+                self.job_queue.retry(job)
+        self.schedule_poll()
+
+    def queue_cancel(self):
+        """Cancel the selected jobs"""
+        for job in self._queue_selection():
+            job.cancel()
+        self.schedule_poll()
+
+    def queue_remove(self):
+        """Cancel the selected jobs and remove them from the queue"""
+        for item in self.queue_tree.selection():
+            self.job_queue.remove(self._queue_rows.pop(item))
+            self._queue_names.pop(item, None)
+            self.queue_tree.delete(item)
+        self.schedule_poll()
+
+    def queue_clear_finished(self):
+        """Remove the completed jobs"""
+        for item, job in list(self._queue_rows.items()):
+            if job.state == DONE:
+                self.job_queue.remove(self._queue_rows.pop(item))
+                self._queue_names.pop(item, None)
+                self.queue_tree.delete(item)
+        self._update_queue_summary()
+
+    def queue_set_limit(self):
+        """Apply the number of parallel jobs"""
+        self._apply_queue_limit()
+        self.schedule_poll()
+
+    def _apply_queue_limit(self):
         try:
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
+            self.job_queue.max_running = max(1, int(self.max_jobs.get()))
+        except (tk.TclError, ValueError):
+            pass  # being edited
+
+    def queue_show_output(self, event=None):
+        """Show the last output lines of the double-clicked job"""
+        item = self.queue_tree.identify_row(event.y) if event is not None else None
+        job = self._queue_rows.get(item)
+        if job is None:
+            return
+        lines = job.last_lines(30)
+        title = Path(job.name).name
+        if job.error:
+            lines.append(f"({job.error})")
+        messagebox.showinfo(title, "\n".join(lines) or "No output yet")
+
+    def _update_queue_summary(self):
+        counts = self.job_queue.counts()
+        parts = [f"{counts[state]} {state}" for state in (RUNNING, QUEUED, DONE, FAILED, CANCELLED)
+                 if counts.get(state)]
+        running = self.job_queue.running
+        fps = sum(job.progress['fps'] for job in running if job.progress)
+        text = ", ".join(parts) or "Queue is empty"
+        if running:
+            text += f" ({fps:.1f} frames/s in total)"
+        self.queue_summary.config(text=text)
+
+    def _poll_queue(self):
+        self._apply_queue_limit()
+        self.job_queue.pump()
+        for item, job in self._queue_rows.items():
+            event = job.progress
+            progress = fps = detections = ''
+            if event is not None:
+                total = event.get('total_frames')
+                progress = f"{100 * event['frames'] / total:.0f}%" if total else str(event['frames'])
+                fps = f"{event['fps']:.1f}"
+                detections = str(event['detections'])
+            if job.state == DONE:
+                progress = "100%"
+            time_text = ''
+            if job.elapsed is not None:
+                time_text = format_duration(job.elapsed)
+                if job.state == RUNNING and event is not None and event.get('eta') is not None:
+                    time_text += f" (+{format_duration(event['eta'])})"
+            self.queue_tree.item(item, values=(job.state, progress, fps, detections,
+                                               time_text, job.attempts))
+        self._update_queue_summary()
+        return any(job.active for job in self.job_queue.jobs)
+
+    def stop_webcam(self):
+        """End the webcam session (the recorded data is still exported)"""
+        if self.webcam_job is not None:
+            self.webcam_job.cancel()
+
+    @property
+    def preview_panes(self):
+        return (self.video_pane, self.webcam_pane)
+
+    def schedule_preview(self):
+        """Redraw the previews after PREVIEW_INTERVAL_MS, unless a redraw is pending"""
+        if self._preview_id is None:
+            self._preview_id = self.root.after(PREVIEW_INTERVAL_MS, self.refresh_previews)
+
+    def refresh_previews(self):
+        """Show new preview frames, runs while a job writes to a preview"""
+        self._preview_id = None
+        active = False
+        for pane in self.preview_panes:
+            pane.refresh()
+            active |= pane.active
+        if active:
+            self.schedule_preview()
+
+    def schedule_poll(self):
+        """Poll the jobs after POLL_INTERVAL_MS, unless a poll is pending"""
+        if self._poll_id is None:
+            self._poll_id = self.root.after(POLL_INTERVAL_MS, self.poll_jobs)
+
+    def poll_jobs(self):
+        """
+        Update the GUI from the running jobs
 
-            for line in process.stdout:
-                self.root.after(0, lambda l=line: self.log_message(l.strip(), log_widget))
-
-            process.wait()
-
-            if process.returncode == 0:
-                self.root.after(0, lambda: self.status_bar.config(text="Processing complete!"))
-                self.root.after(0, lambda: messagebox.showinfo(
-                    "Success", "Processing completed successfully!"
-                ))
-            else:
-                self.root.after(0, lambda: self.status_bar.config(text="Processing failed"))
-                self.root.after(0, lambda: messagebox.showerror(
-                    "Error", "Processing failed. Check the log for details."
-                ))
-
-        except Exception as e:
-            self.root.after(0, lambda: self.status_bar.config(text="Error"))
-            self.root.after(0, lambda: messagebox.showerror("Error", str(e)))
+        Runs every POLL_INTERVAL_MS while a job is active: new output lines
+        are added to the log in one insert and the progress shows the latest
+        event only, however fast the script reports.
+        """
+        self._poll_id = None
+        active = False
+        if self.video_job is not None:
+            active |= self._poll_video_job(self.video_job)
+        if self.webcam_job is not None:
+            active |= self._poll_webcam_job(self.webcam_job)
+        if self.job_queue.jobs:
+            active |= self._poll_queue()
+        if active:
+            self.schedule_poll()
+
+    def _poll_video_job(self, job):
+        lines = job.take_lines()
+        if lines:
+            self.log_message('\n'.join(lines), self.video_log)
+        if job.progress is not None:
+            total = job.progress.get('total_frames')
+            if total:
+                self.video_progress['value'] = min(job.progress['frames'] / total, 1.0)
+            self.video_progress_label.config(text=format_progress(job.progress))
+        if job.state == RUNNING:
+            return True
+
+        # Finished since the last poll
+        self.video_job = None
+        self.video_pane.refresh()
+        self.video_pane.detach()
+        self.cancel_button.config(state='disabled')
+        if job.state == DONE:
+            self.video_progress['value'] = 1.0
+            self.status_bar.config(text="Processing complete!")
+            messagebox.showinfo("Success", "Processing completed successfully!")
+        elif job.state == CANCELLED:
+            self.status_bar.config(text="Processing cancelled")
+        else:
+            self.status_bar.config(text="Processing failed")
+            messagebox.showerror(
+                "Error", f"Processing failed ({job.error}). Check the log for details."
+            )
+        return False
+
+    def _poll_webcam_job(self, job):
+        job.take_lines()
+        if job.progress is not None:
+            self.webcam_progress_label.config(text=format_progress(job.progress))
+        if job.state == RUNNING:
+            return True
+
+        self.webcam_job = None
+        self.webcam_pane.refresh()
+        self.webcam_pane.detach()
+        self.stop_webcam_button.config(state='disabled')
+        if job.state in (DONE, CANCELLED):
+            self.status_bar.config(text="Ready")
+        else:
+            self.status_bar.config(text="Webcam tracking failed")
+            messagebox.showerror("Error", f"Webcam tracking failed ({job.error})")
+        return False
 
 
 def main():
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Train a mouth-only shape predictor
+
+Reduces iBUG-style 68-point annotations (e.g. the iBUG 300-W
+labels_ibug_300W_train.xml) to the mouth landmarks 48-67, trains a dlib
+shape predictor on them and compares its speed and mouth error with the
+current model on a test set.
+
+Usage:
+    python train_mouth_predictor.py --train labels_train.xml --test labels_test.xml \
+        -o shape_predictor_mouth.dat --compare shape_predictor_68_face_landmarks_finetuned.dat
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+
+def format_report(reports):
+    """Render evaluate_predictor() results as a plain-text table"""
+    header = ('Model', 'Points', 'Size (MB)', 'Load (s)', 'Predict (ms)', 'Error (px)', 'Error (rel)')
+    rows = []
+    for r in reports:
+        rows.append((
+            os.path.basename(r['model']),
+            str(r['num_parts']),
+            f"{r['size_bytes'] / 1e6:.1f}",
+            f"{r['load_seconds']:.2f}",
+            f"{r['predict_ms']:.3f}" if r['predict_ms'] is not None else '-',
+            f"{r['error_px']:.2f}" if r['error_px'] is not None else '-',
+            f"{r['error_normalized']:.4f}" if r['error_normalized'] is not None else '-',
+        ))
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    lines = ['  '.join(h.ljust(w) for h, w in zip(header, widths)).rstrip(),
+             '  '.join('-' * w for w in widths)]
+    lines += ['  '.join(c.ljust(w) for c, w in zip(row, widths)).rstrip() for row in rows]
+    return '\n'.join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Train a mouth-only (points 48-67) shape predictor")
+    ap.add_argument("--train", required=True,
+        help="iBUG-style XML with 68-point training annotations")
+    ap.add_argument("--test",
+        help="iBUG-style XML with 68-point test annotations (default: the training set)")
+    ap.add_argument("-o", "--output", default="shape_predictor_mouth.dat",
+        help="model file to write (default: shape_predictor_mouth.dat)")
+    ap.add_argument("--compare", action="append", default=[],
+        help="existing model to compare against (can be repeated)")
+    ap.add_argument("--evaluate-only", action="store_true",
+        help="do not train, only compare --output and the --compare models")
+    ap.add_argument("--tree-depth", type=int, default=4,
+        help="depth of the regression trees (default: 4)")
+    ap.add_argument("--cascade-depth", type=int, default=10,
+        help="number of cascade levels (default: 10)")
+    ap.add_argument("--num-trees", type=int, default=500,
+        help="trees per cascade level (default: 500)")
+    ap.add_argument("--nu", type=float, default=0.1,
+        help="regularization, smaller generalizes better but trains slower (default: 0.1)")
+    ap.add_argument("--oversampling", type=int, default=20,
+        help="random initializations per training face (default: 20)")
+    ap.add_argument("--feature-pool-size", type=int, default=400,
+        help="pixels sampled per cascade level (default: 400)")
+    ap.add_argument("--threads", type=int, default=0,
+        help="training threads (default: one per CPU)")
+    ap.add_argument("--verbose", action="store_true",
+        help="print dlib's training progress")
+    args = ap.parse_args()
+
+    for path in [args.train, args.test] + args.compare:
+        if path and not os.path.exists(path):
+            print(f"Error: File not found: {path}")
+            return 1
+
+    from tongue_tracking.training import (evaluate_predictor, load_annotations,
+                                          subset_annotations, train_predictor)
+
+    if not args.evaluate_only:
+        with tempfile.TemporaryDirectory() as tmp:
+            mouth_xml = os.path.join(tmp, "mouth_train.xml")
+            images, boxes = subset_annotations(args.train, mouth_xml)
+            if not boxes:
+                print("Error: No face in the training set has all mouth landmarks (48-67)")
+                return 1
+            print(f"Training on {boxes} faces in {images} images...")
+            try:
+                seconds = train_predictor(
+                    mouth_xml, args.output, tree_depth=args.tree_depth,
+                    cascade_depth=args.cascade_depth, num_trees=args.num_trees, nu=args.nu,
+                    oversampling=args.oversampling, feature_pool_size=args.feature_pool_size,
+                    num_threads=args.threads, verbose=args.verbose)
+            except RuntimeError as e:
+                print(f"Error: Training failed: {e}")
+                return 1
+        print(f"Saved {args.output} (trained in {seconds:.1f} s)")
+    elif not os.path.exists(args.output):
+        print(f"Error: File not found: {args.output}")
+        return 1
+
+    faces = load_annotations(args.test or args.train)
+    print(f"Evaluating on {len(faces)} faces of {args.test or args.train}...")
+    reports = []
+    for model in [args.output] + args.compare:
+        try:
+            reports.append(evaluate_predictor(model, faces))
+        except (IOError, ValueError) as e:
+            print(f"Error: Could not evaluate {model}: {e}")
+            return 1
+    print(format_report(reports))
+    print("Error (rel): mean mouth landmark error divided by the mouth width")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())